@@ -0,0 +1,110 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Shared fixtures of the tests.  The tools are scripts in the zepster directory that import each
+other by module name, so the tests import them the same way, and run them as scripts to test
+how they exit.
+'''
+
+import os
+import sys
+import subprocess
+import pytest
+import yaml
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ZEPSTER_DIR = os.path.join(ROOT_DIR, 'zepster')
+EXAMPLE_DIR = os.path.join(ROOT_DIR, 'docs', 'example')
+sys.path.insert(0, ZEPSTER_DIR)
+
+
+# A customer with purchases of many products, with an enum attribute and sized attributes
+SMALL_MODEL = '''
+entities:
+- entity:
+    name: customer
+    attributes:
+      name: {type: string, required: true, max_length: 100}
+      tier: {type: enum}
+- entity:
+    name: purchase
+    attributes:
+      amount: {type: integer, max_value: 1000}
+- entity:
+    name: product
+relationships:
+- relationship:
+    participants:
+    - {kind: one, name: customer}
+    - {kind: zero_or_more, name: purchase}
+- relationship:
+    participants:
+    - {kind: zero_or_more, name: product}
+    - {kind: zero_or_more, name: purchase}
+enums:
+- enum:
+    name: enum_tier
+    values: [gold, silver]
+'''
+
+# A temporal entity with hot and cold attributes and a retention period, and an expiring child
+TEMPORAL_MODEL = '''
+entities:
+- entity:
+    name: price
+    temporal: true
+    ttl: 30d
+    attributes:
+      amount: {type: integer}
+      note: {type: string, update_frequency: high}
+      sku: {type: string, update_frequency: low}
+- entity:
+    name: event
+    ttl: 12h
+    ttl_column: seen
+    attributes:
+      seen: {type: string}
+relationships:
+- relationship:
+    participants:
+    - {kind: one, name: price}
+    - {kind: zero_or_more, name: event}
+enums: []
+'''
+
+
+@pytest.fixture
+def small_model():
+    return yaml.safe_load(SMALL_MODEL)
+
+
+@pytest.fixture
+def temporal_model():
+    return yaml.safe_load(TEMPORAL_MODEL)
+
+
+@pytest.fixture
+def run_tool(tmp_path):
+    '''
+    Run a tool as a script on a model, returning the completed process
+    '''
+    def run(tool, model, *args):
+        input_path = tmp_path / 'model.erml'
+        input_path.write_text(yaml.dump(model))
+        return subprocess.run([ sys.executable, os.path.join(ZEPSTER_DIR, f'{tool}.py'), '--input', str(input_path),
+                                *args ], capture_output=True, text=True, cwd=tmp_path)
+    return run
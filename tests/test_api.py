@@ -0,0 +1,127 @@
+'''
+Tests of the library interface, imported as the zepster package
+'''
+
+import os
+import sys
+import copy
+import importlib
+import concurrent.futures
+import pytest
+from conftest import EXAMPLE_DIR
+from zepster import api
+
+
+def test_generate_schema(small_model):
+    sql, errors = api.generate_schema(small_model, dialect='pg', reproducible=True)
+    assert errors == [ ]
+    assert 'name varchar(100) not null' in sql
+    chunks, errors = api.generate_schema(small_model, dialect='pg', reproducible=True, stream=True)
+    assert ''.join(chunks) == sql
+    assert errors == [ ]
+
+
+def test_model_is_not_changed(small_model):
+    original = copy.deepcopy(small_model)
+    api.generate_schema(small_model)
+    api.generate_catalog(small_model, include_delete_impact=True)
+    api.generate_pyenums(small_model)
+    assert small_model == original
+
+
+def test_load_model_syntax_error():
+    er_yaml, errors = api.load_model('entities: [')
+    assert er_yaml is None
+    assert [ error['kind'] for error in errors ] == [ 'syntax' ]
+
+
+def test_schema_error(small_model):
+    small_model['enums'][0]['enum'].update( { 'values': 3 } )
+    sql, errors = api.generate_schema(small_model)
+    assert sql is None
+    assert errors == [ { 'kind': 'schema', 'message': "3 is not of type 'array'", 'location': '/enums/0/enum/values' } ]
+
+
+@pytest.mark.parametrize('generate', [ api.generate_schema, api.generate_catalog, api.generate_pyenums ])
+def test_unknown_entity_is_a_model_error(small_model, generate):
+    small_model['relationships'][0]['relationship']['participants'][0].update( { 'name': 'nobody' } )
+    output, errors = generate(small_model)
+    assert output is None
+    assert errors == [ { 'kind': 'model', 'message': 'Relationship 1 names entity "nobody", which does not exist',
+                         'location': '/relationships/0/relationship/participants/0/name' } ]
+
+
+def test_streams_keep_their_own_errors(small_model):
+    errors = [ ]
+
+    def failing_sections():
+        yield 'first'
+        raise RuntimeError('failed')
+
+    chunks, schema_errors = api.generate_schema(small_model, reproducible=True, stream=True)
+    failing = api.generated(failing_sections, errors, True)
+    output = [ next(chunks) ]
+    assert next(failing) == 'first'
+    output.append(next(chunks))
+    assert list(failing) == [ ]
+    output.extend(chunks)
+    assert errors == [ { 'kind': 'internal', 'message': 'RuntimeError: failed', 'location': None } ]
+    assert schema_errors == [ ]
+    assert ''.join(output) == api.generate_schema(small_model, reproducible=True)[0]
+
+
+@pytest.fixture
+def stderr_sink(capfd):
+    # Like the default sink of loguru, on the standard error that capfd captures
+    handler_id = api.logger.add(sys.stderr, level='DEBUG')
+    yield capfd
+    api.logger.remove(handler_id)
+
+
+def test_tool_errors_go_to_the_call(small_model, monkeypatch, stderr_sink):
+    def generate_foreign_keys(*args):
+        raise KeyError('broken')
+    # Called by generate_entities(), which the tool decorates with @logger.catch
+    monkeypatch.setattr(sys.modules['zepster.genschema'], 'generate_foreign_keys', generate_foreign_keys)
+    sql, errors = api.generate_schema(small_model)
+    assert sql is None
+    assert errors == [ { 'kind': 'internal', 'message': "KeyError: 'broken'", 'location': None } ]
+    assert stderr_sink.readouterr().err == ''
+
+
+def test_calls_do_not_write_to_stderr(stderr_sink):
+    with open(os.path.join(EXAMPLE_DIR, 'out1.erml')) as input_object:
+        er_yaml, errors = api.load_model(input_object.read())
+    for generate in [ api.generate_schema, api.generate_catalog, api.generate_pyenums ]:
+        output, errors = generate(er_yaml)
+        assert output and errors == [ ]
+    with open(os.path.join(EXAMPLE_DIR, 'er_diagram.graphml')) as input_object:
+        erml, errors = api.generate_erml(input_object.read())
+    assert erml and errors == [ ]
+    assert stderr_sink.readouterr().err == ''
+
+
+def test_calls_do_not_add_sinks(small_model, monkeypatch):
+    def add(*args, **kwargs):
+        raise AssertionError('logger.add called')
+    monkeypatch.setattr(api.logger, 'add', add)
+    sql, errors = api.generate_schema(small_model)
+    assert errors == [ ]
+
+
+def test_threads(small_model):
+    bad_model = copy.deepcopy(small_model)
+    bad_model['relationships'][0]['relationship']['participants'][0].update( { 'name': 'nobody' } )
+    expected = api.generate_schema(small_model, reproducible=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda er_yaml: api.generate_schema(er_yaml, reproducible=True),
+                                    [ small_model, bad_model ] * 16))
+    assert results[0::2] == [ expected ] * 16
+    assert all(sql is None and [ error['kind'] for error in errors ] == [ 'model' ] for sql, errors in results[1::2])
+
+
+@pytest.mark.parametrize('module', [ 'util', 'generml', 'genschema', 'gencatalog', 'genpyenums', 'genconvert', 'genpurge',
+                                     'gendata', 'genindexes', 'genimpact', 'gencapacity', 'genjoins', 'genareas',
+                                     'genbuild' ])
+def test_tools_import_as_package(module):
+    assert importlib.import_module(f'zepster.{module}').__package__ == 'zepster'
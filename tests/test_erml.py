@@ -0,0 +1,54 @@
+'''
+Tests of the encodings of ERML files
+'''
+
+import io
+import json
+import marshal
+import zlib
+import datetime
+import pytest
+from util import load_erml, dump_erml, model_digest, ERML_FORMATS, ERML_BINARY_HEADER, ERML_BINARY_VERSION
+
+
+@pytest.mark.parametrize('format', ERML_FORMATS)
+def test_round_trip(small_model, format):
+    output_object = io.BytesIO() if format == 'binary' else io.StringIO()
+    dump_erml(small_model, output_object, format)
+    content = output_object.getvalue()
+    assert load_erml(io.BytesIO(content if format == 'binary' else content.encode('utf-8'))) == small_model
+
+
+def test_binary_is_compressed_canonical_json(small_model):
+    output_object = io.BytesIO()
+    dump_erml(small_model, output_object, 'binary')
+    content = output_object.getvalue()
+    assert content[:len(ERML_BINARY_HEADER)] == ERML_BINARY_HEADER
+    assert content[len(ERML_BINARY_HEADER)] == ERML_BINARY_VERSION
+    canonical = json.dumps(small_model, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    assert zlib.decompress(content[len(ERML_BINARY_HEADER) + 1:]).decode('utf-8') == canonical
+
+
+def test_binary_writes_dates_as_strings():
+    er = { 'generated_datetime': datetime.date(2020, 10, 15), 'entities': [ ] }
+    output_object = io.BytesIO()
+    dump_erml(er, output_object, 'binary')
+    assert load_erml(io.BytesIO(output_object.getvalue())) == { 'generated_datetime': '2020-10-15', 'entities': [ ] }
+
+
+def test_marshal_binary_is_rejected(small_model):
+    content = ERML_BINARY_HEADER + bytes([ 1 ]) + zlib.compress(marshal.dumps(small_model))
+    with pytest.raises(ValueError, match='Unsupported version of binary ERML'):
+        load_erml(io.BytesIO(content))
+
+
+def test_corrupt_binary_is_rejected():
+    content = ERML_BINARY_HEADER + bytes([ ERML_BINARY_VERSION ]) + b'not zlib'
+    with pytest.raises(ValueError, match='Invalid binary ERML'):
+        load_erml(io.BytesIO(content))
+
+
+def test_digest_leaves_out_generated_datetime(small_model):
+    digest = model_digest(small_model)
+    assert model_digest(dict(small_model, generated_datetime='2020-10-15T22:02:20')) == digest
+    assert model_digest(dict(small_model, source='other')) != digest
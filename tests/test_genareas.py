@@ -0,0 +1,78 @@
+'''
+Tests of the subject areas that genareas partitions a model into, and of their files
+'''
+
+import io
+import os
+import re
+import pytest
+from conftest import EXAMPLE_DIR
+from util import load_erml
+from genschema import schema_statements
+from genareas import genareas, build_subject_areas
+
+
+@pytest.fixture
+def example_model():
+    with open(os.path.join(EXAMPLE_DIR, 'out1.erml')) as input_object:
+        return load_erml(input_object)
+
+
+def created_tables(sql):
+    return re.findall(r'^create table (\w+) \(', sql, re.MULTILINE)
+
+
+def test_clusters_are_subject_areas():
+    names = [ 'a1', 'a2', 'a3', 'b1', 'b2', 'b3' ]
+    pairs = [ ('a1', 'a2'), ('a2', 'a3'), ('a1', 'a3'), ('b1', 'b2'), ('b2', 'b3'), ('b1', 'b3'), ('a3', 'b1') ]
+    er_yaml = { 'entities': [ { 'entity': { 'name': name } } for name in names ],
+                'relationships': [ { 'relationship': { 'participants': [ { 'kind': 'one', 'name': parent },
+                                                                         { 'kind': 'zero_or_more', 'name': child } ] } }
+                                   for parent, child in pairs ],
+                'enums': [ ] }
+    areas, graph, modularity_value = build_subject_areas(er_yaml)
+    assert len(set(areas[name] for name in names[:3])) == 1
+    assert len(set(areas[name] for name in names[3:])) == 1
+    assert areas['a1'] != areas['b1']
+    assert modularity_value > 0.3
+
+
+@pytest.mark.parametrize('inheritance', [ { }, { 'bird': 'table_per_concrete_class', 'pentode': 'single_table' },
+                                          { 'pentode': 'table_per_level_with_views' } ])
+def test_each_table_is_created_by_one_area(example_model, tmp_path, inheritance):
+    for entity_outer in example_model['entities']:
+        if entity_outer['entity']['name'] in inheritance:
+            entity_outer['entity'].update( { 'inheritance': inheritance[entity_outer['entity']['name']] } )
+    report_object = io.StringIO()
+    genareas(example_model, '-', report_object, output_dir=str(tmp_path), jobs=1)
+    area_tables = [ ]
+    external = False
+    for sql_path in sorted(tmp_path.glob('*.sql')):
+        sql = sql_path.read_text()
+        area_tables.extend(created_tables(sql))
+        external = external or '-- External references (tables of other subject areas' in sql
+    assert external
+    assert sorted(area_tables) == sorted(created_tables(''.join(schema_statements(example_model, '-'))))
+    assert '**Required parents in other subject areas:**' in report_object.getvalue()
+    for area_name in [ sql_path.stem for sql_path in tmp_path.glob('*.sql') ]:
+        assert (tmp_path / f'{area_name}.erml').exists()
+        assert (tmp_path / f'{area_name}.md').exists()
+
+
+def test_reproducible_area_files_are_left_alone(run_tool, example_model, tmp_path):
+    output_dir = tmp_path / 'areas'
+    output_dir.mkdir()
+    args = [ '--output', str(tmp_path / 'areas.md'), '--erml', str(tmp_path / 'areas.erml'),
+             '--output-dir', str(output_dir), '--reproducible' ]
+    first = run_tool('genareas', example_model, *args)
+    assert first.returncode == 0, first.stderr
+    paths = [ tmp_path / 'areas.md', tmp_path / 'areas.erml' ] + [ output_dir / name for name in os.listdir(output_dir) ]
+    assert any(path.suffix == '.sql' for path in paths) and any(path.suffix == '.md' for path in paths[2:])
+    contents = [ path.read_text() for path in paths ]
+    for path in paths:
+        os.utime(path, (0, 0))
+    second = run_tool('genareas', example_model, *args, '--overwrite')
+    assert second.returncode == 0, second.stderr
+    assert [ path.stat().st_mtime for path in paths ] == [ 0 ] * len(paths)
+    assert [ path.read_text() for path in paths ] == contents
+    assert len(os.listdir(output_dir)) == len(paths) - 2
@@ -0,0 +1,33 @@
+'''
+Tests of the build graph that genbuild runs, and of its build state
+'''
+
+import os
+import shutil
+from conftest import EXAMPLE_DIR
+from genbuild import genbuild, build_stages, stage_layers
+
+
+def test_stage_layers(tmp_path):
+    stages = build_stages([ 'diagram.graphml' ], str(tmp_path), 'model', [ 'CRDB', 'PG' ])
+    assert [ sorted(layer) for layer in stage_layers(stages) ] == [
+        [ 'erml' ], [ 'catalog', 'enums', 'schema_crdb', 'schema_pg' ] ]
+
+
+def test_only_stale_stages_are_rebuilt(tmp_path, capsys):
+    shutil.copy(os.path.join(EXAMPLE_DIR, 'er_diagram.graphml'), tmp_path)
+    inputs = [ str(tmp_path / 'er_diagram.graphml') ]
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    assert genbuild(inputs, str(output_dir), 'model', [ 'CRDB', 'PG' ], jobs=2) == [ ]
+    assert capsys.readouterr().out.count(': built ') == 5
+    assert (output_dir / 'model.pg.sql').read_text().startswith('-- Database schema generated by Zepster')
+
+    assert genbuild(inputs, str(output_dir), 'model', [ 'CRDB', 'PG' ], jobs=2) == [ ]
+    assert capsys.readouterr().out.count(': up to date') == 5
+
+    (output_dir / 'model.md').write_text('edited')
+    assert genbuild(inputs, str(output_dir), 'model', [ 'CRDB', 'PG' ], jobs=2) == [ ]
+    output = capsys.readouterr().out
+    assert 'catalog: built ' in output
+    assert output.count(': up to date') == 4
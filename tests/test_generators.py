@@ -0,0 +1,167 @@
+'''
+Tests of the generators of operational artifacts: purge jobs, load plans, test data and capacity estimates
+'''
+
+import io
+import os
+import csv
+import json
+import pytest
+from genpurge import genpurge
+from genschema import generate_load_plan, check_load_options
+from gendata import gendata
+from gencapacity import gencapacity
+from util import select_model_slice
+
+
+@pytest.fixture
+def defining_model(small_model):
+    small_model['relationships'][0]['relationship'].update( { 'defining': 'true' } )
+    return small_model
+
+
+def read_rows(path):
+    with open(path, newline='') as input_object:
+        return list(csv.DictReader(input_object))
+
+
+def test_purge_deletes_children_before_parents(defining_model):
+    output_object = io.StringIO()
+    genpurge(defining_model, '-', output_object, [ 'customer' ], "name = 'x'", 500, None)
+    purge = output_object.getvalue()
+    assert '-- Step 1 of 3: purge _product_mm_purchase' in purge
+    assert purge.index('purge purchase') < purge.index('purge customer')
+    assert "delete from customer where pk in (select pk from customer where name = 'x' limit 500);" in purge
+    assert 'WARNING' not in purge
+
+
+def test_purge_warns_of_blocking_children(small_model):
+    output_object = io.StringIO()
+    genpurge(small_model, '-', output_object, [ 'customer' ], "name = 'x'", 500, 'archive')
+    purge = output_object.getvalue()
+    assert ('-- WARNING: rows of purchase referencing customer via fk_customer have no "on delete" action '
+            'and will block this purge') in purge
+    assert 'create table if not exists archive.customer (like customer);' in purge
+    assert 'returning *) insert into archive.customer select * from batch;' in purge
+
+
+def test_load_plan_layers(small_model):
+    output_object = io.StringIO()
+    generate_load_plan(small_model, '-', output_object, 'COPY', 's3://bucket/{table}.csv', 4, reproducible=True)
+    plan = output_object.getvalue()
+    assert '-- Tables are loaded in 3 layers.' in plan
+    assert '-- Layer 1 of 3: 2 tables, maximum concurrency 2' in plan
+    assert "copy purchase (pk, fk_customer, amount) from 's3://bucket/purchase.csv' with (format csv, header true);" \
+        in plan
+    assert "from 's3://bucket/customer.csv'" in plan
+    assert plan.index('analyze customer;') < plan.index('copy purchase') < plan.index('copy _product_mm_purchase')
+
+
+def test_load_plan_import(small_model):
+    output_object = io.StringIO()
+    generate_load_plan(small_model, '-', output_object, 'IMPORT', 's3://bucket/{table}.csv', 4, reproducible=True)
+    plan = output_object.getvalue()
+    assert "import into purchase (pk, fk_customer, amount) csv data ('s3://bucket/purchase.csv') " \
+        "with skip = '1', nullif = '';" in plan
+    assert 'create statistics purchase_stats from purchase;' in plan
+    assert 'copy ' not in plan and 'analyze ' not in plan
+
+
+@pytest.mark.parametrize('load_format, load_source', [
+    ('csv', 's3://bucket/{table}.csv'),
+    ('COPY', 's3://bucket/{tabel}.csv'),
+    ('COPY', 's3://bucket/{}.csv'),
+    ('COPY', 's3://bucket/data.csv'),
+])
+def test_load_options_are_checked(load_format, load_source):
+    with pytest.raises(ValueError):
+        check_load_options(load_format, load_source)
+
+
+def test_load_format_follows_dialect(run_tool, small_model, tmp_path):
+    result = run_tool('genschema', small_model, '--dialect', 'PG', '--output', str(tmp_path / 'schema.sql'),
+                      '--load-plan', str(tmp_path / 'load.sql'), '--load-source', 's3://bucket/{table}.csv')
+    assert result.returncode == 0, result.stderr
+    plan = (tmp_path / 'load.sql').read_text()
+    assert "copy purchase (pk, fk_customer, amount) from 's3://bucket/purchase.csv'" in plan
+    result = run_tool('genschema', small_model, '--dialect', 'CRDB', '--output', str(tmp_path / 'schema.sql'),
+                      '--overwrite', '--load-plan', str(tmp_path / 'load.sql'),
+                      '--load-source', 's3://bucket/{table}.csv')
+    assert result.returncode == 0, result.stderr
+    assert "import into purchase" in (tmp_path / 'load.sql').read_text()
+
+
+def test_bad_load_source_exits(run_tool, small_model, tmp_path):
+    result = run_tool('genschema', small_model, '--output', str(tmp_path / 'schema.sql'),
+                      '--load-plan', str(tmp_path / 'load.sql'), '--load-source', 's3://bucket/{tabel}.csv')
+    assert result.returncode == 1
+    assert 'Invalid load source' in result.stderr
+
+
+def test_data_is_foreign_key_consistent(small_model, tmp_path):
+    small_model['entities'][1]['entity'].update( { 'data_hints': { 'fan_out': 3 } } )
+    gendata(small_model, '-', str(tmp_path), False, 'csv', 0, 20, 1.0, 0.1, 1)
+    customers = read_rows(tmp_path / 'customer.csv')
+    purchases = read_rows(tmp_path / 'purchase.csv')
+    products = read_rows(tmp_path / 'product.csv')
+    assert (len(customers), len(purchases), len(products)) == (20, 60, 20)
+    assert all(customer['name'] for customer in customers)
+    assert set(purchase['fk_customer'] for purchase in purchases) <= set(customer['pk'] for customer in customers)
+    purchase_keys = set(purchase['pk'] for purchase in purchases)
+    product_keys = set(product['pk'] for product in products)
+    assert all(row['fk_purchase'] in purchase_keys and row['fk_product'] in product_keys
+               for row in read_rows(tmp_path / '_product_mm_purchase.csv'))
+
+
+def test_data_is_deterministic(small_model, tmp_path):
+    (tmp_path / 'first').mkdir()
+    (tmp_path / 'second').mkdir()
+    gendata(small_model, '-', str(tmp_path / 'first'), False, 'csv', 7, 20, 1.0, 0.1, 2)
+    gendata(small_model, '-', str(tmp_path / 'second'), False, 'csv', 7, 20, 1.0, 0.1, 1)
+    for path in sorted((tmp_path / 'first').iterdir()):
+        assert path.read_text() == (tmp_path / 'second' / path.name).read_text()
+
+
+def test_capacity_uses_row_hints(small_model):
+    small_model['entities'][0]['entity'].update( { 'expected_rows': 5000 } )
+    small_model['entities'][1]['entity'].update( { 'data_hints': { 'fan_out': 4 } } )
+    output_object = io.StringIO()
+    gencapacity(small_model, '-', output_object)
+    tables = json.loads(output_object.getvalue())['tables']
+    assert (tables['customer']['rows'], tables['customer']['source']) == (5000, 'hint')
+    assert (tables['purchase']['rows'], tables['purchase']['source']) == (20000, 'fan_out')
+    assert tables['_product_mm_purchase']['source'] == 'mapping'
+    for table in tables.values():
+        assert set(table['dialects']) == { 'CRDB', 'PG' }
+        assert all(sizes['total_bytes'] >= sizes['table_bytes'] for sizes in table['dialects'].values())
+
+
+def test_slice_adds_required_parents_and_enums(small_model):
+    model_slice = select_model_slice(small_model, [ 'purchase' ])
+    assert [ entity_outer['entity']['name'] for entity_outer in model_slice['entities'] ] == [ 'customer', 'purchase' ]
+    assert len(model_slice['relationships']) == 1
+    assert [ enum_outer['enum']['name'] for enum_outer in model_slice['enums'] ] == [ 'enum_tier' ]
+    model_slice = select_model_slice(small_model, [ 'product' ])
+    assert [ entity_outer['entity']['name'] for entity_outer in model_slice['entities'] ] == [ 'product' ]
+    assert model_slice['enums'] == [ ]
+
+
+@pytest.mark.parametrize('tool, args', [
+    ('genpurge', [ ]),
+    ('genimpact', [ ]),
+    ('gencapacity', [ ]),
+    ('genjoins', [ '--from', 'customer', '--to', 'product' ]),
+    ('genareas', [ ]),
+])
+def test_reproducible_output_is_left_alone(run_tool, small_model, tmp_path, tool, args):
+    output = tmp_path / 'output'
+    first = run_tool(tool, small_model, '--output', str(output), '--reproducible', *args)
+    assert first.returncode == 0, first.stderr
+    content = output.read_text()
+    assert 'sha256:' in content
+    os.utime(output, (0, 0))
+    second = run_tool(tool, small_model, '--output', str(output), '--reproducible', '--overwrite', *args)
+    assert second.returncode == 0, second.stderr
+    assert output.stat().st_mtime == 0
+    assert output.read_text() == content
+    assert sorted(os.listdir(tmp_path)) == [ 'model.erml', 'output' ]
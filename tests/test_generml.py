@@ -0,0 +1,92 @@
+'''
+Tests of the ERML that generml converts yEd diagrams into
+'''
+
+import os
+import sys
+import subprocess
+import yaml
+import pytest
+from conftest import ZEPSTER_DIR, EXAMPLE_DIR
+
+
+EXAMPLE_GRAPHML = os.path.join(EXAMPLE_DIR, 'er_diagram.graphml')
+
+
+def run_generml(tmp_path, *args):
+    return subprocess.run([ sys.executable, os.path.join(ZEPSTER_DIR, 'generml.py'), *args ],
+                          capture_output=True, text=True, cwd=tmp_path)
+
+
+def without_header(er):
+    # All but the time it was generated and the source it was generated from
+    return { key: value for key, value in er.items() if key not in [ 'generated_datetime', 'source' ] }
+
+
+@pytest.fixture
+def example_erml():
+    with open(os.path.join(EXAMPLE_DIR, 'out1.erml')) as input_object:
+        return without_header(yaml.safe_load(input_object))
+
+
+@pytest.mark.parametrize('args', [ [ ], [ '--stream' ], [ '--jobs', '1' ], [ '--jobs', '2' ] ])
+def test_example_erml(tmp_path, example_erml, args):
+    completed = run_generml(tmp_path, '--input', EXAMPLE_GRAPHML, *args)
+    assert completed.returncode == 0
+    assert without_header(yaml.safe_load(completed.stdout)) == example_erml
+
+
+def test_cache_is_reused(tmp_path, example_erml):
+    cache = str(tmp_path / 'cache.json')
+    first = run_generml(tmp_path, '--input', EXAMPLE_GRAPHML, '--cache', cache, '--reproducible')
+    assert os.path.exists(cache)
+    second = run_generml(tmp_path, '--input', EXAMPLE_GRAPHML, '--cache', cache, '--reproducible',
+                         '--logging', 'DEBUG')
+    assert second.stdout == first.stdout
+    assert without_header(yaml.safe_load(second.stdout)) == example_erml
+    assert 'Reusing the cached conversion of search_radius' in second.stderr
+    assert 'Converting the attributes of 0 nodes' in second.stderr
+
+
+def test_all_attribute_errors_are_reported(tmp_path):
+    with open(EXAMPLE_GRAPHML) as input_object:
+        graphml = input_object.read()
+    graphml = graphml.replace('version: {type: string, required: true, unique: within_parent}',
+                              'version: {type: string, max_length: 0}')
+    graphml = graphml.replace('matter: {type: enum, required: true}', 'matter: [type: enum')
+    (tmp_path / 'broken.graphml').write_text(graphml)
+    completed = run_generml(tmp_path, '--input', 'broken.graphml')
+    assert completed.returncode == 1
+    assert completed.stdout == ''
+    assert 'ERROR: Invalid YAML (schema) for attributes section of the "search_radius" entity' in completed.stderr
+    assert 'ERROR: Invalid YAML (syntax) for attributes section of the "state" entity' in completed.stderr
+
+
+def test_workspace_reports_duplicates(tmp_path):
+    completed = run_generml(tmp_path, '--input', EXAMPLE_GRAPHML, '--input', EXAMPLE_GRAPHML)
+    assert completed.returncode == 1
+    assert 'ERROR: Duplicate name specified: search_radius (in ' in completed.stderr
+
+
+@pytest.mark.parametrize('graphml, message', [
+    ('<graphml><graph>', 'Invalid GraphML in the diagram '),
+    ('<graphml xmlns="http://graphml.graphdrawing.org/xmlns"></graphml>', 'Unexpected structure in the diagram '),
+])
+def test_workspace_reports_malformed_diagrams(tmp_path, graphml, message):
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    (workspace / 'broken.graphml').write_text(graphml)
+    with open(EXAMPLE_GRAPHML) as input_object:
+        (workspace / 'example.graphml').write_text(input_object.read())
+    completed = run_generml(tmp_path, '--input', str(workspace), '--output', 'out.erml')
+    assert completed.returncode == 1
+    assert message + str(workspace / 'broken.graphml') in completed.stderr
+    assert not os.path.exists(tmp_path / 'out.erml') or (tmp_path / 'out.erml').read_text() == ''
+
+
+def test_malformed_diagram_is_reported(tmp_path):
+    (tmp_path / 'broken.graphml').write_text('<graphml><graph>')
+    completed = run_generml(tmp_path, '--input', 'broken.graphml')
+    assert completed.returncode == 1
+    assert completed.stdout == ''
+    assert 'ERROR: Invalid GraphML in the diagram broken.graphml: ' in completed.stderr
@@ -0,0 +1,38 @@
+'''
+Tests of the join paths that genjoins finds, and of its cache
+'''
+
+import io
+import genjoins
+
+
+def join_paths(er_yaml, cache, to_names=( 'product', )):
+    output_object = io.StringIO()
+    genjoins.genjoins(er_yaml, '-', output_object, 'customer', list(to_names), cache=str(cache))
+    # All but the time it was generated
+    return [ line for line in output_object.getvalue().splitlines() if not line.startswith('-- Generated: ') ]
+
+
+def test_join_path(small_model, tmp_path):
+    sql = '\n'.join(join_paths(small_model, tmp_path / 'joins.json'))
+    assert '-- Join path from customer to product (3 joins)' in sql
+    assert 'join purchase on purchase.fk_customer = customer.pk' in sql
+    assert 'join product on _product_mm_purchase.fk_product = product.pk;' in sql
+
+
+def test_cached_query_does_not_build_the_join_graph(small_model, tmp_path, monkeypatch):
+    cache = tmp_path / 'joins.json'
+    expected = join_paths(small_model, cache)
+
+    def validated_join_graph(*args):
+        raise AssertionError('join graph built')
+    monkeypatch.setattr(genjoins, 'validated_join_graph', validated_join_graph)
+    assert join_paths(small_model, cache) == expected
+    assert join_paths(small_model, cache, [ 'purchase' ])[3] == '-- Join path from customer to purchase (1 join)'
+
+
+def test_cache_of_another_model_is_ignored(small_model, tmp_path):
+    cache = tmp_path / 'joins.json'
+    join_paths(small_model, cache)
+    small_model['relationships'][1]['relationship']['participants'][0].update( { 'kind': 'one' } )
+    assert join_paths(small_model, cache)[3] == '-- Join path from customer to product (2 joins)'
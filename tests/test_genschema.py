@@ -0,0 +1,156 @@
+'''
+Tests of the database schema SQL that genschema generates for each dialect
+'''
+
+import io
+import os
+import sqlite3
+import pytest
+from conftest import EXAMPLE_DIR
+from util import load_erml
+from genschema import genschema, schema_statements, apply_statements, is_statement
+
+
+def schema(er_yaml, **kwargs):
+    return ''.join(schema_statements(er_yaml, '-', **kwargs))
+
+
+@pytest.mark.parametrize('dialect, expected', [
+    ('CRDB', [ 'pk uuid not null default gen_random_uuid() primary key',
+               'name string(100) not null',
+               'tier integer references enum_tier(pk)',
+               'create table enum_tier (pk integer primary key, name varchar(500));' ]),
+    ('PG', [ 'pk uuid not null default gen_random_uuid() primary key',
+             'name varchar(100) not null',
+             'tier smallint references enum_tier(pk)',
+             'create table enum_tier (pk smallint primary key, name varchar(500));' ]),
+    ('SQLITE', [ 'pk text not null default (lower(hex(randomblob(16)))) primary key',
+                 'name varchar(100) not null',
+                 'fk_customer text not null references customer(pk)',
+                 'create table enum_tier (pk integer primary key, name varchar(500));' ]),
+])
+def test_dialect_ddl(small_model, dialect, expected):
+    sql = schema(small_model, dialect=dialect)
+    for line in expected:
+        assert line in sql
+    assert 'amount int2' in sql
+    assert 'fk_product' in sql.split('create table _product_mm_purchase (')[1]
+
+
+def test_tables_in_dependency_order(small_model):
+    sql = schema(small_model)
+    positions = [ sql.index(f'create table {table_name} (') for table_name in
+                  [ 'enum_tier', 'customer', 'purchase', '_product_mm_purchase' ] ]
+    assert positions == sorted(positions)
+
+
+def test_example_schema():
+    with open(os.path.join(EXAMPLE_DIR, 'out1.erml')) as input_object:
+        er_yaml = load_erml(input_object)
+    with open(os.path.join(EXAMPLE_DIR, 'out1.sql')) as expected_object:
+        expected = expected_object.read().splitlines()
+    output_object = io.StringIO()
+    genschema(er_yaml, 'out1.erml', output_object)
+    generated = output_object.getvalue().splitlines()
+    # All but the time it was generated
+    assert generated[:2] + generated[3:] == expected[:2] + expected[3:]
+
+
+def test_temporal_families_and_ttl_crdb(temporal_model):
+    sql = schema(temporal_model, dialect='CRDB')
+    assert 'valid_from timestamptz not null' in sql
+    assert 'check (valid_to is null or valid_to > valid_from)' in sql
+    assert 'family main (pk, amount, valid_from, valid_to)' in sql
+    assert 'family hot (note)' in sql
+    assert 'family cold (sku)' in sql
+    assert ") with (ttl_expire_after = '30 days');" in sql
+    assert "ttl_expiration_expression = '((seen + INTERVAL ''12 hours'')::timestamptz)'" in sql
+
+
+def test_temporal_and_ttl_pg(temporal_model):
+    sql = schema(temporal_model, dialect='PG')
+    assert sql.index('create extension if not exists btree_gist;') < sql.index('create table price (')
+    assert 'family ' not in sql
+    assert 'ttl_expire_after' not in sql
+    assert 'create index event_expiry on event (seen);' in sql
+    assert "delete from event where pk in" in sql
+    assert "seen < now() - interval '12 hours'" in sql
+
+
+def test_natural_keys(small_model):
+    small_model['entities'][0]['entity']['attributes']['name'].update( { 'identifying': True } )
+    sql = schema(small_model, generate_keys=False)
+    customer = sql.split('create table customer (')[1].split(');')[0]
+    assert 'primary key (name)' in customer
+    assert 'gen_random_uuid()' not in customer
+    assert 'references customer(name)' in sql
+
+
+def test_reproducible_stamp(small_model):
+    first = schema(small_model, reproducible=True)
+    assert first == schema(small_model, reproducible=True)
+    small_model['entities'][2]['entity'].update( { 'note': 'changed' } )
+    assert first.splitlines()[2] != schema(small_model, reproducible=True).splitlines()[2]
+
+
+def test_statements_apply_to_sqlite(small_model, temporal_model):
+    for er_yaml in [ small_model, temporal_model ]:
+        connection = sqlite3.connect(':memory:', isolation_level=None)
+        applied = list(apply_statements(schema_statements(er_yaml, '-', dialect='SQLITE'), connection))
+        assert applied and all(is_statement(statement) for statement, seconds in applied)
+        tables = set(row[0] for row in connection.execute("select name from sqlite_master where type = 'table'"))
+        assert set(entity_outer['entity']['name'] for entity_outer in er_yaml['entities']) <= tables
+        connection.close()
+
+
+def test_failed_statement_rolls_back_its_batch(small_model):
+    connection = sqlite3.connect(':memory:', isolation_level=None)
+    statements = list(schema_statements(small_model, '-', dialect='SQLITE')) + [ 'create table customer (pk text);' ]
+    with pytest.raises(sqlite3.Error):
+        for statement, seconds in apply_statements(iter(statements), connection, batch_size=1000):
+            pass
+    assert connection.execute("select count(*) from sqlite_master where type = 'table'").fetchone()[0] == 0
+    connection.close()
+
+
+def test_external_tables(small_model):
+    sql = schema(small_model, external_tables=[ 'customer', 'enum_tier' ])
+    assert 'create table customer (' not in sql
+    assert 'create table enum_tier (' not in sql
+    assert '-- External references (tables of other subject areas, without foreign key constraints): customer\n' \
+        in sql
+    assert '-- References customer(pk) in another subject area\n  fk_customer uuid not null,' in sql
+    assert 'create table purchase (' in sql
+    assert 'create table _product_mm_purchase (' in sql
+
+
+@pytest.fixture
+def tree_model():
+    return { 'entities': [ { 'entity': { 'name': 'node', 'closure_table': True,
+                                         'attributes': { 'label': { 'type': 'string' } } } } ],
+             'relationships': [ { 'relationship': { 'participants': [ { 'kind': 'zero_or_one', 'name': 'node' },
+                                                                      { 'kind': 'zero_or_more', 'name': 'node' } ] } } ],
+             'enums': [ ] }
+
+
+def test_closure_table_triggers_pg(tree_model):
+    sql = schema(tree_model, dialect='PG')
+    assert 'create table node_closure (' in sql
+    assert 'ancestor uuid not null references node(pk) on delete cascade' in sql
+    assert 'create index node_closure_descendant on node_closure (descendant, depth);' in sql
+    assert 'create trigger node_closure_insert after insert on node' in sql
+    assert 'for each row when (new.fk_parent_node is distinct from old.fk_parent_node)' in sql
+
+
+def test_closure_table_rebuild_sqlite(tree_model):
+    sql = schema(tree_model, dialect='SQLITE')
+    assert 'create trigger' not in sql
+    connection = sqlite3.connect(':memory:', isolation_level=None)
+    list(apply_statements(schema_statements(tree_model, '-', dialect='SQLITE'), connection))
+    for pk, parent in [ ('a', None), ('b', 'a'), ('c', 'b') ]:
+        connection.execute('insert into node (pk, fk_parent_node) values (?, ?)', (pk, parent))
+    rebuild = sql.split('-- To rebuild node_closure')[1].split('\n\n')[0].splitlines()[1:]
+    connection.executescript('\n'.join(line[len('-- '):] for line in rebuild) + ';')
+    assert sorted(connection.execute('select ancestor, descendant, depth from node_closure')) == [
+        ('a', 'a', 0), ('a', 'b', 1), ('a', 'c', 2), ('b', 'b', 0), ('b', 'c', 1), ('c', 'c', 0) ]
+    connection.close()
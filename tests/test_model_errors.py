@@ -0,0 +1,78 @@
+'''
+Tests of the errors in models: each tool reports them and exits before it generates anything
+'''
+
+import pytest
+from util import model_errors
+
+
+def set_temporal_valid_from(er_yaml):
+    er_yaml['entities'][0]['entity'].update( { 'temporal': { 'valid_from': 'missing', 'valid_to': 'amount' } } )
+
+
+def set_bad_ttl_column(er_yaml):
+    er_yaml['entities'][1]['entity'].update( { 'ttl_column': 'missing' } )
+
+
+def set_bad_participant(er_yaml):
+    er_yaml['relationships'][0]['relationship']['participants'][1].update( { 'name': 'missing' } )
+
+
+def set_bad_access_pattern(er_yaml):
+    er_yaml.update( { 'access_patterns': [ { 'entity': 'price', 'join': 'missing' } ] } )
+
+
+@pytest.mark.parametrize('change, location', [
+    (set_temporal_valid_from, '/entities/0/entity/temporal/valid_from'),
+    (set_bad_ttl_column, '/entities/1/entity/ttl_column'),
+    (set_bad_participant, '/relationships/0/relationship/participants/1/name'),
+    (set_bad_access_pattern, '/access_patterns/0/join'),
+])
+def test_model_errors(temporal_model, change, location):
+    assert model_errors(temporal_model) == [ ]
+    change(temporal_model)
+    errors = model_errors(temporal_model)
+    assert [ error_location for error_location, message in errors ] == [ location ]
+    assert 'missing' in errors[0][1]
+
+
+@pytest.mark.parametrize('change', [ set_temporal_valid_from, set_bad_ttl_column, set_bad_participant ])
+@pytest.mark.parametrize('tool', [ 'genschema', 'gencatalog', 'genpurge', 'genimpact', 'gencapacity' ])
+def test_tools_report_model_errors(run_tool, temporal_model, tool, change):
+    change(temporal_model)
+    result = run_tool(tool, temporal_model)
+    assert result.returncode == 1
+    assert 'ERROR: Invalid model in Entity-Relationship Markup Language input file.' in result.stderr
+    assert 'missing' in result.stderr
+    assert result.stdout == ''
+
+
+@pytest.mark.parametrize('attribute, hint', [
+    ('note', { 'update_frequency': 'often' }),
+    ('note', { 'identifying': 'yes' }),
+    ('note', { 'max_length': 0 }),
+    ('sku', { 'family': 'not a name' }),
+    ('amount', { 'avg_size': -1 }),
+])
+def test_attribute_hints_are_validated(run_tool, temporal_model, attribute, hint):
+    temporal_model['entities'][0]['entity']['attributes'][attribute].update(hint)
+    result = run_tool('genschema', temporal_model)
+    assert result.returncode == 1
+    assert 'ERROR: Invalid YAML (schema)' in result.stderr
+    assert f"['attributes']['additionalProperties']['properties']['{list(hint)[0]}']" in result.stderr
+    assert result.stdout == ''
+
+
+@pytest.mark.parametrize('ttl', [ 'forever', '30 years' ])
+def test_bad_ttl(run_tool, temporal_model, ttl):
+    temporal_model['entities'][0]['entity'].update( { 'ttl': ttl } )
+    result = run_tool('genschema', temporal_model)
+    assert result.returncode == 1
+    assert 'ERROR: Invalid YAML (schema)' in result.stderr
+
+
+def test_relationship_needs_two_participants(run_tool, temporal_model):
+    del temporal_model['relationships'][0]['relationship']['participants'][1]
+    result = run_tool('genschema', temporal_model)
+    assert result.returncode == 1
+    assert 'is too short' in result.stderr
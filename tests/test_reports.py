@@ -0,0 +1,191 @@
+'''
+Tests of the Markdown reports: the data catalog and the index recommendations
+'''
+
+import io
+import pytest
+from gencatalog import catalog_sections
+from util import make_index
+from genindexes import genindexes, flag_redundant
+
+
+@pytest.fixture
+def subclass_model(small_model):
+    small_model['entities'].append( { 'entity': { 'name': 'vip', 'attributes': { 'level': { 'type': 'integer' } } } } )
+    small_model['relationships'].append( { 'relationship': { 'participants': [ { 'kind': 'base_class', 'name': 'customer' },
+                                                                               { 'kind': 'subclass', 'name': 'vip' } ] } } )
+    return small_model
+
+
+@pytest.fixture
+def indexed_model(small_model):
+    small_model['entities'][0]['entity']['attributes'].update( { 'email': { 'type': 'string', 'unique': True } } )
+    small_model['entities'].append( { 'entity': { 'name': 'line', 'attributes': {
+        'position': { 'type': 'integer', 'unique': 'within_parent' } } } } )
+    small_model['relationships'].append( { 'relationship': { 'defining': 'true', 'participants': [
+        { 'kind': 'one', 'name': 'purchase' }, { 'kind': 'zero_or_more', 'name': 'line' } ] } } )
+    return small_model
+
+
+def index_recommendations(er_yaml, dialect='CRDB', generate_keys=True):
+    # The rows of the report, by index name, and the DDL
+    report_object = io.StringIO()
+    ddl_object = io.StringIO()
+    genindexes(er_yaml, '-', report_object, ddl_object, dialect, generate_keys, reproducible=True)
+    rows = [ line.split(' | ') for line in report_object.getvalue().splitlines() if line.count(' | ') == 5 ][2:]
+    return { row[1]: dict(zip([ 'table', 'name', 'columns', 'include', 'reason', 'redundant_with' ], row))
+             for row in rows }, ddl_object.getvalue()
+
+
+def entity_section(catalog, entity_name):
+    return catalog.split(f'## {entity_name}\n')[1].split('\n---\n')[0]
+
+
+def test_catalog_of_default_inheritance(subclass_model):
+    catalog = ''.join(catalog_sections(subclass_model, '-', True))
+    assert '#### Inheritance' not in catalog
+    assert '1 | level | integer' in entity_section(catalog, 'vip')
+
+
+def test_catalog_follows_single_table_inheritance(subclass_model):
+    subclass_model['entities'][0]['entity'].update( { 'inheritance': 'single_table' } )
+    subclass_model['relationships'][0]['relationship']['participants'][0].update( { 'name': 'vip' } )
+    catalog = ''.join(catalog_sections(subclass_model, '-', True))
+    customer = entity_section(catalog, 'customer')
+    assert '1 | customer_subtype | enum |  | The class of the customer row | ' in customer
+    assert '4 | level | integer |  |  | Only for vip' in customer
+    assert '**Stored in:** table customer, rows where customer_subtype is customer' in customer
+    assert 'customer | one | False' in entity_section(catalog, 'purchase')
+    vip = entity_section(catalog, 'vip')
+    assert '### Columns:' not in vip
+    assert '**Stored in:** table customer, rows where customer_subtype is vip' in vip
+    assert '## enum_customer_subtype' in catalog
+
+
+def test_catalog_follows_table_per_concrete_class_inheritance(subclass_model):
+    subclass_model['entities'][0]['entity'].update( { 'inheritance': 'table_per_concrete_class' } )
+    catalog = ''.join(catalog_sections(subclass_model, '-', True))
+    customer = entity_section(catalog, 'customer')
+    assert '### Columns:' not in customer
+    assert '**Stored in:** no table of its own (abstract)' in customer
+    vip = entity_section(catalog, 'vip')
+    assert [ line.split(' | ')[1] for line in vip.splitlines() if line[:1].isdigit() ] == [ 'name', 'tier', 'level' ]
+    assert 'purchase | zero_or_more | False' in vip
+
+
+@pytest.mark.parametrize('include_delete_impact', [ False, True ])
+def test_catalog_delete_impact_behind_option(subclass_model, include_delete_impact):
+    catalog = ''.join(catalog_sections(subclass_model, '-', True, include_delete_impact))
+    assert '## customer' in catalog
+    assert ('#### Delete Impact' in catalog) == include_delete_impact
+
+
+def test_index_report_and_ddl_have_one_stamp(small_model):
+    small_model.update( { 'access_patterns': [ { 'entity': 'customer', 'lookup': [ 'name' ] } ] } )
+    report_object = io.StringIO()
+    ddl_object = io.StringIO()
+    genindexes(small_model, '-', report_object, ddl_object, reproducible=True)
+    report_stamp = report_object.getvalue().splitlines()[3]
+    ddl_stamp = ddl_object.getvalue().splitlines()[2]
+    assert report_stamp.startswith('Generated: sha256:')
+    assert ddl_stamp == f'-- {report_stamp}'
+    assert 'create index if not exists customer_name_idx on customer (name);' in ddl_object.getvalue()
+    assert 'create index if not exists purchase_fk_customer_idx on purchase (fk_customer);' in ddl_object.getvalue()
+
+
+def test_within_parent_is_a_composite_unique_index(indexed_model):
+    indexes, ddl = index_recommendations(indexed_model)
+    assert indexes['line_fk_purchase_position_key']['reason'] == 'position is unique within its parent purchase'
+    assert 'create unique index if not exists line_fk_purchase_position_key on line (fk_purchase, position);' in ddl
+    # The composite index leads with the foreign key, so the foreign key index is left out of the DDL
+    assert indexes['line_fk_purchase_idx']['redundant_with'] == 'line_fk_purchase_position_key (fk_purchase, position)'
+    assert '-- Redundant with line_fk_purchase_position_key: create index if not exists line_fk_purchase_idx' in ddl
+
+
+@pytest.mark.parametrize('generate_keys, redundant_with', [
+    (True, ''),
+    (False, '_product_mm_purchase_pkey (fk_product, fk_purchase)'),
+])
+def test_foreign_key_index_covered_by_primary_key(indexed_model, generate_keys, redundant_with):
+    indexes, ddl = index_recommendations(indexed_model, generate_keys=generate_keys)
+    assert indexes['_product_mm_purchase_fk_product_idx']['redundant_with'] == redundant_with
+
+
+def test_lookup_covered_by_unique_attribute(indexed_model):
+    indexed_model.update( { 'access_patterns': [ { 'entity': 'customer', 'lookup': [ 'email' ] } ] } )
+    indexes, ddl = index_recommendations(indexed_model)
+    assert indexes['customer_email_idx']['redundant_with'] == 'customer_email_key (email)'
+    assert '\ncreate index if not exists customer_email_idx' not in ddl
+
+
+def test_join_access_patterns(indexed_model):
+    indexed_model.update( { 'access_patterns': [
+        { 'entity': 'purchase', 'join': 'customer', 'sort': [ 'amount desc' ] },
+        { 'entity': 'customer', 'join': 'purchase' },
+        { 'entity': 'product', 'join': 'purchase' } ] } )
+    indexes, ddl = index_recommendations(indexed_model)
+    # From the parent: the foreign key, then the sort, which makes the foreign key index redundant
+    assert indexes['purchase_fk_customer_amount_idx']['reason'] == \
+        'Access pattern 1: list the purchase rows of a customer'
+    assert 'create index if not exists purchase_fk_customer_amount_idx on purchase (fk_customer, amount desc);' in ddl
+    assert indexes['purchase_fk_customer_idx']['redundant_with'] == \
+        'purchase_fk_customer_amount_idx (fk_customer, amount desc)'
+    # From the child: a lookup by the primary key
+    assert indexes['customer_pk_idx']['redundant_with'] == 'customer_pkey (pk)'
+    # Many-to-many: through the mapping table, from the joined entity's foreign key
+    assert indexes['_product_mm_purchase_fk_purchase_fk_product_idx']['reason'] == \
+        'Access pattern 3: join product from purchase through _product_mm_purchase'
+    assert indexes['_product_mm_purchase_fk_purchase_idx']['redundant_with'] == \
+        '_product_mm_purchase_fk_purchase_fk_product_idx (fk_purchase, fk_product)'
+
+
+@pytest.mark.parametrize('dialect, include', [ ('CRDB', 'storing'), ('PG', 'include') ])
+def test_included_columns_follow_dialect(indexed_model, dialect, include):
+    indexed_model.update( { 'access_patterns': [ { 'entity': 'purchase', 'lookup': [ 'amount' ],
+                                                   'include': [ 'fk_customer', 'amount' ] } ] } )
+    indexes, ddl = index_recommendations(indexed_model, dialect)
+    assert indexes['purchase_amount_idx']['include'] == 'fk_customer'
+    assert f'create index if not exists purchase_amount_idx on purchase (amount) {include} (fk_customer);' in ddl
+
+
+def test_flag_redundant():
+    existing = { 'a': [ make_index('a', [ 'pk' ], [ ], True, 'Primary key', 'a_pkey') ] }
+    recommendations = [ make_index('a', [ 'x' ], [ ], False, 'x'),
+                        make_index('a', [ 'x', 'y' ], [ 'z' ], False, 'x and y'),
+                        make_index('a', [ 'x' ], [ 'z' ], False, 'x storing z'),
+                        make_index('a', [ 'x', 'y' ], [ ], True, 'x and y are unique'),
+                        make_index('a', [ 'x' ], [ ], True, 'x is unique'),
+                        make_index('a', [ 'pk' ], [ ], False, 'pk'),
+                        make_index('b', [ 'x' ], [ ], False, 'x of b') ]
+    flag_redundant(existing, recommendations)
+    redundant_with = [ index['redundant_with'] and index['redundant_with']['reason'] for index in recommendations ]
+    # A unique index is only covered by a unique index on the same columns, and an index on another table never is
+    assert redundant_with == [ 'x and y', None, 'x and y', None, None, 'Primary key', None ]
+
+
+@pytest.mark.parametrize('pattern, message', [
+    ({ 'entity': 'order', 'lookup': [ 'amount' ] },
+     'Access pattern 1 names entity "order", which does not exist'),
+    ({ 'entity': 'purchase', 'lookup': [ 'total' ] },
+     'Error: Access pattern 1 names a column that is not in table purchase: total'),
+    ({ 'entity': 'purchase', 'join': 'customer', 'sort': [ 'total desc' ] },
+     'Error: Access pattern 1 names a column that is not in table purchase: total'),
+    ({ 'entity': 'purchase', 'lookup': [ 'amount' ], 'include': [ 'total' ] },
+     'Error: Access pattern 1 names a column that is not in table purchase: total'),
+    ({ 'entity': 'customer', 'join': 'product' },
+     'Error: Access pattern 1 joins customer from product, but they have no relationship'),
+])
+def test_invalid_access_patterns_exit(run_tool, small_model, pattern, message):
+    small_model.update( { 'access_patterns': [ pattern ] } )
+    result = run_tool('genindexes', small_model)
+    assert result.returncode == 1
+    assert message in result.stderr
+    assert result.stdout == ''
+
+
+def test_access_pattern_of_abstract_entity_exits(run_tool, subclass_model):
+    subclass_model['entities'][0]['entity'].update( { 'inheritance': 'table_per_concrete_class' } )
+    subclass_model.update( { 'access_patterns': [ { 'entity': 'customer', 'lookup': [ 'name' ] } ] } )
+    result = run_tool('genindexes', subclass_model)
+    assert result.returncode == 1
+    assert 'Error: Access pattern 1 names an entity that does not exist or has no table: customer' in result.stderr
@@ -0,0 +1,230 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Library interface to Zepster, for generating artifacts in a long-running process
+rather than running a tool for each one.
+
+Each function takes a model (or, for generate_erml(), the content of a diagram) and returns
+the output and a list of errors.  The output is None if there are errors.  With stream=True,
+the output is instead an iterator of chunks of the output, generated as they are read, and
+errors found while generating are added to the list of errors as they are found (after which
+the iterator stops).  Each error is a dictionary of its kind (syntax, schema, diagram, model
+or internal), its message, and where it applies, if known.
+
+The functions do not exit, print, or log, and do not change the model they are given, so they
+can be called from several threads at once.  Importing this module disables the logging of the
+modules of Zepster (an application can turn it back on with logger.enable()), and makes their
+functions raise exceptions to the call rather than log them.
+
+Example:
+
+    er_yaml, errors = load_model(erml_content)
+    if not errors:
+        sql, errors = generate_schema(er_yaml, dialect='PG')
+'''
+
+import io
+import re
+import sys
+import contextlib
+import hashlib
+import xml.etree.ElementTree as ET
+from loguru import logger
+import jsonschema
+import yaml
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, generation_stamp, model_errors
+    from .generml import extract_graphml, convert_nodes, find_duplicate_names, write_erml
+    from .genschema import schema_statements
+    from .gencatalog import catalog_sections
+    from .genpyenums import pyenums_sections
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, generation_stamp, model_errors
+    from generml import extract_graphml, convert_nodes, find_duplicate_names, write_erml
+    from genschema import schema_statements
+    from gencatalog import catalog_sections
+    from genpyenums import pyenums_sections
+
+
+# The validator of ERML models, made once rather than for each model
+jsonschema.validators.validator_for(json_schema_erml).check_schema(json_schema_erml)
+erml_validator = jsonschema.validators.validator_for(json_schema_erml)(json_schema_erml)
+
+
+def error(kind, message, location=None):
+    '''
+    Make a structured error
+    '''
+    return { 'kind': kind, 'message': message, 'location': location }
+
+
+# The modules of Zepster that the functions call
+TOOL_MODULES = sorted(set(function.__module__ for function in
+                          [ load_erml, extract_graphml, schema_statements, catalog_sections, pyenums_sections ]))
+
+
+def raise_caught_errors(module):
+    '''
+    Replace the functions of a module that are decorated with @logger.catch, which log their exceptions
+    and return None, by the functions they decorate, so their exceptions are raised to the call
+    '''
+    for name, value in list(vars(module).items()):
+        if callable(value) and getattr(getattr(value, '__code__', None), 'co_name', None) == 'catch_wrapper':
+            setattr(module, name, value.__wrapped__)
+
+
+for module_name in TOOL_MODULES:
+    logger.disable(module_name)
+    raise_caught_errors(sys.modules[module_name])
+raise_caught_errors(sys.modules[__name__])
+
+
+@contextlib.contextmanager
+def caught_errors(errors):
+    '''
+    Add the exceptions raised in the block to the errors
+    '''
+    try:
+        yield
+    except (ET.ParseError, yaml.YAMLError) as ex:
+        errors.append(error('syntax', f'{type(ex).__name__}: {ex}'))
+    except ValueError as ex:
+        errors.append(error('model', str(ex)))
+    except Exception as ex:
+        errors.append(error('internal', f'{type(ex).__name__}: {ex}'))
+
+
+def load_model(content):
+    '''
+    Read a model from the content of an ERML file (a string or bytes) in any of its encodings.
+    Returns the model (None if there are errors) and the errors.
+    '''
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    try:
+        return load_erml(io.BytesIO(content)), [ ]
+    except (yaml.YAMLError, ValueError) as ex:
+        return None, [ error('syntax', str(ex)) ]
+
+
+def validate_model(er_yaml):
+    '''
+    Validate a model against the ERML schema and then, if it is valid, for the errors that the schema
+    cannot find, such as names that refer to nothing (see util.model_errors).
+    Returns all the errors found (empty if it is valid).
+    '''
+    errors = [ error('schema', ex.message, '/' + '/'.join(str(part) for part in ex.absolute_path))
+               for ex in sorted(erml_validator.iter_errors(er_yaml), key=lambda ex: list(map(str, ex.absolute_path))) ]
+    if errors:
+        return errors
+    return [ error('model', message, location) for location, message in model_errors(er_yaml) ]
+
+
+def generated(sections, errors, stream):
+    '''
+    Return the output of the generator of the sections of an output: the output as a string,
+    or an iterator of its sections if streaming
+    '''
+    def chunks():
+        # The errors are caught around each step rather than around the loop, so they are not
+        # caught while the caller holds the iterator between steps, or runs another one
+        iterator = iter([ ])
+        with caught_errors(errors):
+            iterator = sections()
+        while not errors:
+            section = None
+            with caught_errors(errors):
+                section = next(iterator, None)
+            if section is None or errors:
+                break
+            yield section
+    if errors:
+        return iter([ ]) if stream else None
+    if stream:
+        return chunks()
+    output = ''.join(chunks())
+    return None if errors else output
+
+
+def generate_erml(diagram, input='-', format='yaml', reproducible=False, cache=None, jobs=1):
+    '''
+    Convert the content of an Entity-Relationship diagram created by the yEd graph editor (GraphML, as a
+    string or bytes) into Entity-Relationship Markup Language in the specified format: yaml, json or binary.
+    Returns the ERML (a string, or bytes for binary; None if there are errors) and the errors.
+
+    If a cache dictionary is given, it keeps the conversions of the nodes and edges of the diagram
+    between calls (start with an empty dictionary).  The attributes are converted in this process
+    unless jobs is more than 1.
+    '''
+    if isinstance(diagram, str):
+        diagram = diagram.encode('utf-8')
+    errors = [ ]
+    er_enums = [ ]
+    er_entities = [ ]
+    with caught_errors(errors):
+        cached = { 'nodes': dict(cache.get('nodes', { })), 'edges': dict(cache.get('edges', { })) } \
+                 if cache is not None else None
+        parsed = extract_graphml(io.BytesIO(diagram), cache=cached)
+        for name in find_duplicate_names([ (input, parsed['names']) ]):
+            errors.append(error('diagram', f'Duplicate name specified: {name}', name))
+        for fragment in convert_nodes(parsed, jobs):
+            (er_enums if 'enum' in fragment else er_entities).append(fragment)
+        errors.extend(error('diagram', re.sub(r'^ERROR: ', '', message.strip())) for message in parsed['errors'])
+        if cache is not None:
+            cache.update(parsed['cache'])
+    if errors:
+        return None, errors
+
+    er_head = {
+        "source": 'stdin' if input == '-' else input,
+        "generated_datetime": generation_stamp(hashlib.sha256(diagram).hexdigest() if reproducible else None)
+    }
+    output_object = io.BytesIO() if format == 'binary' else io.StringIO()
+    with caught_errors(errors):
+        write_erml(er_head, er_entities, parsed['relationships'], er_enums, output_object, format)
+    return (None if errors else output_object.getvalue()), errors
+
+
+def generate_schema(er_yaml, input='-', generate_keys=True, dialect='CRDB', column_order='ERML',
+                    reproducible=False, stream=False):
+    '''
+    Generate the database schema SQL of a model (see genschema).
+    Returns the SQL (or an iterator of its header and then each of its statements) and the errors.
+    '''
+    errors = validate_model(er_yaml)
+    return generated(lambda: schema_statements(er_yaml, input, generate_keys, dialect.upper(), column_order.upper(),
+                                               reproducible), errors, stream), errors
+
+
+def generate_catalog(er_yaml, input='-', reproducible=False, stream=False, include_delete_impact=False):
+    '''
+    Generate the data catalog of a model, in Markdown (see gencatalog).
+    Returns the catalog (or an iterator of its chunks) and the errors.
+    '''
+    errors = validate_model(er_yaml)
+    return generated(lambda: catalog_sections(er_yaml, input, reproducible, include_delete_impact),
+                     errors, stream), errors
+
+
+def generate_pyenums(er_yaml, input='-', reproducible=False, stream=False):
+    '''
+    Generate the Python enum declarations of a model (see genpyenums).
+    Returns the Python module (or an iterator of its chunks) and the errors.
+    '''
+    errors = validate_model(er_yaml)
+    return generated(lambda: pyenums_sections(er_yaml, input, reproducible), errors, stream), errors
@@ -0,0 +1,579 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to partition the entities of an Entity-Relationship Markup Language (ERML)
+file into loosely coupled subject areas.
+
+The relationship graph is partitioned by community detection (the Louvain method), which
+maximizes the modularity of the areas: entities are grouped so that most relationships
+stay within an area and few cross between areas.  Relationships that put a required
+foreign key in a table, and most of all those between a base class and a subclass, count
+more than optional ones, as cutting them makes a subject area depend on another.
+
+The report lists the areas and the relationships cut between them.  The model can be
+written with the "subject_area" of each entity set, and each area can be written to its
+own directory of outputs (ERML, SQL and catalog), generated in parallel.  A subject area's
+ERML and catalog include the required parents it has in other areas (see "genschema --subject-area"),
+but its SQL creates only the area's own tables: the tables of other areas that it references are
+listed as external references, and the foreign keys to them are left out, so each table is created
+by exactly one area.
+
+Usage: genareas.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file, partition its entities
+  into subject areas, and write a report of the areas
+
+Options:
+  --input TEXT            Input Entity-Relationship Markup Language file
+                          (default is standard input, also represented by a
+                          dash "-")
+
+  --output TEXT           Output report file, in Markdown (default is
+                          standard output, also represented by a dash "-")
+
+  --overwrite             If specified, overwrite the output files if they
+                          already exist
+
+  --logging TEXT          Set logging to the specified level: NOTSET, DEBUG,
+                          INFO, WARNING, ERROR, CRITICAL
+
+  --resolution FLOAT      Resolution of the community detection: higher
+                          values make more, smaller subject areas.  Default
+                          is 1.0.
+
+  --erml TEXT             If specified, write the model with the subject area
+                          of each entity set to this ERML file
+
+  --output-dir TEXT       If specified, write the ERML, SQL and catalog of
+                          each subject area to files named after the area in
+                          this directory, replacing them if they exist
+
+  --dialect [CRDB|PG]     Set the database dialect of the SQL files: "CRDB"
+                          for CockroachDB or "PG" for PostgreSQL.  Default is
+                          CRDB.
+
+  --jobs INTEGER          Number of worker processes for the subject area
+                          files (default is the number of CPUs)
+
+  --reproducible          If specified, stamp the outputs with the digest of
+                          the model instead of the time they were generated,
+                          so the same model always generates the same bytes,
+                          and leave an output file alone if it is unchanged
+
+  --help                  Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import concurrent.futures
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, select_model_slice, build_physical_model, model_errors, model_digest, \
+        generation_stamp, staging_path, replace_if_changed
+    from .genschema import genschema
+    from .gencatalog import gencatalog
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, select_model_slice, build_physical_model, model_errors, model_digest, \
+        generation_stamp, staging_path, replace_if_changed
+    from genschema import genschema
+    from gencatalog import gencatalog
+
+
+# Weights of the relationships between entities: a subclass belongs with its base class,
+# and a required parent is needed by every slice of the model that has the child
+INHERITANCE_WEIGHT = 3
+REQUIRED_PARENT_WEIGHT = 2
+OTHER_WEIGHT = 1
+
+# Subject area of the entities that have no relationships
+STANDALONE_AREA = 'standalone'
+
+
+def relationship_weight(participants):
+    '''
+    Weigh a relationship between two entities for the partitioning
+    '''
+    kinds = set(participant['kind'] for participant in participants)
+    if 'base_class' in kinds:
+        return INHERITANCE_WEIGHT
+    if 'one' in kinds and 'zero_or_more' in kinds:
+        return REQUIRED_PARENT_WEIGHT
+    return OTHER_WEIGHT
+
+
+@logger.catch
+def build_relationship_graph(er_yaml):
+    '''
+    Build the weighted, undirected relationship graph: a dictionary of entity name to a dictionary
+    of related entity name to the total weight of their relationships.  Self references are left out.
+    '''
+    logger.debug('Entering build_relationship_graph()')
+    graph = { entity_outer['entity']['name']: { } for entity_outer in er_yaml['entities'] }
+    for relationship in er_yaml['relationships']:
+        participants = relationship['relationship']['participants']
+        names = [ participant['name'] for participant in participants ]
+        if names[0] == names[1]:
+            continue
+        weight = relationship_weight(participants)
+        for name, other_name in [ (names[0], names[1]), (names[1], names[0]) ]:
+            graph.setdefault(name, { })
+            graph[name].update( { other_name: graph[name].get(other_name, 0) + weight } )
+    logger.debug('Leaving build_relationship_graph()')
+    return graph
+
+
+def move_nodes(graph, resolution):
+    '''
+    The first phase of the Louvain method: move each node to the neighboring community that most
+    increases the modularity, until no move does.  A self loop of weight w in graph is stored as 2 * w,
+    so the degree of a node is the sum of its weights.  Returns the community of each node,
+    and whether any node moved.
+    '''
+    degrees = { node: sum(neighbors.values()) for node, neighbors in graph.items() }
+    total_weight = sum(degrees.values())
+    community = { node: node for node in graph }
+    community_degrees = dict(degrees)
+    moved = False
+    improved = True
+    while improved and total_weight > 0:
+        improved = False
+        for node in sorted(graph):
+            old_community = community[node]
+            links = { }
+            for neighbor, weight in graph[node].items():
+                if neighbor != node:
+                    links.update( { community[neighbor]: links.get(community[neighbor], 0) + weight } )
+            community_degrees[old_community] -= degrees[node]
+            best_community = old_community
+            best_gain = links.get(old_community, 0) - \
+                resolution * community_degrees[old_community] * degrees[node] / total_weight
+            for other_community in sorted(links):
+                gain = links[other_community] - \
+                    resolution * community_degrees[other_community] * degrees[node] / total_weight
+                if gain > best_gain + 1e-9:
+                    best_community, best_gain = other_community, gain
+            community_degrees[best_community] += degrees[node]
+            if best_community != old_community:
+                community.update( { node: best_community } )
+                improved = True
+                moved = True
+    return community, moved
+
+
+def aggregate_communities(graph, community):
+    '''
+    The second phase of the Louvain method: make a graph with a node for each community
+    '''
+    aggregated = { }
+    for node, neighbors in graph.items():
+        node_community = community[node]
+        aggregated.setdefault(node_community, { })
+        for neighbor, weight in neighbors.items():
+            neighbor_community = community[neighbor]
+            aggregated[node_community].update(
+                { neighbor_community: aggregated[node_community].get(neighbor_community, 0) + weight } )
+    return aggregated
+
+
+@logger.catch
+def detect_communities(graph, resolution=1.0):
+    '''
+    Partition the nodes of a weighted, undirected graph into communities with the Louvain method.
+    Returns a dictionary of node to community, where each community is named after one of its nodes.
+    '''
+    logger.debug('Entering detect_communities()')
+    partition = { node: node for node in graph }
+    level_graph = graph
+    level = 0
+    while True:
+        community, moved = move_nodes(level_graph, resolution)
+        if not moved:
+            break
+        partition = { node: community[partition[node]] for node in partition }
+        level_graph = aggregate_communities(level_graph, community)
+        level += 1
+        logger.debug(f'{i(1)}level={level} communities={len(level_graph)}')
+    logger.debug('Leaving detect_communities()')
+    return partition
+
+
+def modularity(graph, partition):
+    '''
+    Compute the modularity of a partition of a weighted, undirected graph
+    '''
+    total_weight = sum(sum(neighbors.values()) for neighbors in graph.values())
+    if total_weight == 0:
+        return 0.0
+    internal = { }
+    degrees = { }
+    for node, neighbors in graph.items():
+        community = partition[node]
+        degrees.update( { community: degrees.get(community, 0) + sum(neighbors.values()) } )
+        internal.update( { community: internal.get(community, 0) +
+                           sum(weight for neighbor, weight in neighbors.items() if partition[neighbor] == community) } )
+    return sum(internal[community] / total_weight - (degrees[community] / total_weight) ** 2
+               for community in degrees)
+
+
+@logger.catch
+def build_subject_areas(er_yaml, resolution=1.0):
+    '''
+    Partition the entities into subject areas, each named after its most related entity
+    (entities without relationships go in the "standalone" area).
+    Returns a dictionary of entity name to subject area, the relationship graph, and the modularity.
+    '''
+    logger.debug('Entering build_subject_areas()')
+    graph = build_relationship_graph(er_yaml)
+    partition = detect_communities(graph, resolution)
+    members = { }
+    for entity_name, community in partition.items():
+        members.setdefault(community, [ ]).append(entity_name)
+    areas = { }
+    for community, entity_names in members.items():
+        if len(entity_names) == 1 and not graph[entity_names[0]]:
+            area_name = STANDALONE_AREA
+        else:
+            area_name = min(entity_names, key=lambda entity_name: (-sum(graph[entity_name].values()), entity_name))
+        for entity_name in entity_names:
+            areas.update( { entity_name: area_name } )
+    logger.debug('Leaving build_subject_areas()')
+    return areas, graph, modularity(graph, partition)
+
+
+def build_cut_relationships(er_yaml, areas):
+    '''
+    Find the relationships between entities of different subject areas
+    '''
+    cut = [ ]
+    for relationship in er_yaml['relationships']:
+        participants = relationship['relationship']['participants']
+        if areas[participants[0]['name']] != areas[participants[1]['name']]:
+            cut.append(participants)
+    return cut
+
+
+def build_table_areas(model):
+    '''
+    Assign each table of the physical model to the subject area that defines it, so each table is
+    defined by exactly one area: an entity table by the area of its entity, and an enum table by the area
+    of the first entity with the enum attribute.  (A many-to-many mapping table is defined by the area of
+    the first of its entities by name, see genschema.generate_entities.)
+    '''
+    table_areas = { }
+    for entity_outer in build_physical_model(model)['entities']:
+        entity = entity_outer['entity']
+        table_areas.update( { entity['name']: entity['subject_area'] } )
+        for attribute_name, attribute_values in (entity.get('attributes', None) or { }).items():
+            if attribute_values.get('type', None) == 'enum':
+                table_areas.setdefault('enum_' + attribute_name, entity['subject_area'])
+    return table_areas
+
+
+def write_area_files(area_name, model, table_areas, input, output_dir, dialect, reproducible=False):
+    '''
+    Worker process entry point to write the ERML, SQL and catalog of one subject area.
+    The ERML and catalog are of the slice of the model with the area and its required parents;
+    the SQL has only the tables the area defines (see build_table_areas), and the others
+    are external references (see genschema.generate_entities).
+    If reproducible is true, the files are stamped with the digest of the model, and a file
+    whose content is unchanged is left alone.
+    '''
+    model_slice = select_model_slice(model, subject_areas=[ area_name ])
+    external_tables = sorted(table_name for table_name, table_area in table_areas.items() if table_area != area_name)
+    writers = [
+        ('erml', lambda output_object: print(yaml.dump(model_slice), file=output_object)),
+        ('sql', lambda output_object: genschema(model, input, output_object, dialect=dialect, reproducible=reproducible,
+                                                external_tables=external_tables)),
+        ('md', lambda output_object: gencatalog(model_slice, input, output_object, reproducible)),
+    ]
+    for extension, write in writers:
+        area_path = os.path.join(output_dir, f'{area_name}.{extension}')
+        output_path = staging_path(area_path) if reproducible else area_path
+        with open(output_path, 'w') as output_object:
+            write(output_object)
+        if reproducible:
+            replace_if_changed(output_path, area_path)
+    return area_name
+
+
+@logger.catch
+def generate_report(areas, cut, modularity_value, num_relationships, output_object):
+    '''
+    Write the subject areas and the relationships cut between them as a Markdown report
+    '''
+    logger.debug('Entering generate_report()')
+    area_members = { }
+    for entity_name, area_name in areas.items():
+        area_members.setdefault(area_name, [ ]).append(entity_name)
+    print(f'{len(areas)} entities in {len(area_members)} subject areas; {len(cut)} of {num_relationships} '
+          f'relationships cross subject areas.  Modularity is {modularity_value:.3f}.', file=output_object)
+    print(file=output_object)
+    for area_name in sorted(area_members):
+        print('---', file=output_object)
+        print(f'## {area_name}\n', file=output_object)
+        print(f'**Entities:** {", ".join(sorted(area_members[area_name]))}  ', file=output_object)
+        required = sorted(set(parent['name'] for child, parent in
+                              [ (participants[end], participants[1 - end]) for participants in cut for end in [ 0, 1 ] ]
+                              if areas[child['name']] == area_name and child['kind'] in [ 'zero_or_more', 'subclass' ]
+                              and parent['kind'] in [ 'one', 'base_class' ]))
+        if required:
+            print(f'**Required parents in other subject areas:** '
+                  f'{", ".join(f"{name} ({areas[name]})" for name in required)}  ', file=output_object)
+        print(file=output_object)
+    if cut:
+        print('---', file=output_object)
+        print(f'## Cut Relationships\n', file=output_object)
+        print('Entity | Subject Area | Kind | Related Entity | Subject Area | Kind', file=output_object)
+        print('------ | ------------ | ---- | -------------- | ------------ | ----', file=output_object)
+        for participants in cut:
+            print(f'{participants[0]["name"]} | {areas[participants[0]["name"]]} | {participants[0]["kind"]} | '
+                  f'{participants[1]["name"]} | {areas[participants[1]["name"]]} | {participants[1]["kind"]}',
+                  file=output_object)
+    logger.debug('Leaving generate_report()')
+
+
+@logger.catch
+def genareas(er_yaml, input, output_object, resolution=1.0, erml_object=None, output_dir=None, dialect='CRDB',
+             jobs=None, reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file, partition its entities into subject areas,
+    and write a report of the areas, and optionally the model with its subject areas and the files of each area
+
+    If reproducible is true, the report and the files of each area are stamped with the digest of the model
+    instead of the time they were generated.
+    '''
+    logger.debug('Entering genareas()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    areas, graph, modularity_value = build_subject_areas(er_yaml, resolution)
+    cut = build_cut_relationships(er_yaml, areas)
+    logger.opt(lazy=True).info('areas={}', lambda: json.dumps(areas, indent=4))
+
+    print(f'# Subject Areas', file=output_object)
+    print(f'Generated by Zepster  ', file=output_object)
+    print(f'Source: {"stdin" if input == "-" else input}  ', file=output_object)
+    print(f'Generated: {stamp}', file=output_object)
+    print(file=output_object)
+    generate_report(areas, cut, modularity_value, len(er_yaml['relationships']), output_object)
+
+    # The model with the subject area of each entity set
+    model = dict(er_yaml)
+    model.update( { 'entities': [ { 'entity': dict(entity_outer['entity'],
+                                                   subject_area=areas[entity_outer['entity']['name']]) }
+                                  for entity_outer in er_yaml['entities'] ] } )
+    if erml_object is not None:
+        print(yaml.dump(model), file=erml_object)
+    if output_dir is not None:
+        table_areas = build_table_areas(model)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [ executor.submit(write_area_files, area_name, model, table_areas, input, output_dir, dialect,
+                                        reproducible)
+                        for area_name in sorted(set(areas.values())) ]
+            for future in concurrent.futures.as_completed(futures):
+                logger.info(f'Wrote the files of subject area {future.result()}')
+    logger.debug('Leaving genareas()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output report file, in Markdown (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output files if they already exist',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--resolution',
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    help='Resolution of the community detection: higher values make more, smaller subject areas.  Default is 1.0.',
+)
+@click.option(
+    '--erml',
+    type=str,
+    default=None,
+    help='If specified, write the model with the subject area of each entity set to this ERML file',
+)
+@click.option(
+    '--output-dir',
+    type=str,
+    default=None,
+    help='If specified, write the ERML, SQL and catalog of each subject area to files named after the area '
+         'in this directory, replacing them if they exist',
+)
+@click.option(
+    '--dialect',
+    type=click.Choice(['CRDB', 'PG'], case_sensitive=False),
+    default='CRDB',
+    help='Set the database dialect of the SQL files: "CRDB" for CockroachDB or "PG" for PostgreSQL.  Default is CRDB.',
+)
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Number of worker processes for the subject area files (default is the number of CPUs)',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the outputs with the digest of the model instead of the time they were generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, overwrite, logging, resolution, erml, output_dir, dialect, jobs, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file, partition its entities into subject areas,
+    and write a report of the areas
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} '
+        f'resolution={resolution} erml={erml} output_dir={output_dir} dialect={dialect} jobs={jobs} '
+        f'reproducible={reproducible}'
+    )
+
+    erml_object = None
+    if erml is not None:
+        if overwrite == False and os.path.exists(erml):
+            print(f'Error: Specified ERML file already exists: {erml}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            erml_path = staging_path(erml) if reproducible else erml
+            erml_object = open(erml_path, 'w')
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified ERML file {erml}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if output_dir is not None and not os.path.isdir(output_dir):
+        print(f'Error: Specified output directory does not exist: {output_dir}', file=sys.stderr)
+        sys.exit(1)
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    genareas(er_yaml, input, output_object, resolution, erml_object, output_dir, dialect.upper(), jobs, reproducible)
+
+    if erml_object is not None:
+        erml_object.close()
+        if reproducible:
+            replace_if_changed(erml_path, erml)
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -0,0 +1,397 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to build the artifacts of Entity-Relationship diagrams created by the yEd graph editor,
+rebuilding only those that are out of date.
+
+The build is a graph of stages: the diagrams are converted to an ERML file (generml), from
+which the SQL schema of each dialect (genschema), the data catalog (gencatalog) and the
+Python enums (genpyenums) are generated.  A stage is rebuilt only if the content of its inputs,
+the source of its tool or its options changed since it was last built, or its outputs are
+missing or were changed by hand, as recorded in a state file in the output directory.
+The stages that do not depend on each other run in parallel.  The outputs are generated
+in reproducible mode, so an output whose content is unchanged keeps its modification time.
+
+A lock on the state file keeps concurrent builds in the same output directory from
+clobbering each other: a build waits for the one running to finish.
+
+Usage: genbuild.py [OPTIONS]
+
+  Build the ERML, SQL schemas, catalog and enums of Entity-Relationship
+  diagrams created by the yEd graph editor, rebuilding only the stale ones
+
+Options:
+  --input TEXT            Input GraphML file, or directory of GraphML files.
+                          Give more than once to build a workspace of several
+                          diagrams.  [required]
+
+  --output-dir TEXT       Directory to write the artifacts and the build state
+                          to (default is the current directory)
+
+  --name TEXT             Base name of the artifacts (default is the name of
+                          the input file or directory, or "model")
+
+  --dialect [CRDB|PG]     Database dialect to generate a SQL schema for: "CRDB"
+                          for CockroachDB or "PG" for PostgreSQL.  Give more
+                          than once for several dialects.  Default is CRDB.
+
+  --force                 If specified, rebuild all the artifacts, even those
+                          that are up to date
+
+  --logging TEXT          Set logging to the specified level: NOTSET, DEBUG,
+                          INFO, WARNING, ERROR, CRITICAL
+
+  --jobs INTEGER          Number of stages to run in parallel (default is the
+                          number of CPUs)
+
+  --help                  Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import concurrent.futures
+import hashlib
+import json
+import subprocess
+from toposort import toposort
+if __package__:
+    from .util import file_digest
+else:
+    from util import file_digest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# The directory of the tools that the stages run
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The modules that every tool depends on, which are part of its version
+TOOL_MODULES = [ 'util.py', 'json_schema_erml.py', 'json_schema_graphml.py' ]
+
+# The name of the state file in the output directory
+STATE_FILE = '.zepster-build.json'
+STATE_VERSION = 1
+
+
+def graphml_files(inputs):
+    '''
+    The GraphML files of the inputs, each a file or a directory of GraphML files, as generml reads them
+    '''
+    files = [ ]
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            files.extend(sorted(os.path.join(input_path, file_name) for file_name in os.listdir(input_path)
+                                if file_name.endswith('.graphml')))
+        else:
+            files.append(input_path)
+    return files
+
+
+def build_stages(inputs, output_dir, name, dialects):
+    '''
+    Build the stage graph: a list of stages, each a dictionary of its name, tool, command-line options,
+    input files, output files, and the names of the stages it depends on
+    '''
+    erml = os.path.join(output_dir, f'{name}.erml')
+    stages = [ {
+        'name': 'erml',
+        'tool': 'generml.py',
+        'options': [ option for input in inputs for option in [ '--input', input ] ] + [ '--output', erml ],
+        'inputs': graphml_files(inputs),
+        'outputs': [ erml ],
+        'depends': [ ]
+    } ]
+    for dialect in dialects:
+        sql = os.path.join(output_dir, f'{name}.{dialect.lower()}.sql')
+        stages.append( {
+            'name': f'schema_{dialect.lower()}',
+            'tool': 'genschema.py',
+            'options': [ '--input', erml, '--output', sql, '--dialect', dialect ],
+            'inputs': [ erml ],
+            'outputs': [ sql ],
+            'depends': [ 'erml' ]
+        } )
+    catalog = os.path.join(output_dir, f'{name}.md')
+    stages.append( {
+        'name': 'catalog',
+        'tool': 'gencatalog.py',
+        'options': [ '--input', erml, '--output', catalog ],
+        'inputs': [ erml ],
+        'outputs': [ catalog ],
+        'depends': [ 'erml' ]
+    } )
+    enums = os.path.join(output_dir, f'{name}_enums.py')
+    stages.append( {
+        'name': 'enums',
+        'tool': 'genpyenums.py',
+        'options': [ '--input', erml, '--output', enums ],
+        'inputs': [ erml ],
+        'outputs': [ enums ],
+        'depends': [ 'erml' ]
+    } )
+    return stages
+
+
+def stage_layers(stages):
+    '''
+    Order the stages into layers: the stages of a layer depend only on stages of earlier layers,
+    so they can run in parallel
+    '''
+    return [ sorted(layer) for layer in toposort({ stage['name']: set(stage['depends']) for stage in stages }) ]
+
+
+# The version of each tool, computed once
+tool_digests = { }
+
+
+def tool_digest(tool):
+    '''
+    The version of a tool: the digest of its source and of the modules it depends on
+    '''
+    if tool not in tool_digests:
+        tool_digests.update( { tool: file_digest([ os.path.join(TOOLS_DIR, module)
+                                                   for module in [ tool ] + TOOL_MODULES ]) } )
+    return tool_digests[tool]
+
+
+def stage_key(stage):
+    '''
+    The digest of everything that a stage's outputs are generated from: the content of its inputs,
+    the version of its tool, and its options
+    '''
+    content = { 'tool': tool_digest(stage['tool']), 'options': stage['options'],
+                'inputs': stage['inputs'], 'content': file_digest(stage['inputs']) }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_up_to_date(stage, key, state):
+    '''
+    A stage is up to date if it was last built from the same key, and its outputs are as it left them
+    '''
+    built = state['stages'].get(stage['name'])
+    if built is None or built['key'] != key:
+        return False
+    for output in stage['outputs']:
+        if not os.path.isfile(output) or file_digest([ output ]) != built['outputs'].get(output):
+            return False
+    return True
+
+
+def run_stage(stage, logging):
+    '''
+    Run the tool of a stage in its own process, returning its exit code
+    '''
+    command = [ sys.executable, os.path.join(TOOLS_DIR, stage['tool']) ] + stage['options'] + \
+              [ '--overwrite', '--reproducible', '--logging', logging ]
+    logger.info(f'Running {" ".join(command)}')
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    returncode = process.wait()
+    if returncode != 0:
+        # A tool that fails leaves the temporary file it was writing its output to
+        for output in stage['outputs']:
+            staging = f'{output}.tmp{process.pid}'
+            if os.path.exists(staging):
+                os.remove(staging)
+    return returncode
+
+
+def read_state(state_path):
+    '''
+    Read the build state: the key and the output digests of each stage when it was last built
+    '''
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r') as state_object:
+                state = json.load(state_object)
+            if state.get('version') == STATE_VERSION:
+                return state
+        except ValueError as ex:
+            logger.warning(f'Ignoring the build state file, which is not valid: {state_path} ({ex})')
+    return { 'version': STATE_VERSION, 'stages': { } }
+
+
+def write_state(state_path, state):
+    '''
+    Write the build state, replacing the state file only when the new one is complete
+    '''
+    staging = f'{state_path}.tmp{os.getpid()}'
+    with open(staging, 'w') as state_object:
+        json.dump(state, state_object, indent=2, sort_keys=True)
+    os.replace(staging, state_path)
+
+
+def lock_state(state_path):
+    '''
+    Lock the build state for the duration of a build, waiting for any other build holding it.
+    Returns the open lock file, which holds the lock until it is closed.
+    '''
+    lock_object = open(f'{state_path}.lock', 'w')
+    if fcntl is not None:
+        fcntl.flock(lock_object, fcntl.LOCK_EX)
+    else:
+        logger.warning('File locks are not supported on this platform: concurrent builds are not prevented')
+    return lock_object
+
+
+@logger.catch
+def genbuild(inputs, output_dir, name, dialects=[ 'CRDB' ], force=False, logging='WARNING', jobs=None):
+    '''
+    Generally-callable entry point to
+    build the artifacts of Entity-Relationship diagrams created by the yEd graph editor,
+    rebuilding only those that are out of date.  Returns the names of the stages that failed.
+    '''
+    logger.debug('Entering genbuild()')
+    stages = build_stages(inputs, output_dir, name, dialects)
+    stages_by_name = { stage['name']: stage for stage in stages }
+    state_path = os.path.join(output_dir, STATE_FILE)
+
+    lock_object = lock_state(state_path)
+    try:
+        state = read_state(state_path)
+        failed = [ ]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            for layer in stage_layers(stages):
+                futures = { }
+                for stage_name in layer:
+                    stage = stages_by_name[stage_name]
+                    if any(depend in failed for depend in stage['depends']):
+                        print(f'{stage_name}: skipped, as a stage it depends on failed')
+                        failed.append(stage_name)
+                        continue
+                    key = stage_key(stage)
+                    if not force and is_up_to_date(stage, key, state):
+                        print(f'{stage_name}: up to date')
+                        continue
+                    futures.update( { executor.submit(run_stage, stage, logging): (stage, key) } )
+                for future in concurrent.futures.as_completed(futures):
+                    stage, key = futures[future]
+                    if future.result() != 0:
+                        print(f'{stage["name"]}: failed')
+                        state['stages'].pop(stage['name'], None)
+                        failed.append(stage['name'])
+                    else:
+                        print(f'{stage["name"]}: built {", ".join(stage["outputs"])}')
+                        state['stages'].update( { stage['name']: {
+                            'key': key,
+                            'outputs': { output: file_digest([ output ]) for output in stage['outputs'] }
+                        } } )
+                write_state(state_path, state)
+    finally:
+        lock_object.close()
+    logger.debug('Leaving genbuild()')
+    return failed
+
+
+@click.command()
+@click.option(
+    '--input',
+    multiple=True,
+    required=True,
+    help='Input GraphML file, or directory of GraphML files.  Give more than once to build a workspace '
+         'of several diagrams.',
+)
+@click.option(
+    '--output-dir',
+    default='.',
+    help='Directory to write the artifacts and the build state to (default is the current directory)',
+)
+@click.option(
+    '--name',
+    type=str,
+    default=None,
+    help='Base name of the artifacts (default is the name of the input file or directory, or "model")',
+)
+@click.option(
+    '--dialect',
+    type=click.Choice(['CRDB', 'PG'], case_sensitive=False),
+    multiple=True,
+    default=[ 'CRDB' ],
+    help='Database dialect to generate a SQL schema for: "CRDB" for CockroachDB or "PG" for PostgreSQL.  '
+         'Give more than once for several dialects.  Default is CRDB.',
+)
+@click.option(
+    '--force',
+    is_flag=True,
+    default=False,
+    help='If specified, rebuild all the artifacts, even those that are up to date',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Number of stages to run in parallel (default is the number of CPUs)',
+)
+@logger.catch
+def main(input, output_dir, name, dialect, force, logging, jobs):
+    '''
+    Build the ERML, SQL schemas, catalog and enums of Entity-Relationship diagrams
+    created by the yEd graph editor, rebuilding only the stale ones
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output_dir={output_dir} name={name} dialect={dialect} force={force} '
+        f'logging={logging} jobs={jobs}'
+    )
+
+    for input_path in input:
+        if not os.path.exists(input_path):
+            print(f'Error: Specified input file does not exist: {input_path}', file=sys.stderr)
+            sys.exit(1)
+    if not os.path.isdir(output_dir):
+        print(f'Error: Specified output directory does not exist: {output_dir}', file=sys.stderr)
+        sys.exit(1)
+    if name is None:
+        name = os.path.splitext(os.path.basename(os.path.normpath(input[0])))[0] if len(input) == 1 else 'model'
+
+    # The same dialect given twice is built once
+    dialects = sorted(set(dialect_name.upper() for dialect_name in dialect))
+    failed = genbuild(list(input), output_dir, name, dialects, force, logging, jobs)
+    if failed:
+        print(f'Error: The build failed in: {", ".join(failed)}', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -0,0 +1,268 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to estimate the storage capacity of the schema generated from an
+Entity-Relationship Markup Language (ERML) file.
+
+The estimate combines the row-count hints of the entities with the column types and
+indexes that genschema generates:
+
+    expected_rows: 1000000     # rows expected now
+    growth_per_day: 5000       # rows expected to be added each day
+
+Without them, the "data_hints" of gendata are used, so a child can be sized as a fan-out
+of its parent.  The average size of the values of an attribute can be given with its
+"avg_size" hint, in bytes.
+
+Usage: gencapacity.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write a capacity
+  estimate as a JSON file
+
+Options:
+  --input TEXT             Input Entity-Relationship Markup Language file
+                           (default is standard input, also represented by a
+                           dash "-")
+
+  --output TEXT            Output JSON estimate file (default is standard
+                           output, also represented by a dash "-")
+
+  --overwrite              If specified, overwrite the output file if it
+                           already exists
+
+  --logging TEXT           Set logging to the specified level: NOTSET, DEBUG,
+                           INFO, WARNING, ERROR, CRITICAL
+
+  --generate-keys BOOLEAN  Indicates whether the schema was generated with
+                           synthetic keys.  Default is true.
+
+  --default-rows INTEGER   Number of rows for tables without a row-count
+                           hint.  Default is 1000.
+
+  --horizon-days INTEGER   Number of days of growth to estimate the storage
+                           for.  Default is 365.
+
+  --replicas INTEGER       Number of replicas of each range (CockroachDB).
+                           Default is 3.
+
+  --reproducible           If specified, stamp the output with the digest of
+                           the model instead of the time it was generated, so
+                           the same model always generates the same bytes, and
+                           leave an output file alone if it is unchanged
+
+  --help                   Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, build_capacity_estimates, CAPACITY_DIALECTS, DEFAULT_ROWS, DEFAULT_HORIZON_DAYS, DEFAULT_REPLICAS, \
+        model_errors, model_digest, generation_stamp, staging_path, replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, build_capacity_estimates, CAPACITY_DIALECTS, DEFAULT_ROWS, DEFAULT_HORIZON_DAYS, DEFAULT_REPLICAS, \
+        model_errors, model_digest, generation_stamp, staging_path, replace_if_changed
+
+
+@logger.catch
+def gencapacity(er_yaml, input, output_object, default_rows=DEFAULT_ROWS, horizon_days=DEFAULT_HORIZON_DAYS,
+                replicas=DEFAULT_REPLICAS, generate_keys=True, reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write a capacity estimate
+
+    If reproducible is true, the estimate is stamped with the digest of the model instead of the time
+    it was generated.
+    '''
+    logger.debug('Entering gencapacity()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    capacity = build_capacity_estimates(er_yaml, default_rows, horizon_days, replicas, generate_keys)
+    totals = { }
+    for dialect in CAPACITY_DIALECTS:
+        totals.update( { dialect: { size_name: sum(table_capacity['dialects'][dialect][size_name]
+                                                   for table_capacity in capacity.values())
+                                    for size_name in [ 'table_bytes', 'index_bytes', 'total_bytes' ] } } )
+    report = { 'generated_by': 'Zepster',
+               'source': 'stdin' if input == '-' else input,
+               'generated': stamp,
+               'horizon_days': horizon_days,
+               'replicas': replicas,
+               'tables': capacity,
+               'totals': totals }
+    print(json.dumps(report, indent=4), file=output_object)
+    logger.debug('Leaving gencapacity()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output JSON estimate file (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output file if it already exists',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--generate-keys',
+    type=click.BOOL,
+    default=True,
+    help='Indicates whether the schema was generated with synthetic keys.  Default is true.'
+)
+@click.option(
+    '--default-rows',
+    type=int,
+    default=DEFAULT_ROWS,
+    help=f'Number of rows for tables without a row-count hint.  Default is {DEFAULT_ROWS}.',
+)
+@click.option(
+    '--horizon-days',
+    type=int,
+    default=DEFAULT_HORIZON_DAYS,
+    help=f'Number of days of growth to estimate the storage for.  Default is {DEFAULT_HORIZON_DAYS}.',
+)
+@click.option(
+    '--replicas',
+    type=int,
+    default=DEFAULT_REPLICAS,
+    help=f'Number of replicas of each range (CockroachDB).  Default is {DEFAULT_REPLICAS}.',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, overwrite, logging, generate_keys, default_rows, horizon_days, replicas, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file and write a capacity estimate as a JSON file
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} '
+        f'generate_keys={generate_keys} default_rows={default_rows} horizon_days={horizon_days} replicas={replicas} '
+        f'reproducible={reproducible}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    gencapacity(er_yaml, input, output_object, default_rows, horizon_days, replicas, generate_keys, reproducible)
+
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -23,28 +23,55 @@ Usage: gencatalog.py [OPTIONS]
   file and write a data catalog output file
 
 Options:
-  --input TEXT    Input Entity-Relationship Markup Language file (default is
-                  standard input, also represented by a dash "-")
-  --output TEXT   Output catalog file (default is standard output, also
-                  represented by a dash "-")
-  --overwrite     If specified, overwrite the output file if it already exists
-  --logging TEXT  Set logging to the specified level: NOTSET, DEBUG, INFO,
-                  WARNING, ERROR, CRITICAL
-  --format TEXT   Set the catalog format: (currently only "md")
-  --help          Show this message and exit.
+  --input TEXT         Input Entity-Relationship Markup Language file (default
+                       is standard input, also represented by a dash "-")
+  --output TEXT        Output catalog file (default is standard output, also
+                       represented by a dash "-")
+  --overwrite          If specified, overwrite the output file if it already
+                       exists
+  --logging TEXT       Set logging to the specified level: NOTSET, DEBUG,
+                       INFO, WARNING, ERROR, CRITICAL
+  --format TEXT        Set the catalog format: (currently only "md")
+  --entities TEXT      If specified, generate only these entities (comma-
+                       separated), with their required parents and enums
+  --subject-area TEXT  If specified, generate only the entities of these
+                       subject areas (comma-separated), with their required
+                       parents and enums
+  --reproducible       If specified, stamp the output with the digest of the
+                       model instead of the time it was generated, so the same
+                       model always generates the same bytes, and leave an
+                       output file alone if it is unchanged
+  --delete-impact      If specified, include what deleting a row of each
+                       entity touches: the tables it cascades to, sets to null
+                       in, or is blocked by, and the tables it locks
+  --help               Show this message and exit.
 '''
 
 import sys
 import os.path
+import io
 from loguru import logger
 import click
 import cardinality
 import yaml
 import jsonschema
-import datetime
-from json_schema_erml import json_schema_erml
 import json
-from util import i, topological_sort_entities, build_entity_parents_and_children
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, topological_sort_entities, build_entity_parents_and_children, build_inheritance, \
+        apply_inheritance_strategies, \
+        build_hierarchies, build_temporal_entities, TEMPORAL_VALID_FROM, TEMPORAL_VALID_TO, \
+        attribute_family, DEFAULT_FAMILY, build_retention_policies, build_delete_impact, build_capacity_estimates, \
+        CAPACITY_DIALECTS, DEFAULT_HORIZON_DAYS, DEFAULT_REPLICAS, format_bytes, select_model_slice, \
+        model_digest, generation_stamp, staging_path, replace_if_changed, model_errors
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, topological_sort_entities, build_entity_parents_and_children, build_inheritance, \
+        apply_inheritance_strategies, \
+        build_hierarchies, build_temporal_entities, TEMPORAL_VALID_FROM, TEMPORAL_VALID_TO, \
+        attribute_family, DEFAULT_FAMILY, build_retention_policies, build_delete_impact, build_capacity_estimates, \
+        CAPACITY_DIALECTS, DEFAULT_HORIZON_DAYS, DEFAULT_REPLICAS, format_bytes, select_model_slice, \
+        model_digest, generation_stamp, staging_path, replace_if_changed, model_errors
 
 
 @logger.catch
@@ -54,15 +81,15 @@ def generate_enums(er_yaml, output_object):
     '''
     logger.debug('Entering generate_enums()')
     enums = er_yaml['enums']
-    logger.debug(f"enums=\n{json.dumps(enums, indent=4)}")
+    logger.opt(lazy=True).debug("enums=\n{}", lambda: json.dumps(enums, indent=4))
 
     # Index the enums
     enum_indices = { }
     for enum_index, enum_outer in enumerate(enums):
         enum = enum_outer['enum']
-        logger.debug(f'enum_index={enum_index} for enum:\n{yaml.dump(enum)}')
+        logger.opt(lazy=True).debug(f'enum_index={enum_index} for enum:\n{{}}', lambda: yaml.dump(enum))
         enum_indices.update( { enum['name']: enum_index } )
-    logger.debug(f'enum_indices=\n{json.dumps(enum_indices, indent=4)}')
+    logger.opt(lazy=True).debug('enum_indices=\n{}', lambda: json.dumps(enum_indices, indent=4))
 
     klist = list(enum_indices.keys()).copy()
     klist.sort()
@@ -70,7 +97,7 @@ def generate_enums(er_yaml, output_object):
         enum_index = enum_indices[enum_name]
         enum_outer = enums[enum_index]
         enum = enum_outer['enum']
-        logger.debug(f'enum_index={enum_index} enum={enum}')
+        logger.debug('enum_index={} enum={}', enum_index, enum)
         print('---', file=output_object)
         print(f'## {enum_name}\n', file=output_object)
         if 'description' in enum:
@@ -115,11 +142,23 @@ def generate_enums(er_yaml, output_object):
 
 
 @logger.catch
-def generate_entities(er_yaml, output_object):
+def generate_entities(er_yaml, output_object, include_delete_impact=False):
     '''
-    Generate the data catalog info for entity tables
+    Generate the data catalog info for entity tables, and what deleting a row of each entity touches
+    if include_delete_impact is true.
+
+    The columns and relationships are those of the tables genschema creates, so an entity in a class hierarchy
+    that is not stored table-per-level has its inheritance strategy applied (see util.apply_inheritance_strategies),
+    and the catalog of each entity in such a hierarchy says how it is mapped to tables.
     '''
     logger.debug('Entering generate_entities()')
+    # Only the hierarchies that select a strategy other than the default are described
+    inheritance = { entity_name: info for entity_name, info in build_inheritance(er_yaml).items()
+                    if info['strategy'] != 'table_per_level' }
+    delete_impact = build_delete_impact(er_yaml) if include_delete_impact else { }
+    logical_entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    er_yaml = apply_inheritance_strategies(er_yaml)
+
     # Topologically sort the entities (so we can get the synthesized many-to-many mapping tables)
     graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
     logger.debug(f'graph={graph}')
@@ -127,27 +166,36 @@ def generate_entities(er_yaml, output_object):
     logger.debug(f'mm_synthesized={mm_synthesized}')
  
     entities_pc = build_entity_parents_and_children(er_yaml)
-    logger.debug(f'after build_entity_parents_and_children(): entities_pc={json.dumps(entities_pc, indent=4)}')
+    logger.opt(lazy=True).debug('after build_entity_parents_and_children(): entities_pc={}',
+                                lambda: json.dumps(entities_pc, indent=4))
+
+    hierarchies = build_hierarchies(er_yaml)
+    temporal_entities = build_temporal_entities(er_yaml)
+    retention_policies = build_retention_policies(er_yaml)
 
     entities = er_yaml['entities']
-    logger.debug(f'entities={yaml.dump(entities)}')
+    logger.opt(lazy=True).debug('entities={}', lambda: yaml.dump(entities))
 
     # Index the entities
     entity_indices = { }
     for entity_index, entity_outer in enumerate(entities):
         entity = entity_outer['entity']
-        logger.debug(f'entity_index={entity_index} for entity:\n{yaml.dump(entity)}')
+        logger.opt(lazy=True).debug(f'entity_index={entity_index} for entity:\n{{}}', lambda: yaml.dump(entity))
         entity_indices.update( { entity['name']: entity_index } )
-    logger.debug(f'entity_indices=\n{json.dumps(entity_indices, indent=4)}')
+    logger.opt(lazy=True).debug('entity_indices=\n{}', lambda: json.dumps(entity_indices, indent=4))
 
-    # Generate catalog info for entities
-    klist = list(entity_indices.keys()).copy()
+    # Generate catalog info for entities, including those with no table of their own
+    klist = list(set(entity_indices.keys()) | set(inheritance.keys())).copy()
     klist.sort()
     for entity_name in klist:
+        if entity_name not in entity_indices:
+            generate_untabled_entity(entity_name, logical_entities[entity_name], inheritance[entity_name],
+                                     output_object)
+            continue
         entity_index = entity_indices[entity_name]
         entity_outer = entities[entity_index]
         entity = entity_outer['entity']
-        logger.debug(f'Generating catalog info for: entity_index={entity_index} entity={entity}')
+        logger.debug('Generating catalog info for: entity_index={} entity={}', entity_index, entity)
 
         print('---', file=output_object)
         print(f'## {entity_name}\n', file=output_object)
@@ -170,7 +218,7 @@ def generate_entities(er_yaml, output_object):
             for ordinal, attr_items in enumerate(entity['attributes'].items()):
                 attr_name = attr_items[0]
                 attr_details = attr_items[1]
-                logger.debug(f'{i(1)}attr_name={attr_name} attr_details={attr_details}')
+                logger.debug('{}attr_name={} attr_details={}', i(1), attr_name, attr_details)
                 attr_type = attr_details['type'] if 'type' in attr_details else ''
                 attr_unique = attr_details['unique'] if 'unique' in attr_details else ''
                 attr_description = attr_details['description'] if 'description' in attr_details else ''
@@ -209,7 +257,7 @@ def generate_entities(er_yaml, output_object):
                 assert cardinality.count(parent) == 1
                 for parent_name, parent_details in parent.items():
                     pass
-                logger.debug(f'parent_name={parent_name} parent_details={parent_details}')
+                logger.debug('parent_name={} parent_details={}', parent_name, parent_details)
                 relationship_kind = parent_details['kind']
                 is_defining = parent_details['defining'] if 'defining' in parent_details else False
                 print(f'{parent_name} | {relationship_kind} | {is_defining}', file=output_object)
@@ -221,7 +269,7 @@ def generate_entities(er_yaml, output_object):
                 assert cardinality.count(child) == 1
                 for child_name, child_details in child.items():
                     pass
-                logger.debug(f'child_name={child_name} child_details={child_details}')
+                logger.debug('child_name={} child_details={}', child_name, child_details)
                 relationship_kind = child_details['kind']
                 is_defining = child_details['defining'] if 'defining' in child_details else False
                 print(f'{child_name} | {relationship_kind} | {is_defining}', file=output_object)
@@ -230,18 +278,250 @@ def generate_entities(er_yaml, output_object):
             print('Other Entity Name | Kind', file=output_object )
             print('----------------- | ----', file=output_object )
             for mm in mm_participating:
+                if cardinality.count(graph[mm]) == 1:
+                    # Many-to-many relationship of the entity with itself
+                    print(f'{entity_name} | zero_or_more', file=output_object)
                 for participant in graph[mm]:
                     if participant == entity_name:
                         continue
                     print(f'{participant} | zero_or_more', file=output_object)
+        if entity_name in delete_impact and \
+            (delete_impact[entity_name]['fan_in'] >= 1 or delete_impact[entity_name]['fan_out'] >= 1):
+            generate_delete_impact(delete_impact[entity_name], output_object)
+        if 'attributes' in entity:
+            generate_column_families(entity['attributes'], output_object)
+        if entity_name in retention_policies:
+            retention = retention_policies[entity_name]
+            print('#### Retention', file=output_object)
+            print(f'Rows expire {retention["expire_after"]} after '
+                  f'{retention["column"] if retention["column"] is not None else "they are inserted"}: '
+                  f'deleted by row-level TTL on CockroachDB, or by a scheduled batched cleanup procedure',
+                  file=output_object)
+        if entity_name in temporal_entities:
+            generate_temporal(entity_name, temporal_entities[entity_name], output_object)
+        if entity_name in hierarchies:
+            generate_hierarchy(entity_name, hierarchies[entity_name], output_object)
+        if entity_name in inheritance:
+            generate_inheritance(entity_name, inheritance[entity_name], output_object)
         print(file=output_object)
     logger.debug('Leaving generate_entities()')
 
 
 @logger.catch
-def gencatalog(er_yaml, input, output_object):
+def generate_untabled_entity(entity_name, entity, entity_inheritance, output_object):
+    '''
+    Generate the catalog info for an entity in a class hierarchy that has no table of its own:
+    a subclass stored in its root base class table, or an abstract base class
+    '''
+    logger.debug('Entering generate_untabled_entity()')
+    print('---', file=output_object)
+    print(f'## {entity_name}\n', file=output_object)
+    for key, heading in [ ('description', 'Description'), ('note', 'Note') ]:
+        if key in entity:
+            print(f'**{heading}:**  ', file=output_object)
+            for line in entity[key].splitlines():
+                print(f'{line}  ', file=output_object)
+    if 'description' in entity or 'note' in entity:
+        print(file=output_object)
+    generate_inheritance(entity_name, entity_inheritance, output_object)
+    print(file=output_object)
+    logger.debug('Leaving generate_untabled_entity()')
+
+
+@logger.catch
+def generate_delete_impact(table_impact, output_object):
+    '''
+    Generate the catalog info on what deleting a row of an entity's table touches (see util.build_delete_impact)
+    '''
+    logger.debug('Entering generate_delete_impact()')
+    print('#### Delete Impact', file=output_object)
+    cascade_reach = table_impact['cascade_reach']
+    print(f'**Cascade reach:** {len(cascade_reach)} table{"" if len(cascade_reach) == 1 else "s"}'
+          f'{" (" + ", ".join(cascade_reach) + ")" if cascade_reach else ""}  ', file=output_object)
+    if len(table_impact['cascade_chain']) > 1:
+        print(f'**Longest cascade chain:** {" -> ".join(table_impact["cascade_chain"])}  ', file=output_object)
+    if table_impact['set_null']:
+        print(f'**Set to null in:** {", ".join(table_impact["set_null"])}  ', file=output_object)
+    if table_impact['blocking']:
+        print(f'**Blocked by references from:** {", ".join(table_impact["blocking"])}  ', file=output_object)
+    print(f'**Tables locked by a delete:** {table_impact["locked_tables"]}  ', file=output_object)
+    if table_impact['update_checked']:
+        print(f'**Key updates check references from:** {", ".join(table_impact["update_checked"])}  ',
+              file=output_object)
+    print(f'**Depth:** {table_impact["depth"]}, **Fan-in:** {table_impact["fan_in"]}, '
+          f'**Fan-out:** {table_impact["fan_out"]}', file=output_object)
+    logger.debug('Leaving generate_delete_impact()')
+
+
+@logger.catch
+def generate_column_families(attributes, output_object):
+    '''
+    Generate the catalog info on how the columns of an entity are grouped into column families
+    (CockroachDB), if any attribute has a "family" or "update_frequency" hint
+    '''
+    logger.debug('Entering generate_column_families()')
+    families = { }
+    for attr_name, attr_details in attributes.items():
+        family = attribute_family(attr_details)
+        if family is not None and family != DEFAULT_FAMILY:
+            families.setdefault(family, [ ]).append(attr_name)
+    if families:
+        print('#### Column families', file=output_object)
+        print('Family | Columns', file=output_object)
+        print('------ | -------', file=output_object)
+        print(f'{DEFAULT_FAMILY} | keys, references, and all other columns', file=output_object)
+        for family, attr_names in families.items():
+            print(f'{family} | {", ".join(attr_names)}', file=output_object)
+    logger.debug('Leaving generate_column_families()')
+
+
+@logger.catch
+def generate_temporal(entity_name, temporal, output_object):
+    '''
+    Generate the catalog info for a temporal (versioned) entity
+    '''
+    logger.debug('Entering generate_temporal()')
+    print('#### Temporal', file=output_object)
+    if temporal['generated']:
+        print(f'**Validity period:** columns {TEMPORAL_VALID_FROM} and {TEMPORAL_VALID_TO} (timestamptz) are added; '
+              f'each row is one version of a {entity_name}, valid from {TEMPORAL_VALID_FROM} until '
+              f'{TEMPORAL_VALID_TO}  ', file=output_object)
+    else:
+        print(f'**Validity period:** each row is one version of a {entity_name}, valid from {temporal["valid_from"]} '
+              f'until {temporal["valid_to"]}  ', file=output_object)
+    if temporal['key'] is not None:
+        print(f'**Versioned by:** {", ".join(temporal["key"])}  ', file=output_object)
+    else:
+        print(f'**Versioned by:** its required parents and identifying attributes  ', file=output_object)
+    print(f'**Current version:** the version with no {temporal["valid_to"]}; a partial unique index on the current '
+          f'versions keeps at most one per {entity_name} and finds it with a single index lookup, however much '
+          f'history accumulates  ', file=output_object)
+    print(f'**Overlap:** versions of a {entity_name} may not overlap, enforced by an exclusion constraint on '
+          f'PostgreSQL (not enforced on CockroachDB)', file=output_object)
+    logger.debug('Leaving generate_temporal()')
+
+
+@logger.catch
+def generate_hierarchy(entity_name, hierarchy, output_object):
+    '''
+    Generate the catalog info for an entity whose rows form a hierarchy (self-referencing relationship)
+    '''
+    logger.debug('Entering generate_hierarchy()')
+    print('#### Hierarchy', file=output_object)
+    print(f'**Parent:** each {entity_name} references its parent {entity_name} ({hierarchy["kind"]}); '
+          f'root rows have no parent  ', file=output_object)
+    if hierarchy['defining']:
+        print(f'**On delete:** the subtree of a deleted {entity_name} is also deleted  ', file=output_object)
+    if hierarchy['closure_table'] is not None:
+        print(f'**Closure table:** {hierarchy["closure_table"]} has one row for each ancestor and descendant pair, '
+              f'maintained by triggers, so subtree and ancestor queries are single indexed lookups',
+              file=output_object)
+    else:
+        print(f'**Closure table:** none; subtree and ancestor queries need recursive queries', file=output_object)
+    logger.debug('Leaving generate_hierarchy()')
+
+
+@logger.catch
+def generate_inheritance(entity_name, entity_inheritance, output_object):
+    '''
+    Generate the catalog info on how an entity in a class hierarchy is mapped to tables
+    '''
+    logger.debug('Entering generate_inheritance()')
+    strategy = entity_inheritance['strategy']
+    print('#### Inheritance', file=output_object)
+    print(f'**Strategy:** {strategy} (selected on {entity_inheritance["root"]})  ', file=output_object)
+    if entity_inheritance['base_class'] is not None:
+        print(f'**Base class:** {entity_inheritance["base_class"]}  ', file=output_object)
+    if entity_inheritance['subclasses']:
+        print(f'**Subclasses:** {", ".join(entity_inheritance["subclasses"])}  ', file=output_object)
+    if strategy == 'single_table':
+        print(f'**Stored in:** table {entity_inheritance["table"]}, rows where '
+              f'{entity_inheritance["discriminator"]} is {entity_name}', file=output_object)
+    elif strategy == 'table_per_concrete_class':
+        if entity_inheritance['table'] is None:
+            print(f'**Stored in:** no table of its own (abstract); its attributes are repeated in the '
+                  f'table of each concrete subclass', file=output_object)
+        else:
+            print(f'**Stored in:** table {entity_inheritance["table"]}, including all inherited attributes',
+                  file=output_object)
+    elif strategy == 'table_per_level_with_views' and entity_inheritance['base_class'] is not None:
+        print(f'**Stored in:** table {entity_inheritance["table"]} for its own attributes; '
+              f'view {entity_name}_view includes all inherited attributes', file=output_object)
+    else:
+        print(f'**Stored in:** table {entity_inheritance["table"]} for its own attributes', file=output_object)
+    logger.debug('Leaving generate_inheritance()')
+
+
+@logger.catch
+def generate_capacity(er_yaml, output_object):
+    '''
+    Generate the catalog capacity estimate for the tables, from the row-count hints of the entities
+    (see util.build_capacity_estimates)
+    '''
+    logger.debug('Entering generate_capacity()')
+    capacity = build_capacity_estimates(er_yaml)
+    print('---', file=output_object)
+    print(f'## Capacity Estimate\n', file=output_object)
+    print(f'Estimated storage after {DEFAULT_HORIZON_DAYS} days, before compression; CockroachDB totals include '
+          f'{DEFAULT_REPLICAS} replicas.\n', file=output_object)
+    header = 'Table | Rows | Growth per Day | Rows in ' + str(DEFAULT_HORIZON_DAYS) + ' Days'
+    for dialect in CAPACITY_DIALECTS:
+        header += f' | {dialect} Table | {dialect} Indexes | {dialect} Total'
+    print(header, file=output_object)
+    print(' | '.join('-' * len(heading) for heading in header.split(' | ')), file=output_object)
+    totals = { dialect: 0 for dialect in CAPACITY_DIALECTS }
+    for table_name in sorted(capacity):
+        table_capacity = capacity[table_name]
+        line = f'{table_name} | {table_capacity["rows"]} | {table_capacity["growth_per_day"]:g} | ' \
+               f'{table_capacity["horizon_rows"]}'
+        for dialect in CAPACITY_DIALECTS:
+            sizes = table_capacity['dialects'][dialect]
+            line += f' | {format_bytes(sizes["table_bytes"])} | {format_bytes(sizes["index_bytes"])} | ' \
+                    f'{format_bytes(sizes["total_bytes"])}'
+            totals[dialect] += sizes['total_bytes']
+        print(line, file=output_object)
+    print(file=output_object)
+    for dialect in CAPACITY_DIALECTS:
+        print(f'**{dialect} total:** {format_bytes(totals[dialect])}  ', file=output_object)
+    print(file=output_object)
+    logger.debug('Leaving generate_capacity()')
+
+
+def catalog_sections(er_yaml, input, reproducible=False, include_delete_impact=False):
+    '''
+    Generate a data catalog from a valid model, one section at a time (its header, its enums,
+    its entities and its capacity estimate), yielding each section as a string
+    '''
+    section_object = io.StringIO()
+    print(f'# Entity Summary', file=section_object)
+    print(f'Generated by Zepster  ', file=section_object)
+    print(f'Source: {"stdin" if input == "-" else input}  ', file=section_object)
+    print(f'Generated: {generation_stamp(model_digest(er_yaml) if reproducible else None)}', file=section_object)
+    print(file=section_object)
+    yield section_object.getvalue()
+
+    section_object = io.StringIO()
+    generate_enums(apply_inheritance_strategies(er_yaml), section_object)
+    yield section_object.getvalue()
+
+    section_object = io.StringIO()
+    generate_entities(er_yaml, section_object, include_delete_impact)
+    yield section_object.getvalue()
+
+    if any('expected_rows' in entity_outer['entity'] or 'growth_per_day' in entity_outer['entity']
+           for entity_outer in er_yaml['entities']):
+        section_object = io.StringIO()
+        generate_capacity(er_yaml, section_object)
+        yield section_object.getvalue()
+
+
+@logger.catch
+def gencatalog(er_yaml, input, output_object, reproducible=False, include_delete_impact=False):
     '''
     Generaly callable entry point to read an Entity-Relationship Markup Language file and write a data catalog output file
+
+    If reproducible is true, the catalog is stamped with the digest of the model instead of the time it was generated.
+    If include_delete_impact is true, the catalog of each entity says what deleting one of its rows touches.
     '''
     logger.debug('Entering gencatalog()')
     logger.debug('Before validating YAML via jsonschema.validate()')
@@ -252,15 +532,15 @@ def gencatalog(er_yaml, input, output_object):
               f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
         sys.exit(1)
     logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
 
-    print(f'# Entity Summary', file=output_object)
-    print(f'Generated by Zepster  ', file=output_object)
-    print(f'Source: {"stdin" if input == "-" else input}  ', file=output_object)
-    print(f'Generated: {datetime.datetime.utcnow().isoformat()}', file=output_object)
-    print(file=output_object)
-
-    generate_enums(er_yaml, output_object)
-    generate_entities(er_yaml, output_object)
+    for section in catalog_sections(er_yaml, input, reproducible, include_delete_impact):
+        output_object.write(section)
     logger.debug('Leaving gencatalog()')
 
 
@@ -293,8 +573,35 @@ def gencatalog(er_yaml, input, output_object):
     default='md',
     help='Set the catalog format: (currently only "md")',
 )
+@click.option(
+    '--entities',
+    type=str,
+    default=None,
+    help='If specified, generate only these entities (comma-separated), with their required parents and enums',
+)
+@click.option(
+    '--subject-area',
+    type=str,
+    default=None,
+    help='If specified, generate only the entities of these subject areas (comma-separated), '
+         'with their required parents and enums',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@click.option(
+    '--delete-impact',
+    is_flag=True,
+    default=False,
+    help='If specified, include what deleting a row of each entity touches: the tables it cascades to, '
+         'sets to null in, or is blocked by, and the tables it locks',
+)
 @logger.catch
-def main(input, output, overwrite, logging, format):
+def main(input, output, overwrite, logging, format, entities, subject_area, reproducible, delete_impact):
     '''
     Read an Entity-Relationship Markup Language file and write a data catalog output file
     '''
@@ -308,7 +615,9 @@ def main(input, output, overwrite, logging, format):
     logger.debug('Entering main()')
     logger.info(f'click version is {click.__version__}')
     logger.debug(
-        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} format={format}'
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} format={format} '
+        f'entities={entities} subject_area={subject_area} reproducible={reproducible} '
+        f'delete_impact={delete_impact}'
     )
 
     close_input_object = False
@@ -322,7 +631,8 @@ def main(input, output, overwrite, logging, format):
             sys.exit(1)
 
         try:
-            output_object = open(output, 'w')
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
             close_output_object = True
         except IOError as ex:
             print(f'ERROR: Unable to write to the specified output file {output}.\n'
@@ -344,21 +654,31 @@ def main(input, output, overwrite, logging, format):
             print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
             sys.exit(1)
 
-    logger.debug('Before reading YAML via yaml.safe_load()')
+    logger.debug('Before reading ERML via load_erml()')
     try:
-        er_yaml = yaml.safe_load(input_object)
-    except (yaml.scanner.ScannerError, yaml.parser.ParserError) as ex:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
         print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
               f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
         sys.exit(1)
-    logger.debug('After yaml.safe_load()')
+    logger.debug('After load_erml()')
+
+    if entities is not None or subject_area is not None:
+        try:
+            er_yaml = select_model_slice(er_yaml, entities.split(',') if entities is not None else None,
+                                         subject_area.split(',') if subject_area is not None else None)
+        except ValueError as ex:
+            print(f'Error: {ex}', file=sys.stderr)
+            sys.exit(1)
 
-    gencatalog(er_yaml, input, output_object)
+    gencatalog(er_yaml, input, output_object, reproducible, delete_impact)
 
     if close_input_object:
         input_object.close()
     if close_output_object:
         output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
     logger.debug('Leaving main()')
     
 
@@ -0,0 +1,195 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to convert an Entity-Relationship Markup Language (ERML) file between its encodings.
+
+Besides YAML, an ERML file can be encoded as canonical JSON or in a compact binary format, which
+the other tools read many times faster than YAML, and which they tell apart on their own.  Use this
+program to convert an ERML file to YAML for people to read, or to JSON or binary for passing it from
+tool to tool.
+
+Usage: genconvert.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file in any encoding and write
+  it in the specified encoding
+
+Options:
+  --input TEXT                 Input Entity-Relationship Markup Language file
+                               (default is standard input, also represented by
+                               a dash "-")
+
+  --output TEXT                Output Entity-Relationship Markup Language file
+                               (default is standard output, also represented
+                               by a dash "-")
+
+  --overwrite                  If specified, overwrite the output file if it
+                               already exists
+
+  --logging TEXT               Set logging to the specified level: NOTSET,
+                               DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+  --format [yaml|json|binary]  Set the encoding of the output file: "yaml" for
+                               people, or "json" or "binary", which are much
+                               faster for other tools to read.  Default is
+                               yaml.
+
+  --help                       Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, dump_erml, ERML_FORMATS
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, dump_erml, ERML_FORMATS
+
+
+@logger.catch
+def genconvert(er_yaml, input, output_object, format='yaml'):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file in any encoding and write it in the specified encoding
+    '''
+    logger.debug('Entering genconvert()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+
+    dump_erml(er_yaml, output_object, format)
+    logger.debug('Leaving genconvert()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output Entity-Relationship Markup Language file (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output file if it already exists',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--format',
+    type=click.Choice(ERML_FORMATS, case_sensitive=False),
+    default='yaml',
+    help='Set the encoding of the output file: "yaml" for people, or "json" or "binary", which are much faster '
+         'for other tools to read.  Default is yaml.',
+)
+@logger.catch
+def main(input, output, overwrite, logging, format):
+    '''
+    Read an Entity-Relationship Markup Language file in any encoding and write it in the specified encoding
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} format={format}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_object = open(output, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    genconvert(er_yaml, input, output_object, format.lower())
+
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -0,0 +1,532 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to generate foreign-key-consistent test data
+from an Entity-Relationship Markup Language (ERML) file.
+
+Row counts are computed per table in dependency order, from the optional
+"data_hints" of each entity:
+
+    data_hints:
+      rows: 1000000      # generate this many rows
+      fan_out: 20        # or generate this many rows per row of the first required parent
+
+Primary keys are derived from the seed, the table name and the row number,
+so a child row can compute the key of the parent row it references without
+the parent's rows being kept in memory.  This makes every table independent
+of the others, so tables are generated in parallel worker processes and
+each one is streamed to its output file in bounded memory.
+
+Usage: gendata.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write test data
+  files, one per table
+
+Options:
+  --input TEXT              Input Entity-Relationship Markup Language file
+                            (default is standard input, also represented by a
+                            dash "-")
+
+  --output-dir TEXT         Output directory for the data files (default is
+                            the current directory).  A dash "-" writes all
+                            tables to standard output, one after the other
+                            (requires "--format copy").
+
+  --overwrite               If specified, overwrite output files if they
+                            already exist
+
+  --logging TEXT            Set logging to the specified level: NOTSET,
+                            DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+  --format [csv|copy]       Set the data file format: "csv" (with a header
+                            row) or "copy" (PostgreSQL COPY text format)
+
+  --seed INTEGER            Seed for the random number generators.  The same
+                            seed always generates the same data.  Default is
+                            0.
+
+  --default-rows INTEGER    Number of rows for tables without a row-count or
+                            fan-out hint.  Default is 1000.
+
+  --scale FLOAT             Multiply all row-count hints by this factor.
+                            Default is 1.0.
+
+  --null-fraction FLOAT     Fraction of optional column values that are
+                            null.  Default is 0.1.
+
+  --jobs INTEGER            Number of worker processes (default is the number
+                            of CPUs)
+
+  --help                    Show this message and exit.
+'''
+
+import sys
+import os
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import json
+import csv
+import uuid
+import random
+import datetime
+import concurrent.futures
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_foreign_keys, build_table_columns, build_temporal_entities, model_errors
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_foreign_keys, build_table_columns, build_temporal_entities, model_errors
+
+# Rows are written to the output in chunks of this many rows to keep memory bounded
+CHUNK_ROWS = 10000
+
+# Dates are generated relative to this date
+BASE_DATE = datetime.date(2000, 1, 1)
+
+
+def table_namespace(seed, table_name):
+    '''
+    Create the UUID namespace used to derive the primary keys of a table
+    '''
+    return uuid.uuid5(uuid.NAMESPACE_OID, f'zepster:{seed}:{table_name}')
+
+
+@logger.catch
+def build_row_counts(er_yaml, dependency_ordering, mm_synthesized, table_fks, default_rows, scale):
+    '''
+    Compute the number of rows for each table, in dependency order so parent counts are known.
+    Also compute, for subclass tables, the offset of their rows in the base class table
+    so that each base class row is extended by at most one subclass row.
+    '''
+    logger.debug('Entering build_row_counts()')
+    data_hints = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        data_hints.update( { entity['name']: entity['data_hints'] if 'data_hints' in entity else { } } )
+
+    # Each subclass of a base class takes its own contiguous range of the base class rows
+    subclasses = { }
+    for table_name in dependency_ordering:
+        for fk in table_fks[table_name]:
+            if fk['kind'] == 'base_class':
+                subclasses.setdefault(fk['references'], [ ]).append(table_name)
+
+    row_counts = { }
+    subclass_offsets = { }
+    next_subclass_offset = { }
+    for table_name in dependency_ordering:
+        hints = data_hints.get(table_name, { })
+        fks = table_fks[table_name]
+        first_required = next((fk for fk in fks if fk['required'] and fk['references'] != table_name), None)
+        base_fk = next((fk for fk in fks if fk['kind'] == 'base_class'), None)
+        if 'rows' in hints:
+            rows = int(hints['rows'] * scale)
+        elif 'fan_out' in hints and first_required is not None:
+            rows = int(row_counts[first_required['references']] * hints['fan_out'])
+        elif base_fk is not None:
+            rows = row_counts[base_fk['references']] // len(subclasses[base_fk['references']])
+        elif table_name in mm_synthesized:
+            rows = max(row_counts[fk['references']] for fk in fks)
+        else:
+            rows = int(default_rows * scale)
+        if base_fk is not None:
+            base_name = base_fk['references']
+            offset = next_subclass_offset.get(base_name, 0)
+            if offset + rows > row_counts[base_name]:
+                logger.warning(f'Reducing rows of subclass {table_name} from {rows} to '
+                               f'{row_counts[base_name] - offset} to fit within base class {base_name}')
+                rows = row_counts[base_name] - offset
+            subclass_offsets.update( { table_name: offset } )
+            next_subclass_offset.update( { base_name: offset + rows } )
+        row_counts.update( { table_name: rows } )
+        logger.debug(f'{i(1)}table_name={table_name} rows={rows}')
+    logger.debug('Leaving build_row_counts()')
+    return data_hints, row_counts, subclass_offsets
+
+
+@logger.catch
+def build_table_plans(er_yaml, dependency_ordering, table_fks, table_columns,
+                      data_hints, row_counts, subclass_offsets):
+    '''
+    Build a picklable plan for generating each table, so each table can be
+    generated independently in a worker process
+    '''
+    logger.debug('Entering build_table_plans()')
+    enum_sizes = { }
+    for enum_outer in er_yaml['enums']:
+        enum_sizes.update( { enum_outer['enum']['name']: len(enum_outer['enum']['values']) } )
+
+    # Versions get consecutive, one-day validity periods, so they never overlap
+    temporal_columns = { }
+    for entity_name, temporal in build_temporal_entities(er_yaml).items():
+        temporal_columns.update( { (entity_name, temporal['valid_from']): 'valid_from',
+                                   (entity_name, temporal['valid_to']): 'valid_to' } )
+
+    plans = [ ]
+    for table_name in dependency_ordering:
+        hints = data_hints.get(table_name, { })
+        fan_out_fk = None
+        if 'rows' not in hints and 'fan_out' in hints:
+            fan_out_fk = next((fk for fk in table_fks[table_name]
+                               if fk['required'] and fk['references'] != table_name), None)
+        columns = [ ]
+        for column in table_columns[table_name]:
+            plan_column = { 'name': column['name'], 'source': column['source'], 'type': column['type'],
+                            'required': column['required'], 'unique': column['unique'] in [True, 'true', 'within_parent'] }
+            if column['source'] == 'fk':
+                fk = column['fk']
+                parent_name = fk['references']
+                plan_column.update( { 'references': parent_name, 'parent_rows': row_counts[parent_name] } )
+                if fk['kind'] == 'base_class':
+                    plan_column.update( { 'mode': 'subclass', 'offset': subclass_offsets[table_name] } )
+                elif fk['references'] == table_name:
+                    plan_column.update( { 'mode': 'self' } )
+                elif fk is fan_out_fk:
+                    plan_column.update( { 'mode': 'fan_out', 'fan_out': hints['fan_out'] } )
+                else:
+                    plan_column.update( { 'mode': 'random' } )
+                if fk['required'] and row_counts[parent_name] == 0 and row_counts[table_name] > 0:
+                    print(f'Error: Table {table_name} requires rows in {parent_name}, but {parent_name} has no rows',
+                          file=sys.stderr)
+                    sys.exit(1)
+            elif column['type'] == 'enum':
+                enum_name = 'enum_' + column['name']
+                if enum_name not in enum_sizes:
+                    print(f'Error: Enum {enum_name} for column {column["name"]} of table {table_name} does not exist',
+                          file=sys.stderr)
+                    sys.exit(1)
+                plan_column.update( { 'enum_values': enum_sizes[enum_name] } )
+            elif (table_name, column['name']) in temporal_columns:
+                plan_column.update( { 'temporal': temporal_columns[(table_name, column['name'])], 'required': True } )
+            columns.append(plan_column)
+        plans.append( { 'table': table_name, 'rows': row_counts[table_name], 'columns': columns } )
+    logger.debug('Leaving build_table_plans()')
+    return plans
+
+
+def generate_attribute_value(column, row_num, rng, namespace):
+    '''
+    Generate one attribute value.  Unique values are derived from the row number.
+    '''
+    column_type = column['type']
+    if 'temporal' in column:
+        days = row_num + (1 if column['temporal'] == 'valid_to' else 0)
+        if column_type == 'date':
+            return (BASE_DATE + datetime.timedelta(days=days)).isoformat()
+        return datetime.datetime.combine(BASE_DATE + datetime.timedelta(days=days), datetime.time()).isoformat()
+    if column_type == 'enum':
+        return str(rng.randint(1, column['enum_values']))
+    if column['unique']:
+        if column_type == 'integer':
+            return str(row_num + 1)
+        if column_type == 'float':
+            return f'{row_num + 1}.5'
+        if column_type == 'uuid':
+            return str(uuid.uuid5(namespace, f'{column["name"]}:{row_num}'))
+        if column_type == 'date':
+            return (BASE_DATE + datetime.timedelta(days=row_num)).isoformat()
+        return f'{column["name"]}_{row_num + 1}'
+    if column_type == 'integer':
+        return str(rng.randrange(1000000))
+    if column_type == 'float':
+        return f'{rng.random() * 1000:.4f}'
+    if column_type == 'uuid':
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    if column_type == 'date':
+        return (BASE_DATE + datetime.timedelta(days=rng.randrange(3650))).isoformat()
+    if column_type in [ 'timestamp', 'timestamptz' ]:
+        return datetime.datetime.combine(BASE_DATE + datetime.timedelta(days=rng.randrange(3650)),
+                                         datetime.time(rng.randrange(24), rng.randrange(60))).isoformat()
+    if column_type == 'boolean':
+        return 'true' if rng.random() < 0.5 else 'false'
+    return f'{column["name"]}_{rng.getrandbits(32):08x}'
+
+
+def generate_rows(plan, seed, null_fraction):
+    '''
+    Lazily generate the rows of a table as lists of strings, with None for null
+    '''
+    table_name = plan['table']
+    rng = random.Random(f'{seed}:{table_name}')
+    namespace = table_namespace(seed, table_name)
+    parent_namespaces = { column['references']: table_namespace(seed, column['references'])
+                          for column in plan['columns'] if column['source'] == 'fk' }
+    for row_num in range(plan['rows']):
+        row = [ ]
+        for column in plan['columns']:
+            source = column['source']
+            if source == 'pk':
+                row.append(str(uuid.uuid5(namespace, str(row_num))))
+                continue
+            if not column['required'] and rng.random() < null_fraction:
+                row.append(None)
+                continue
+            if source == 'fk':
+                mode = column['mode']
+                if mode == 'subclass':
+                    parent_row_num = column['offset'] + row_num
+                elif mode == 'self':
+                    # Reference an earlier row, so every row's ancestors precede it and the first row is a root
+                    if row_num == 0:
+                        row.append(None)
+                        continue
+                    parent_row_num = rng.randrange(row_num)
+                elif mode == 'fan_out':
+                    parent_row_num = min(int(row_num // column['fan_out']), column['parent_rows'] - 1)
+                elif column['parent_rows'] == 0:
+                    row.append(None)
+                    continue
+                else:
+                    parent_row_num = rng.randrange(column['parent_rows'])
+                row.append(str(uuid.uuid5(parent_namespaces[column['references']], str(parent_row_num))))
+            else:
+                row.append(generate_attribute_value(column, row_num, rng, namespace))
+        yield row
+
+
+def write_table(plan, output_object, format, seed, null_fraction):
+    '''
+    Stream the rows of one table to an output file object, in chunks
+    '''
+    column_names = [ column['name'] for column in plan['columns'] ]
+    if format == 'csv':
+        writer = csv.writer(output_object, lineterminator='\n')
+        writer.writerow(column_names)
+        chunk = [ ]
+        for row in generate_rows(plan, seed, null_fraction):
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                writer.writerows(chunk)
+                chunk = [ ]
+        writer.writerows(chunk)
+    else:
+        print(f'copy {plan["table"]} ({", ".join(column_names)}) from stdin;', file=output_object)
+        chunk = [ ]
+        for row in generate_rows(plan, seed, null_fraction):
+            # Generated values never contain tabs, newlines, or backslashes, so no escaping is needed
+            chunk.append('\t'.join('\\N' if value is None else value for value in row))
+            if len(chunk) >= CHUNK_ROWS:
+                output_object.write('\n'.join(chunk) + '\n')
+                chunk = [ ]
+        if chunk:
+            output_object.write('\n'.join(chunk) + '\n')
+        print('\\.', file=output_object)
+
+
+def write_table_file(plan, path, format, seed, null_fraction):
+    '''
+    Worker process entry point to generate one table into its own file
+    '''
+    with open(path, 'w', newline='') as output_object:
+        write_table(plan, output_object, format, seed, null_fraction)
+    return plan['table'], plan['rows']
+
+
+@logger.catch
+def gendata(er_yaml, input, output_dir, overwrite, format, seed, default_rows, scale, null_fraction, jobs):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write test data files
+    '''
+    logger.debug('Entering gendata()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks)
+    data_hints, row_counts, subclass_offsets = \
+        build_row_counts(er_yaml, dependency_ordering, mm_synthesized, table_fks, default_rows, scale)
+    logger.opt(lazy=True).info('row_counts={}', lambda: json.dumps(row_counts, indent=4))
+    plans = build_table_plans(er_yaml, dependency_ordering, table_fks, table_columns,
+                              data_hints, row_counts, subclass_offsets)
+
+    if output_dir == '-':
+        # Serial, in dependency order, so the output can be piped straight into a database
+        for plan in plans:
+            write_table(plan, sys.stdout, format, seed, null_fraction)
+        logger.debug('Leaving gendata()')
+        return
+
+    extension = 'csv' if format == 'csv' else 'copy'
+    paths = { plan['table']: os.path.join(output_dir, f'{plan["table"]}.{extension}') for plan in plans }
+    if not overwrite:
+        for path in paths.values():
+            if os.path.exists(path):
+                print(f'Error: Output file already exists: {path}', file=sys.stderr)
+                sys.exit(1)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [ executor.submit(write_table_file, plan, paths[plan['table']], format, seed, null_fraction)
+                    for plan in plans ]
+        for future in concurrent.futures.as_completed(futures):
+            table_name, rows = future.result()
+            logger.info(f'Wrote {rows} rows to {paths[table_name]}')
+    logger.debug('Leaving gendata()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output-dir',
+    default='.',
+    help='Output directory for the data files (default is the current directory).  '
+         'A dash "-" writes all tables to standard output, one after the other (requires "--format copy").',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite output files if they already exist',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--format',
+    type=click.Choice(['csv', 'copy'], case_sensitive=False),
+    default='csv',
+    help='Set the data file format: "csv" (with a header row) or "copy" (PostgreSQL COPY text format)',
+)
+@click.option(
+    '--seed',
+    type=int,
+    default=0,
+    help='Seed for the random number generators.  The same seed always generates the same data.  Default is 0.',
+)
+@click.option(
+    '--default-rows',
+    type=click.IntRange(min=0),
+    default=1000,
+    help='Number of rows for tables without a row-count or fan-out hint.  Default is 1000.',
+)
+@click.option(
+    '--scale',
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help='Multiply all row-count hints by this factor.  Default is 1.0.',
+)
+@click.option(
+    '--null-fraction',
+    type=click.FloatRange(min=0, max=1),
+    default=0.1,
+    help='Fraction of optional column values that are null.  Default is 0.1.',
+)
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Number of worker processes (default is the number of CPUs)',
+)
+@logger.catch
+def main(input, output_dir, overwrite, logging, format, seed, default_rows, scale, null_fraction, jobs):
+    '''
+    Read an Entity-Relationship Markup Language file and write test data files, one per table
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output_dir={output_dir} overwrite={overwrite} logging={logging} '
+        f'format={format} seed={seed} default_rows={default_rows} scale={scale} '
+        f'null_fraction={null_fraction} jobs={jobs}'
+    )
+
+    format = format.lower()
+    if output_dir == '-':
+        if format != 'copy':
+            print(f'Error: Writing to standard output requires "--format copy"', file=sys.stderr)
+            sys.exit(1)
+    elif not os.path.isdir(output_dir):
+        print(f'Error: Specified output directory does not exist: {output_dir}', file=sys.stderr)
+        sys.exit(1)
+
+    close_input_object = False
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    gendata(er_yaml, input, output_dir, overwrite, format, seed, default_rows, scale, null_fraction, jobs)
+
+    if close_input_object:
+        input_object.close()
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
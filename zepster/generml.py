@@ -31,14 +31,36 @@ Usage: generml.py [OPTIONS]
   GraphML - http://graphml.graphdrawing.org/index.html
 
 Options:
-  --input TEXT    Input GraphML file (default is standard input, also
-                  represented by a dash "-")
-  --output TEXT   Output ERML file (default is standard output, also
-                  represented by a dash "-")
-  --overwrite     If specified, overwrite the output file if it already exists
-  --logging TEXT  Set logging to the specified level: NOTSET, DEBUG, INFO,
-                  WARNING, ERROR, CRITICAL
-  --help          Show this message and exit.
+  --input TEXT                 Input GraphML file (default is standard input,
+                               also represented by a dash "-").  May be
+                               repeated, or be a directory of GraphML files,
+                               to merge the diagrams of a workspace.
+  --output TEXT                Output ERML file (default is standard output,
+                               also represented by a dash "-")
+  --overwrite                  If specified, overwrite the output file if it
+                               already exists
+  --logging TEXT               Set logging to the specified level: NOTSET,
+                               DEBUG, INFO, WARNING, ERROR, CRITICAL
+  --jobs INTEGER               Number of worker processes to parse the
+                               diagrams of a workspace, or the attributes of a
+                               large diagram (default is the number of CPUs)
+  --cache TEXT                 If specified, reuse the conversions of the
+                               unchanged nodes and edges from this file, and
+                               write it back
+  --stream                     If specified, write each entity as soon as it
+                               is converted, rather than after the whole
+                               diagram is converted and checked (the output is
+                               incomplete if there are errors)
+  --format [yaml|json|binary]  Set the encoding of the ERML file: "yaml" for
+                               people, or "json" or "binary", which are much
+                               faster for other tools to read.  Default is
+                               yaml.
+  --reproducible               If specified, set generated_datetime to the
+                               digest of the diagrams instead of the time the
+                               ERML was generated, so the same diagrams always
+                               generate the same bytes, and leave an output
+                               file alone if it is unchanged
+  --help                       Show this message and exit.
 '''
 
 # TODO:
@@ -57,9 +79,41 @@ import cardinality
 import re
 import yaml
 import jsonschema
-import datetime
-from util import i
-from json_schema_graphml import json_schema_graphml_entity_attributes, json_schema_graphml_enum
+import concurrent.futures
+import hashlib
+import json
+import copy
+import contextlib
+import io
+if __package__:
+    from .util import i, dump_erml, ERML_FORMATS, ERML_YAML_DUMPER, file_digest, generation_stamp, staging_path, \
+        replace_if_changed
+    from .json_schema_graphml import json_schema_graphml_entity_attributes, json_schema_graphml_enum
+else:
+    from util import i, dump_erml, ERML_FORMATS, ERML_YAML_DUMPER, file_digest, generation_stamp, staging_path, \
+        replace_if_changed
+    from json_schema_graphml import json_schema_graphml_entity_attributes, json_schema_graphml_enum
+
+
+graph_tag =        '{http://graphml.graphdrawing.org/xmlns}graph'
+node_tag =         '{http://graphml.graphdrawing.org/xmlns}node'
+edge_tag =         '{http://graphml.graphdrawing.org/xmlns}edge'
+data_tag =         '{http://graphml.graphdrawing.org/xmlns}data'
+GenericNode_tag =  '{http://www.yworks.com/xml/graphml}GenericNode'
+BorderStyle_tag =  '{http://www.yworks.com/xml/graphml}BorderStyle'
+PolyLineEdge_tag = '{http://www.yworks.com/xml/graphml}PolyLineEdge'
+NodeLabel_tag =    '{http://www.yworks.com/xml/graphml}NodeLabel'
+LineStyle_tag =    '{http://www.yworks.com/xml/graphml}LineStyle'
+Arrows_tag =       '{http://www.yworks.com/xml/graphml}Arrows'
+Realizers_tag =    '{http://www.yworks.com/xml/graphml}Realizers'
+
+NodeLabel_attr_configuration_name =        'com.yworks.entityRelationship.label.name'
+NodeLabel_attr_configuration_attributes =  'com.yworks.entityRelationship.label.attributes'
+GenericNode_attr_configuration_BigEntity = 'com.yworks.entityRelationship.big_entity'
+
+# In a workspace, an entity drawn with this border is a reference to the entity of the same name
+# that is defined (drawn with a solid border) in another diagram
+REFERENCE_BORDER_TYPE = 'dotted'
 
 
 def strip_namespace(tag):
@@ -73,59 +127,173 @@ def strip_namespace(tag):
     return re.sub(r'{.*}', r'', tag)
 
 
-@logger.catch
-def generml(input_file_or_object, input, output_object):
+def fragment_key(*parts):
     '''
-    Generally-callable entry point to
-    read an Entity-Relationship diagram created by the yEd graph editor and 
-    convert it into Entity-Relationship Markup Language
+    Hash what a node or an edge of the diagram is converted from, as its key in the cache
+    '''
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
 
-    \b
-    References:
-    yEd - https://www.yworks.com/products/yed
-    GraphML - http://graphml.graphdrawing.org/index.html
+
+def schema_digest():
     '''
-    logger.debug('Entering generml()')
+    Digest the schemas that the attributes of the nodes are validated with, so a cache made with other schemas
+    is not used
+    '''
+    content = json.dumps( [ json_schema_graphml_entity_attributes, json_schema_graphml_enum ], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def read_cache(cache):
+    '''
+    Read the cache of converted nodes and edges from a file, if it exists and was made with the current schemas
+    '''
+    if cache is None or not os.path.exists(cache):
+        return { 'nodes': { }, 'edges': { } }
+    try:
+        with open(cache, 'r') as cache_object:
+            cached = json.load(cache_object)
+        if cached.get('digest', None) == schema_digest():
+            return { 'nodes': cached['nodes'], 'edges': cached['edges'] }
+        logger.info(f'Cache {cache} was made with other schemas, so ignoring it')
+    except (IOError, ValueError, KeyError) as ex:
+        logger.warning(f'Unable to read the cache {cache}, so ignoring it: {ex}')
+    return { 'nodes': { }, 'edges': { } }
+
+
+def write_cache(cache, cached, used):
+    '''
+    Write the nodes and edges used in this run to the cache file, if they differ from what was read from it
+    (so the cache holds only the current diagram and does not grow with every edit)
+    '''
+    if cache is None or all(used[kind].keys() == cached[kind].keys() for kind in [ 'nodes', 'edges' ]):
+        return
+    try:
+        with open(cache, 'w') as cache_object:
+            json.dump( { 'digest': schema_digest(), 'nodes': used['nodes'], 'edges': used['edges'] }, cache_object)
+    except IOError as ex:
+        print(f'ERROR: Unable to write to the specified cache file {cache}.\n'
+              f'Details: {ex}', file=sys.stderr)
+        sys.exit(1)
+
+
+# The fewest nodes to convert for which it pays to start worker processes
+PARALLEL_MIN_NODES = 200
+
+# The validators of the attributes of the nodes, made once per process
+attribute_validators = { }
+
+
+def attribute_validator(json_schema):
+    '''
+    Get the validator for a schema of the attributes of the nodes.  Making it once, rather than calling
+    jsonschema.validate() for each node, saves checking the schema itself for each node.
+    '''
+    if id(json_schema) not in attribute_validators:
+        validator_class = jsonschema.validators.validator_for(json_schema)
+        validator_class.check_schema(json_schema)
+        attribute_validators.update( { id(json_schema): validator_class(json_schema) } )
+    return attribute_validators[id(json_schema)]
+
+
+def convert_attributes(entity_name, entity_attributes):
+    '''
+    Worker process entry point to parse and validate the attributes section of an entity or enum node.
+    Returns the parsed attributes and None, or None and the kind (syntax or schema) and details of the error.
+    '''
+    try:
+        yaml_attrs = yaml.safe_load(entity_attributes)
+    except yaml.YAMLError as ex:
+        return None, ('syntax', str(ex))
+    if yaml_attrs is None:
+        return None, None
+    json_schema = json_schema_graphml_enum if entity_name.lower().startswith('enum') \
+        else json_schema_graphml_entity_attributes
+    error = jsonschema.exceptions.best_match(attribute_validator(json_schema).iter_errors(yaml_attrs))
+    if error is not None:
+        return None, ('schema', str(error))
+    return yaml_attrs, None
+
+
+def group_subject_area(group_elem):
+    '''
+    Get the subject area declared by a yEd group node: its label, made into a valid name
+    (None if the group has no label)
+    '''
+    Realizers_elem = group_elem.find(f'{data_tag}/*/{Realizers_tag}')
+    if Realizers_elem is not None:
+        realizers = list(Realizers_elem)
+        active = int(Realizers_elem.attrib.get('active', '0'))
+        realizer = realizers[active] if active < len(realizers) else realizers[0]
+    else:
+        data_elems = [ data_elem for data_elem in group_elem.findall(data_tag) if len(data_elem) > 0 ]
+        if not data_elems:
+            return None
+        realizer = data_elems[0][0]
+    for NodeLabel_elem in realizer.iter(NodeLabel_tag):
+        if NodeLabel_elem.text is not None and NodeLabel_elem.text.strip():
+            subject_area = re.sub(r'[^A-Za-z0-9_]', '_', NodeLabel_elem.text.strip())
+            return f'_{subject_area}' if subject_area[0].isdigit() else subject_area
+    return None
+
+
+def walk_graph(graph_elem, subject_area=None):
+    '''
+    Yield the nodes and the edges of a graph, with the subject area of the group they are in,
+    descending into the nested graphs of yEd group nodes
+    '''
+    for graph_child in graph_elem:
+        if graph_child.tag == node_tag and graph_child.find(graph_tag) is not None:
+            group_area = group_subject_area(graph_child)
+            logger.debug(f'Found a group node {graph_child.attrib["id"]}: subject_area={group_area}')
+            yield from walk_graph(graph_child.find(graph_tag), group_area or subject_area)
+        else:
+            yield graph_child, subject_area
+
 
-    graph_tag =        '{http://graphml.graphdrawing.org/xmlns}graph'
-    node_tag =         '{http://graphml.graphdrawing.org/xmlns}node'
-    edge_tag =         '{http://graphml.graphdrawing.org/xmlns}edge'
-    data_tag =         '{http://graphml.graphdrawing.org/xmlns}data'
-    GenericNode_tag =  '{http://www.yworks.com/xml/graphml}GenericNode'
-    BorderStyle_tag =  '{http://www.yworks.com/xml/graphml}BorderStyle'
-    PolyLineEdge_tag = '{http://www.yworks.com/xml/graphml}PolyLineEdge'
-    NodeLabel_tag =    '{http://www.yworks.com/xml/graphml}NodeLabel'
-    LineStyle_tag =    '{http://www.yworks.com/xml/graphml}LineStyle'
-    Arrows_tag =       '{http://www.yworks.com/xml/graphml}Arrows'
-
-    NodeLabel_attr_configuration_name =        'com.yworks.entityRelationship.label.name'
-    NodeLabel_attr_configuration_attributes =  'com.yworks.entityRelationship.label.attributes'
-    GenericNode_attr_configuration_BigEntity = 'com.yworks.entityRelationship.big_entity'
+def extract_graphml(input_file_or_object, workspace=False, cache=None):
+    '''
+    Read an Entity-Relationship diagram created by the yEd graph editor, and extract its nodes and
+    convert its relationships into Entity-Relationship Markup Language.  The attributes of the nodes
+    are converted by convert_nodes().
+
+    Returns a dictionary with the relationships; the nodes, in order, converted if they were in the cache
+    or else to be converted; the names defined, in the order they are defined (including duplicates);
+    in a workspace, the names of the entities referenced from other diagrams; the cache entries for
+    the nodes and edges of this diagram; and the errors found so far.
+    Entities in a yEd group get the label of the group as their subject area.
+
+    If a cache of converted nodes and edges is given (see read_cache()), the nodes and edges that are
+    unchanged are not converted again.
+    Raises ET.ParseError or AssertionError if the diagram is not valid GraphML from yEd (see diagram_error()).
+    '''
+    logger.debug('Entering extract_graphml()')
+
+    def node_location(element_id, element='node'):
+        return f'{element} {element_id} in {input_file_or_object}' if workspace else f'{element} {element_id}'
 
     logger.debug('before parse()')
     tree = ET.parse(input_file_or_object)
     logger.debug('after parse()')
     root = tree.getroot()
 
-    logger.debug('Printing Entity-Relationship Markup Language')
-    er_head = {
-        "source": 'stdin' if input == '-' else input,
-        "generated_datetime": datetime.datetime.utcnow().isoformat()
-    }
-    print(yaml.dump(er_head), file=output_object)
-    er = { }
     end_kinds = set()   # delete after debugging done
-    er_entities = [ ]
-    er_enums = [ ]
     er_relationships = [ ]
-    name_set = set()                     # To prevent duplicate entity or enum names
+    names = [ ]                          # To find duplicate entity or enum names
+    references = [ ]                     # Names of entities defined in other diagrams of a workspace
     ignored_entity_node_ids = set()      # So you can ignore relationships to ignored entities
     node_id_to_entity_name = { }
+    cached = { 'nodes': { }, 'edges': { } } if cache is None else cache
+    used = { 'nodes': { }, 'edges': { } }
+    node_fragments = [ ]                 # The converted nodes, in order, or the index of the pending node
+    pending_nodes = [ ]                  # The nodes whose attributes are still to be converted
+    errors = [ ]
     graph_elem = root.find(graph_tag)
     assert graph_elem is not None, 'Expected graph tag is not present'
-    for graph_child in graph_elem:
+    # Nodes come before edges, so the entities of the edges are known, even between groups
+    graph_children = sorted(walk_graph(graph_elem), key=lambda child_area: child_area[0].tag == edge_tag)
+    for graph_child, subject_area in graph_children:
         logger.debug(f'Next graph_child: tag={strip_namespace(graph_child.tag)}')
-        logger.debug(ET.tostring(graph_child, encoding='utf8').decode('utf8'))
+        logger.opt(lazy=True).debug('{}', lambda: ET.tostring(graph_child, encoding='utf8').decode('utf8'))
         continue_graph_elem_loop = False
         # We only care about nodes and edges
         if graph_child.tag != node_tag and graph_child.tag != edge_tag:
@@ -150,6 +318,7 @@ def generml(input_file_or_object, input, output_object):
                 assert GenericNode_elem.attrib['configuration'] == GenericNode_attr_configuration_BigEntity, \
                     'Expected the generic node "configuration" attribute to indicate a BigEntity'
                 logger.debug(f'GraphML entity node {node_id}:')
+                is_reference = False
                 for GenericNode_subelem in GenericNode_elem:
                     logger.debug(f'{i(1)}Found a GenericNode_subelem, tag={strip_namespace(GenericNode_subelem.tag)}')
                     if GenericNode_subelem.tag == NodeLabel_tag:
@@ -159,11 +328,6 @@ def generml(input_file_or_object, input, output_object):
                         if NodeLabel_attr_configuration == NodeLabel_attr_configuration_name:
                             entity_name = NodeLabel_elem.text
                             logger.debug(f'{i(1)}entity_name={entity_name}')
-                            if entity_name in name_set:
-                                print(f'\nERROR: Duplicate name specified: {entity_name}', file=sys.stderr)
-                                sys.exit(1)
-                            else:
-                                name_set.add(entity_name)
                         elif NodeLabel_attr_configuration == NodeLabel_attr_configuration_attributes:
                             entity_attributes = NodeLabel_elem.text
                             logger.debug(f'{i(1)}entity_attributes={entity_attributes}')
@@ -174,7 +338,10 @@ def generml(input_file_or_object, input, output_object):
                             f'''node label element: {NodeLabel_attr_configuration}'''
                     elif GenericNode_subelem.tag == BorderStyle_tag:
                         logger.debug(f"{i(1)}GenericNode_subelem.attrib['type']={GenericNode_subelem.attrib['type']}")
-                        if GenericNode_subelem.attrib['type'] != 'line':
+                        if workspace and GenericNode_subelem.attrib['type'] == REFERENCE_BORDER_TYPE:
+                            logger.debug(f'{i(1)}The entity is a reference to an entity in another diagram')
+                            is_reference = True
+                        elif GenericNode_subelem.attrib['type'] != 'line':
                             logger.debug(f'{i(1)}Ignoring entity because the border is not a simple solid line')
                             ignored_entity_node_ids.add(node_id)  # So we can also ignore any edges to ignored entities
                             continue_graph_elem_loop = True
@@ -184,46 +351,22 @@ def generml(input_file_or_object, input, output_object):
                         pass
                 if continue_graph_elem_loop:
                     continue
-                # Now that we have an entity name and attributes, process the attributes
-                logger.debug(f'{i(1)}name: {entity_name}')
-                try:
-                    yaml_attrs = yaml.safe_load(entity_attributes)
-                except (yaml.scanner.ScannerError, yaml.parser.ParserError) as ex:
-                    print(f'\nERROR: Invalid YAML (syntax) for attributes section of ' \
-                          f'the "{entity_name}" entity:\n\n' \
-                          f'BEGIN>>>\n{entity_attributes}\n<<<END\n\n' \
-                          f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
-                    sys.exit(1)
-                if yaml_attrs is None:
-                    pass
-                else:
-                    logger.debug(f'{i(1)}YAML attributes:\n' + \
-                        yaml.dump(yaml_attrs, default_flow_style=False))
-                    try:
-                        json_schema = json_schema_graphml_enum if entity_name.lower().startswith('enum') \
-                            else json_schema_graphml_entity_attributes
-                        jsonschema.validate(instance=yaml_attrs, schema=json_schema)
-                    except jsonschema.exceptions.ValidationError as ex:
-                        print(f'\nERROR: Invalid YAML (schema) for attributes section of ' \
-                              f'the "{entity_name}" entity:\n\n' \
-                              f'BEGIN>>>\n{entity_attributes}\n<<<END\n\n' \
-                              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
-                        sys.exit(1)
-                if entity_name.lower().startswith('enum'):
-                    enum_contents = {} if yaml_attrs is None \
-                                    else yaml_attrs if type(yaml_attrs) == type({}) \
-                                    else { "values": yaml_attrs } if type(yaml_attrs) == type([]) \
-                                    else None
-                    assert enum_contents is not None, 'Unexpected contents for enum entity'
-                    enum_contents.update( { "name": entity_name } )
-                    enum = { "enum": enum_contents }
-                    er_enums.append(enum)
-                else:
-                    entity_contents = {} if yaml_attrs is None else yaml_attrs
-                    entity_contents.update( { "name": entity_name } )
-                    entity = { "entity": entity_contents }
-                    er_entities.append(entity)
+                if is_reference:
+                    references.append(entity_name)
                     node_id_to_entity_name.update( { node_id : entity_name } )
+                    continue
+                names.append(entity_name)
+                if not entity_name.lower().startswith('enum'):
+                    node_id_to_entity_name.update( { node_id : entity_name } )
+                node_key = fragment_key(entity_name, entity_attributes, 'line', subject_area)
+                if node_key in cached['nodes']:
+                    logger.debug(f'{i(1)}Reusing the cached conversion of {entity_name}')
+                    used['nodes'].update( { node_key: cached['nodes'][node_key] } )
+                    node_fragments.append(copy.deepcopy(cached['nodes'][node_key]))
+                    continue
+                # The attributes are converted after all nodes and edges are extracted, in parallel
+                node_fragments.append(len(pending_nodes))
+                pending_nodes.append( (node_location(node_id), entity_name, entity_attributes, subject_area, node_key) )
             else:
                 logger.debug(f'Skipping a non-GenericNode: data_subelem.tag={data_subelem.tag}')
                 pass  # Ignoring other kinds of nodes
@@ -257,6 +400,13 @@ def generml(input_file_or_object, input, output_object):
                 Arrows_elem = PolyLineEdge_elem.find(Arrows_tag)
                 arrow_source = Arrows_elem.attrib['source']
                 arrow_target = Arrows_elem.attrib['target']
+                edge_key = fragment_key(entity_source, entity_target, arrow_source, arrow_target,
+                                        edge_LineStyle_type, edge_LineStyle_width)
+                if edge_key in cached['edges']:
+                    logger.debug(f'{i(1)}Reusing the cached conversion of the relationship')
+                    used['edges'].update( { edge_key: cached['edges'][edge_key] } )
+                    er_relationships.append(copy.deepcopy(cached['edges'][edge_key]))
+                    continue
                 end_kinds.add(arrow_source)
                 end_kinds.add(arrow_target)
                 logger.debug(f'{i(1)}arrows: source={arrow_source} target={arrow_target}')
@@ -304,34 +454,316 @@ def generml(input_file_or_object, input, output_object):
                 }
                 if edge_LineStyle_width == '3.0':    # make more general
                     if kind_source != 'one' and kind_target != 'one':
-                        print(f'\nERROR: Expected an end of a defining relationship to have a cardinality of "one".  '
-                              f'Instead, found cardinalities of "{kind_source}" for entity "{entity_source}" '
-                              f'and "{kind_target}" for entity "{entity_target}".')
-                        sys.exit(1)
+                        errors.append(f'\nERROR: Expected an end of a defining relationship to have a cardinality of "one".  '
+                                      f'Instead, found cardinalities of "{kind_source}" for entity "{entity_source}" '
+                                      f'and "{kind_target}" for entity "{entity_target}" ({node_location(edge_id, "edge")}).')
+                        continue
                     is_defining = True
                 if is_defining:
                     relationship['relationship'].update({'defining': 'true'})
-                logger.debug(f'{i(1)}new relationship: {relationship}')
+                logger.debug('{}new relationship: {}', i(1), relationship)
                 er_relationships.append(relationship)
+                used['edges'].update( { edge_key: copy.deepcopy(relationship) } )
             else:
                 logger.debug(f'Skipping a non-PolyLineEdge: data_subelem.tag={data_subelem.tag}')
                 pass  # Ignoring other kinds of edges
         else:
             assert False, f'Expected either a node or an edge, found: {graph_child.tag}'
         
-    er.update( { "entities": er_entities } )
-    er.update( { "relationships": er_relationships } )
-    er.update( { "enums": er_enums } )
-    print(yaml.dump(er), file=output_object)
     logger.debug(f'relationship end kinds: {end_kinds}')
+
+    logger.debug('Leaving extract_graphml()')
+    return {
+        "relationships": er_relationships,
+        "nodes": node_fragments,
+        "pending_nodes": pending_nodes,
+        "names": names,
+        "references": references,
+        "cache": used,
+        "errors": errors
+    }
+
+
+def convert_nodes(diagram, jobs=None):
+    '''
+    Convert the nodes extracted from a diagram (see extract_graphml()) into entities and enums,
+    and yield them in order, as soon as each is converted.
+
+    The attributes of the nodes that were not in the cache are parsed and validated, in worker processes
+    if there are many of them, so all the errors are found in one pass.  The errors are added to those
+    of the diagram, and the converted nodes to its cache entries.
+    '''
+    logger.debug('Entering convert_nodes()')
+    pending_nodes = diagram['pending_nodes']
+    logger.debug(f'Converting the attributes of {len(pending_nodes)} nodes')
+    pending_names = [ pending_node[1] for pending_node in pending_nodes ]
+    pending_attributes = [ pending_node[2] for pending_node in pending_nodes ]
+    with contextlib.ExitStack() as stack:
+        if jobs == 1 or len(pending_nodes) < PARALLEL_MIN_NODES:
+            conversions = map(convert_attributes, pending_names, pending_attributes)
+        else:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=jobs))
+            chunksize = max(1, len(pending_nodes) // (4 * (jobs or os.cpu_count() or 1)))
+            conversions = executor.map(convert_attributes, pending_names, pending_attributes, chunksize=chunksize)
+        for node_fragment in diagram['nodes']:
+            if type(node_fragment) == type({}):
+                yield node_fragment
+                continue
+            location, entity_name, entity_attributes, subject_area, node_key = pending_nodes[node_fragment]
+            # The conversions are in the order of the pending nodes, which is the order of the nodes
+            yaml_attrs, error = next(conversions)
+            if error is not None:
+                diagram['errors'].append(f'\nERROR: Invalid YAML ({error[0]}) for attributes section of ' \
+                                         f'the "{entity_name}" entity ({location}):\n\n' \
+                                         f'BEGIN>>>\n{entity_attributes}\n<<<END\n\n' \
+                                         f'ERROR DETAILS:\n{error[1]}\n')
+                continue
+            if entity_name.lower().startswith('enum'):
+                enum_contents = {} if yaml_attrs is None \
+                                else yaml_attrs if type(yaml_attrs) == type({}) \
+                                else { "values": yaml_attrs } if type(yaml_attrs) == type([]) \
+                                else None
+                assert enum_contents is not None, 'Unexpected contents for enum entity'
+                enum_contents.update( { "name": entity_name } )
+                enum = { "enum": enum_contents }
+                diagram['cache']['nodes'].update( { node_key: copy.deepcopy(enum) } )
+                yield enum
+            else:
+                entity_contents = {} if yaml_attrs is None else yaml_attrs
+                entity_contents.update( { "name": entity_name } )
+                if subject_area is not None and 'subject_area' not in entity_contents:
+                    entity_contents.update( { "subject_area": subject_area } )
+                entity = { "entity": entity_contents }
+                diagram['cache']['nodes'].update( { node_key: copy.deepcopy(entity) } )
+                yield entity
+    logger.debug('Leaving convert_nodes()')
+
+
+def parse_graphml(input_file_or_object, workspace=False, cache=None, jobs=None):
+    '''
+    Read an Entity-Relationship diagram created by the yEd graph editor and
+    convert its entities, enums and relationships into Entity-Relationship Markup Language.
+
+    Returns the dictionary of extract_graphml(), with the entities and enums.
+    Raises ET.ParseError or AssertionError if the diagram is not valid GraphML from yEd (see diagram_error()).
+    '''
+    logger.debug('Entering parse_graphml()')
+    diagram = extract_graphml(input_file_or_object, workspace, cache)
+    er_entities = [ ]
+    er_enums = [ ]
+    for fragment in convert_nodes(diagram, jobs):
+        if 'enum' in fragment:
+            er_enums.append(fragment)
+        else:
+            er_entities.append(fragment)
+    diagram.update( { "entities": er_entities, "enums": er_enums } )
+    del diagram['nodes'], diagram['pending_nodes']
+    logger.debug('Leaving parse_graphml()')
+    return diagram
+
+
+def write_erml_section(key, fragments, output_object):
+    '''
+    Write a section of an ERML file (its entities, enums or relationships) one entity, enum or relationship
+    at a time, as they are produced, rather than all at once.  The section is as yaml.dump() writes it.
+    '''
+    empty = True
+    for fragment in fragments:
+        if empty:
+            print(f'{key}:', file=output_object)
+            empty = False
+        output_object.write(yaml.dump([ fragment ], Dumper=ERML_YAML_DUMPER))
+    if empty:
+        print(f'{key}: []', file=output_object)
+
+
+def write_erml(er_head, entities, relationships, enums, output_object, format='yaml'):
+    '''
+    Write an ERML file, streaming its entities, enums and relationships.
+    The enums are written after the entities, and the relationships after the enums, as yaml.dump() orders them.
+    The JSON and binary encodings (see dump_erml()) are written all at once.
+    '''
+    if format != 'yaml':
+        er = dict(er_head)
+        er.update( { "entities": list(entities), "relationships": list(relationships), "enums": list(enums) } )
+        dump_erml(er, output_object, format)
+        return
+    print(yaml.dump(er_head, Dumper=ERML_YAML_DUMPER), file=output_object)
+    write_erml_section('entities', entities, output_object)
+    write_erml_section('enums', enums, output_object)
+    write_erml_section('relationships', relationships, output_object)
+    print(file=output_object)
+
+
+def find_duplicate_names(names_by_source):
+    '''
+    Find the names defined more than once, across the sources.
+    Returns a dictionary of duplicate name to the sources that define it (a source is repeated
+    if the name is defined more than once in it).
+    '''
+    definitions = { }
+    for source, names in names_by_source:
+        for name in names:
+            definitions.setdefault(name, [ ]).append(source)
+    return { name: sources for name, sources in definitions.items() if len(sources) > 1 }
+
+
+def diagram_error(input, ex):
+    '''
+    Describe the error raised by extract_graphml() or parse_graphml() for a diagram that is not valid GraphML
+    from yEd
+    '''
+    if isinstance(ex, ET.ParseError):
+        return f'\nERROR: Invalid GraphML in the diagram {input}: {ex}'
+    return f'\nERROR: Unexpected structure in the diagram {input}: {ex}'
+
+
+def report_errors(errors):
+    '''
+    Report the errors found, if any, and exit
+    '''
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        sys.exit(1)
+
+
+@logger.catch
+def generml(input_file_or_object, input, output_object, cache=None, jobs=None, stream=False, format='yaml',
+            reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship diagram created by the yEd graph editor and 
+    convert it into Entity-Relationship Markup Language
+
+    \b
+    References:
+    yEd - https://www.yworks.com/products/yed
+    GraphML - http://graphml.graphdrawing.org/index.html
+
+    If a cache file is given, the nodes and edges that are unchanged since it was written are not converted again.
+    All the errors in the diagram are reported together.
+
+    If stream is true, each entity is written as soon as it is converted, so a downstream tool can start
+    reading the ERML before the whole diagram is converted.  If an entity then turns out to have errors,
+    the ERML written is incomplete.  Only YAML is streamed.
+
+    The ERML is written in the specified format: yaml, json or binary.
+    If reproducible is true, its generated_datetime is the digest of the diagram instead of the time
+    it was generated, so the same diagram always generates the same bytes.  The input file object
+    must then be a seekable binary file.
+    '''
+    logger.debug('Entering generml()')
+
+    stamp = generation_stamp(file_digest([ input_file_or_object ]) if reproducible else None)
+    cached = read_cache(cache)
+    try:
+        diagram = extract_graphml(input_file_or_object, cache=cached)
+    except (ET.ParseError, AssertionError) as ex:
+        report_errors([ diagram_error('stdin' if input == '-' else input, ex) ])
+    diagram['errors'].extend(f'\nERROR: Duplicate name specified: {name}'
+                             for name in find_duplicate_names([ (input, diagram['names']) ]))
+
+    # The enums are held until all the entities are written, as the enums follow the entities
+    er_enums = [ ]
+    def entities():
+        for fragment in convert_nodes(diagram, jobs):
+            if 'enum' in fragment:
+                er_enums.append(fragment)
+            else:
+                yield fragment
+    er_entities = entities()
+    if not stream or format != 'yaml' or diagram['errors']:
+        # Find all the errors before writing anything
+        er_entities = list(er_entities)
+    report_errors(diagram['errors'])
+
+    logger.debug('Printing Entity-Relationship Markup Language')
+    er_head = {
+        "source": 'stdin' if input == '-' else input,
+        "generated_datetime": stamp
+    }
+    write_erml(er_head, er_entities, diagram['relationships'], er_enums, output_object, format)
+    report_errors(diagram['errors'])
+    write_cache(cache, cached, diagram['cache'])
     logger.debug('Leaving generml()')
 
 
+@logger.catch
+def generml_workspace(inputs, output_object, jobs=None, cache=None, format='yaml', reproducible=False):
+    '''
+    Generally-callable entry point to
+    read the Entity-Relationship diagrams of a workspace, created by the yEd graph editor,
+    and merge them into one Entity-Relationship Markup Language file.
+
+    The diagrams are parsed in parallel.  An entity drawn with a dotted border is a reference to the entity
+    of that name defined in another diagram.  All duplicate names and all references to entities
+    not defined in any diagram are reported together, along with the errors in each diagram
+    and the diagrams that are not valid GraphML.
+
+    If a cache file is given, the nodes and edges that are unchanged since it was written are not converted again.
+    The ERML is written in the specified format: yaml, json or binary.
+    If reproducible is true, its generated_datetime is the digest of the diagrams instead of the time
+    it was generated.
+    '''
+    logger.debug('Entering generml_workspace()')
+    stamp = generation_stamp(file_digest(inputs) if reproducible else None)
+    cached = read_cache(cache)
+    errors = [ ]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [ executor.submit(parse_graphml, input, True, cached, 1) for input in inputs ]
+        parsed = [ ]
+        for input, future in zip(inputs, futures):
+            try:
+                parsed.append( (input, future.result()) )
+            except (ET.ParseError, AssertionError) as ex:
+                errors.append(diagram_error(input, ex))
+    inputs = [ input for input, diagram in parsed ]
+    diagrams = [ diagram for input, diagram in parsed ]
+
+    # The global name index: each entity or enum name to the diagram that defines it
+    name_index = { }
+    for input, diagram in zip(inputs, diagrams):
+        for name in diagram['names']:
+            name_index.setdefault(name, input)
+    logger.info(f'name_index={name_index}')
+
+    errors.extend(error for diagram in diagrams for error in diagram['errors'])
+    for name, sources in find_duplicate_names(zip(inputs, [ diagram['names'] for diagram in diagrams ])).items():
+        errors.append(f'\nERROR: Duplicate name specified: {name} (in {", ".join(sources)})')
+    for input, diagram in zip(inputs, diagrams):
+        for name in sorted(set(diagram['references'])):
+            if name not in name_index:
+                errors.append(f'\nERROR: Reference to an entity not defined in any diagram: {name} (in {input})')
+            else:
+                logger.debug(f'{i(1)}Resolved reference to {name} in {input} to {name_index[name]}')
+    report_errors(errors)
+
+    logger.debug('Printing Entity-Relationship Markup Language')
+    er_head = {
+        "source": ', '.join(inputs),
+        "generated_datetime": stamp
+    }
+    write_erml(er_head,
+               (entity for diagram in diagrams for entity in diagram['entities']),
+               (relationship for diagram in diagrams for relationship in diagram['relationships']),
+               (enum for diagram in diagrams for enum in diagram['enums']),
+               output_object, format)
+    used = { 'nodes': { }, 'edges': { } }
+    for diagram in diagrams:
+        used['nodes'].update(diagram['cache']['nodes'])
+        used['edges'].update(diagram['cache']['edges'])
+    write_cache(cache, cached, used)
+    logger.debug('Leaving generml_workspace()')
+
+
 @click.command()
 @click.option(
     '--input',
-    default='-',
-    help='Input GraphML file (default is standard input, also represented by a dash "-")',
+    default=[ '-' ],
+    multiple=True,
+    help='Input GraphML file (default is standard input, also represented by a dash "-").  May be repeated, '
+         'or be a directory of GraphML files, to merge the diagrams of a workspace.',
 )
 @click.option(
     '--output',
@@ -350,8 +782,43 @@ def generml(input_file_or_object, input, output_object):
     default='WARNING',
     help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
 )
+@click.option(
+    '--jobs',
+    type=click.IntRange(min=1),
+    default=None,
+    help='Number of worker processes to parse the diagrams of a workspace, or the attributes of a large diagram '
+         '(default is the number of CPUs)',
+)
+@click.option(
+    '--cache',
+    type=str,
+    default=None,
+    help='If specified, reuse the conversions of the unchanged nodes and edges from this file, and write it back',
+)
+@click.option(
+    '--stream',
+    is_flag=True,
+    default=False,
+    help='If specified, write each entity as soon as it is converted, rather than after the whole diagram is '
+         'converted and checked (the output is incomplete if there are errors)',
+)
+@click.option(
+    '--format',
+    type=click.Choice(ERML_FORMATS, case_sensitive=False),
+    default='yaml',
+    help='Set the encoding of the ERML file: "yaml" for people, or "json" or "binary", which are much faster '
+         'for other tools to read.  Default is yaml.',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, set generated_datetime to the digest of the diagrams instead of the time the ERML was '
+         'generated, so the same diagrams always generate the same bytes, and leave an output file alone '
+         'if it is unchanged',
+)
 @logger.catch
-def main(input, output, overwrite, logging):
+def main(input, output, overwrite, logging, jobs, cache, stream, format, reproducible):
     '''
     Read an Entity-Relationship diagram created by the yEd graph editor and 
     convert it into Entity-Relationship Markup Language
@@ -371,17 +838,33 @@ def main(input, output, overwrite, logging):
     logger.debug('Entering main()')
     logger.info(f'click version is {click.__version__}')
     logger.debug(
-        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging}'
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} jobs={jobs} '
+        f'cache={cache} stream={stream} format={format} reproducible={reproducible}'
     )
 
-    if input == '-':
-        input_file_or_object = sys.stdin
-    else:
-        if os.path.exists(input):
-            input_file_or_object = input
+    # The diagrams of a workspace: several input files, or a directory of them
+    inputs = [ ]
+    for input_path in input:
+        if input_path != '-' and os.path.isdir(input_path):
+            inputs.extend(sorted(os.path.join(input_path, file_name) for file_name in os.listdir(input_path)
+                                 if file_name.endswith('.graphml')))
         else:
-            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            inputs.append(input_path)
+    workspace = len(input) > 1 or len(inputs) != 1 or inputs[0] != input[0]
+    if workspace and '-' in inputs:
+        print(f'Error: Standard input cannot be one of the diagrams of a workspace', file=sys.stderr)
+        sys.exit(1)
+    if workspace and len(inputs) == 0:
+        print(f'Error: Specified input directory has no GraphML files: {", ".join(input)}', file=sys.stderr)
+        sys.exit(1)
+    for input_path in inputs:
+        if input_path != '-' and not os.path.exists(input_path):
+            print(f'Error: Specified input file does not exist: {input_path}', file=sys.stderr)
             sys.exit(1)
+    input_file_or_object = sys.stdin if inputs[0] == '-' else inputs[0]
+    if reproducible and inputs[0] == '-':
+        # The diagram is read twice: for its digest, and to convert it
+        input_file_or_object = io.BytesIO(sys.stdin.buffer.read())
 
     if output == '-':
         output_object = sys.stdout
@@ -391,16 +874,22 @@ def main(input, output, overwrite, logging):
             sys.exit(1)
 
         try:
-            output_object = open(output, 'w')
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
         except IOError as ex:
             print(f'ERROR: Unable to write to the specified output file {output}.\n'
                   f'Details: {ex}', file=sys.stderr)
             sys.exit(1)
 
-    generml(input_file_or_object, input, output_object)
+    if workspace:
+        generml_workspace(inputs, output_object, jobs, cache, format.lower(), reproducible)
+    else:
+        generml(input_file_or_object, inputs[0], output_object, cache, jobs, stream, format.lower(), reproducible)
 
     if output != '-':
         output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
     logger.debug('Leaving main()')
     
 
@@ -0,0 +1,310 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to analyze the operational impact of deletes (and key updates) in the schema generated
+from an Entity-Relationship Markup Language (ERML) file, and to check it against thresholds.
+
+For each table, the report gives its depth in the dependency graph, its fan-in and fan-out,
+the tables its deletes cascade to, set to null in, or are blocked by, the longest chain of
+cascading deletes, and the number of tables a single delete locks.  If any threshold is
+exceeded, the violations are listed on standard error and the exit status is 1, so the
+check can gate a continuous integration pipeline.
+
+Usage: genimpact.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write a delete impact
+  report as a JSON file, checking it against the specified thresholds
+
+Options:
+  --input TEXT                   Input Entity-Relationship Markup Language
+                                 file (default is standard input, also
+                                 represented by a dash "-")
+
+  --output TEXT                  Output JSON report file (default is standard
+                                 output, also represented by a dash "-")
+
+  --overwrite                    If specified, overwrite the output file if it
+                                 already exists
+
+  --logging TEXT                 Set logging to the specified level: NOTSET,
+                                 DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+  --generate-keys BOOLEAN        Indicates whether the schema was generated
+                                 with synthetic keys.  Default is true.
+
+  --max-cascade-reach INTEGER    Fail if a delete cascades to more than this
+                                 many other tables
+
+  --max-cascade-depth INTEGER    Fail if a chain of cascading deletes is
+                                 longer than this many foreign keys
+
+  --max-locked-tables INTEGER    Fail if a delete locks more than this many
+                                 tables
+
+  --max-fan-out INTEGER          Fail if more than this many foreign keys
+                                 reference a table
+
+  --reproducible                 If specified, stamp the output with the
+                                 digest of the model instead of the time it
+                                 was generated, so the same model always
+                                 generates the same bytes, and leave an output
+                                 file alone if it is unchanged
+
+  --help                         Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, build_delete_impact, model_errors, model_digest, generation_stamp, staging_path, \
+        replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, build_delete_impact, model_errors, model_digest, generation_stamp, staging_path, \
+        replace_if_changed
+
+
+# Threshold name to the function that measures it for a table (see util.build_delete_impact)
+THRESHOLD_METRICS = {
+    'max_cascade_reach': lambda table_impact: len(table_impact['cascade_reach']),
+    'max_cascade_depth': lambda table_impact: len(table_impact['cascade_chain']) - 1,
+    'max_locked_tables': lambda table_impact: table_impact['locked_tables'],
+    'max_fan_out': lambda table_impact: table_impact['fan_out'],
+}
+
+
+@logger.catch
+def check_thresholds(impact, thresholds):
+    '''
+    Check the impact of each table against the thresholds that are set (not None),
+    returning a list of violations
+    '''
+    logger.debug('Entering check_thresholds()')
+    violations = [ ]
+    for table_name, table_impact in impact.items():
+        for threshold_name, threshold in thresholds.items():
+            if threshold is None:
+                continue
+            value = THRESHOLD_METRICS[threshold_name](table_impact)
+            if value > threshold:
+                logger.debug(f'{i(1)}table_name={table_name} {threshold_name}={threshold} value={value}')
+                violations.append( { 'table': table_name, 'threshold': threshold_name,
+                                     'limit': threshold, 'value': value } )
+    logger.debug('Leaving check_thresholds()')
+    return violations
+
+
+@logger.catch
+def genimpact(er_yaml, input, output_object, thresholds, generate_keys=True, reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write a delete impact report,
+    returning the list of threshold violations
+
+    If reproducible is true, the report is stamped with the digest of the model instead of the time
+    it was generated.
+    '''
+    logger.debug('Entering genimpact()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    impact = build_delete_impact(er_yaml, generate_keys)
+    violations = check_thresholds(impact, thresholds)
+    report = { 'generated_by': 'Zepster',
+               'source': 'stdin' if input == '-' else input,
+               'generated': stamp,
+               'thresholds': thresholds,
+               'tables': impact,
+               'violations': violations }
+    print(json.dumps(report, indent=4), file=output_object)
+    logger.debug('Leaving genimpact()')
+    return violations
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output JSON report file (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output file if it already exists',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--generate-keys',
+    type=click.BOOL,
+    default=True,
+    help='Indicates whether the schema was generated with synthetic keys.  Default is true.'
+)
+@click.option(
+    '--max-cascade-reach',
+    type=int,
+    default=None,
+    help='Fail if a delete cascades to more than this many other tables',
+)
+@click.option(
+    '--max-cascade-depth',
+    type=int,
+    default=None,
+    help='Fail if a chain of cascading deletes is longer than this many foreign keys',
+)
+@click.option(
+    '--max-locked-tables',
+    type=int,
+    default=None,
+    help='Fail if a delete locks more than this many tables',
+)
+@click.option(
+    '--max-fan-out',
+    type=int,
+    default=None,
+    help='Fail if more than this many foreign keys reference a table',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, overwrite, logging, generate_keys, max_cascade_reach, max_cascade_depth,
+         max_locked_tables, max_fan_out, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file and write a delete impact report as a JSON file,
+    checking it against the specified thresholds
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} '
+        f'generate_keys={generate_keys} max_cascade_reach={max_cascade_reach} max_cascade_depth={max_cascade_depth} '
+        f'max_locked_tables={max_locked_tables} max_fan_out={max_fan_out} reproducible={reproducible}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    thresholds = { 'max_cascade_reach': max_cascade_reach, 'max_cascade_depth': max_cascade_depth,
+                   'max_locked_tables': max_locked_tables, 'max_fan_out': max_fan_out }
+    violations = genimpact(er_yaml, input, output_object, thresholds, generate_keys, reproducible)
+
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+
+    for violation in violations:
+        print(f'Error: Table {violation["table"]} exceeds {violation["threshold"]} of {violation["limit"]} '
+              f'with {violation["value"]}', file=sys.stderr)
+    if violations:
+        sys.exit(1)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
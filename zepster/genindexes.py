@@ -0,0 +1,459 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to recommend indexes for the schema generated from an
+Entity-Relationship Markup Language (ERML) file.
+
+Indexes are recommended for foreign keys (joins and cascading deletes),
+for "unique: within_parent" attributes, and for the access patterns declared
+in the optional "access_patterns" section of the ERML:
+
+access_patterns:
+- entity: state
+  lookup: [ scientist_id ]       # find rows by these columns
+- entity: state
+  join: pentode                  # list the state rows of a pentode
+  sort: [ date_applicable_begin desc ]
+  include: [ matter ]            # read these columns from the index alone
+
+A recommendation that is covered by another index (an index on the same
+leading columns) is reported as redundant and left out of the DDL.
+
+Usage: genindexes.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write an index
+  recommendation report, and optionally the DDL to create the indexes
+
+Options:
+  --input TEXT             Input Entity-Relationship Markup Language file
+                           (default is standard input, also represented by a
+                           dash "-")
+
+  --output TEXT            Output report file, in Markdown (default is
+                           standard output, also represented by a dash "-")
+
+  --ddl TEXT               If specified, also write the DDL to create the
+                           recommended indexes to this file
+
+  --overwrite              If specified, overwrite the output files if they
+                           already exist
+
+  --logging TEXT           Set logging to the specified level: NOTSET, DEBUG,
+                           INFO, WARNING, ERROR, CRITICAL
+
+  --dialect [CRDB|PG]      Set the database dialect: "CRDB" for CockroachDB or
+                           "PG" for PostgreSQL.  Default is CRDB.
+
+  --generate-keys BOOLEAN  Indicates whether the schema was generated with
+                           synthetic keys.  Default is true.  Set to false to
+                           match a schema generated by "genschema --generate-
+                           keys false".
+
+  --reproducible           If specified, stamp the outputs with the digest of
+                           the model instead of the time they were generated,
+                           so the same model always generates the same bytes,
+                           and leave an output file alone if it is unchanged
+
+  --help                   Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, \
+        make_index, build_existing_indexes, model_errors, model_digest, generation_stamp, staging_path, replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, \
+        make_index, build_existing_indexes, model_errors, model_digest, generation_stamp, staging_path, replace_if_changed
+
+@logger.catch
+def build_recommendations(er_yaml, dependency_ordering, mm_synthesized, table_fks, table_columns):
+    '''
+    Recommend indexes for foreign keys, "unique: within_parent" attributes, and declared access patterns
+    '''
+    logger.debug('Entering build_recommendations()')
+    recommendations = [ ]
+
+    # Foreign keys: joins from the parent, and the lookups of cascading (or blocked) deletes of parent rows
+    for table_name in dependency_ordering:
+        for fk in table_fks[table_name]:
+            recommendations.append(make_index(table_name, fk['columns'], [ ], False,
+                                              f'Foreign key to {fk["references"]}: joins from {fk["references"]} '
+                                              f'and deletes of {fk["references"]} rows'))
+
+    # Uniqueness within the parent: unique on the parent reference and the attribute
+    for table_name in dependency_ordering:
+        if table_name in mm_synthesized:
+            continue
+        parent_fks = [ fk for fk in table_fks[table_name]
+                       if fk['on_delete'] == 'cascade' and not fk['self_reference'] and fk['kind'] == 'one' ] or \
+                     [ fk for fk in table_fks[table_name] if fk['required'] and fk['kind'] == 'one' ]
+        for column in table_columns[table_name]:
+            if column['source'] != 'attribute' or column['unique'] != 'within_parent':
+                continue
+            if not parent_fks:
+                logger.warning(f'Attribute {column["name"]} of {table_name} is unique within its parent, '
+                               f'but {table_name} has no required parent')
+                continue
+            parent_columns = [ ]
+            for fk in parent_fks:
+                parent_columns.extend(parent_column for parent_column in fk['columns']
+                                      if parent_column not in parent_columns)
+            recommendations.append(make_index(table_name, parent_columns + [ column['name'] ], [ ], True,
+                                              f'{column["name"]} is unique within its parent '
+                                              f'{", ".join(fk["references"] for fk in parent_fks)}'))
+
+    # Declared access patterns
+    for pattern_num, pattern in enumerate(er_yaml.get('access_patterns', None) or [ ]):
+        entity_name = pattern['entity']
+        if entity_name not in table_columns:
+            print(f'Error: Access pattern {pattern_num+1} names an entity that does not exist or has no table: '
+                  f'{entity_name}', file=sys.stderr)
+            sys.exit(1)
+        sort = pattern.get('sort', [ ])
+        include = pattern.get('include', [ ])
+        column_names = [ column['name'] for column in table_columns[entity_name] ]
+        for column in [ column.split(' ')[0] for column in pattern.get('lookup', [ ]) + sort ] + include:
+            if column not in column_names:
+                print(f'Error: Access pattern {pattern_num+1} names a column that is not in table {entity_name}: '
+                      f'{column}', file=sys.stderr)
+                sys.exit(1)
+        description = f'Access pattern {pattern_num+1}'
+        if 'lookup' in pattern:
+            recommendations.append(make_index(entity_name, pattern['lookup'] + sort, include, False,
+                                              f'{description}: look up {entity_name} by '
+                                              f'{", ".join(pattern["lookup"])}'))
+        if 'join' in pattern:
+            join_name = pattern['join']
+            fk = next((fk for fk in table_fks[entity_name] if fk['references'] == join_name), None)
+            child_fk = next((fk for fk in table_fks.get(join_name, [ ]) if fk['references'] == entity_name), None)
+            mm_name = next((mm_name for mm_name in sorted(table_fks)
+                            if set(fk['references'] for fk in table_fks[mm_name]) >= { entity_name, join_name }), None)
+            if fk is not None:
+                recommendations.append(make_index(entity_name, fk['columns'] + sort, include, False,
+                                                  f'{description}: list the {entity_name} rows of a {join_name}'))
+            elif child_fk is not None:
+                # Reaching the parent from the child is a lookup by the parent's key
+                recommendations.append(make_index(entity_name, child_fk['referenced_columns'], [ ], False,
+                                                  f'{description}: join {entity_name} from {join_name}'))
+            elif mm_name is not None:
+                from_fk = next(fk for fk in table_fks[mm_name] if fk['references'] == join_name)
+                to_fk = next(fk for fk in table_fks[mm_name] if fk['references'] == entity_name)
+                recommendations.append(make_index(mm_name, from_fk['columns'] + to_fk['columns'], [ ], False,
+                                                  f'{description}: join {entity_name} from {join_name} '
+                                                  f'through {mm_name}'))
+            else:
+                print(f'Error: Access pattern {pattern_num+1} joins {entity_name} from {join_name}, '
+                      f'but they have no relationship', file=sys.stderr)
+                sys.exit(1)
+        if 'lookup' not in pattern and 'join' not in pattern and sort:
+            recommendations.append(make_index(entity_name, sort, include, False,
+                                              f'{description}: read {entity_name} in order'))
+    logger.debug('Leaving build_recommendations()')
+    return recommendations
+
+
+def covers(covering, index):
+    '''
+    Determine whether one index makes another unnecessary: it starts with the other's columns,
+    holds its included columns, and enforces any uniqueness the other enforces
+    '''
+    if covering['columns'][:len(index['columns'])] != index['columns']:
+        return False
+    if not set(index['include']) <= set(column.split(' ')[0] for column in covering['columns'] + covering['include']):
+        return False
+    return not index['unique'] or (covering['unique'] and covering['columns'] == index['columns'])
+
+
+@logger.catch
+def flag_redundant(existing, recommendations):
+    '''
+    Flag each recommendation that is covered by an existing index, by an earlier recommendation,
+    or by a later recommendation with more columns
+    '''
+    logger.debug('Entering flag_redundant()')
+    for index_num, index in enumerate(recommendations):
+        candidates = existing.get(index['table'], [ ]) + \
+                     [ other for other_num, other in enumerate(recommendations)
+                       if other_num != index_num and other['table'] == index['table'] and other['redundant_with'] is None
+                       and (other_num < index_num or len(other['columns']) > len(index['columns'])) ]
+        covering = next((candidate for candidate in candidates if covers(candidate, index)), None)
+        if covering is not None:
+            index.update( { 'redundant_with': covering } )
+    logger.debug('Leaving flag_redundant()')
+
+
+def index_ddl(index, dialect):
+    '''
+    Make the statement that creates an index
+    '''
+    include = ''
+    if index['include']:
+        include = f' {"include" if dialect == "PG" else "storing"} ({", ".join(index["include"])})'
+    return f'create {"unique " if index["unique"] else ""}index if not exists {index["name"]} ' \
+           f'on {index["table"]} ({", ".join(index["columns"])}){include};'
+
+
+@logger.catch
+def generate_report(recommendations, output_object):
+    '''
+    Write the recommendations as a Markdown report
+    '''
+    logger.debug('Entering generate_report()')
+    num_redundant = sum(1 for index in recommendations if index['redundant_with'] is not None)
+    print(f'{len(recommendations) - num_redundant} indexes recommended, {num_redundant} redundant.', file=output_object)
+    print(file=output_object)
+    print('Table | Index | Columns | Include | Reason | Redundant With', file=output_object)
+    print('----- | ----- | ------- | ------- | ------ | --------------', file=output_object)
+    for index in recommendations:
+        covering = index['redundant_with']
+        redundant_with = f'{covering["name"]} ({", ".join(covering["columns"])})' if covering is not None else ''
+        print(f'{index["table"]} | {index["name"]} | {", ".join(index["columns"])} | {", ".join(index["include"])} | '
+              f'{index["reason"]} | {redundant_with}', file=output_object)
+    logger.debug('Leaving generate_report()')
+
+
+@logger.catch
+def generate_ddl(recommendations, dialect, input, stamp, ddl_object):
+    '''
+    Write the statements that create the recommended indexes, leaving out redundant ones
+    '''
+    logger.debug('Entering generate_ddl()')
+    print(f'-- Index recommendations generated by Zepster', file=ddl_object)
+    print(f'-- Source: {"stdin" if input == "-" else input}', file=ddl_object)
+    print(f'-- Generated: {stamp}', file=ddl_object)
+    print(file=ddl_object)
+    for index in recommendations:
+        print(f'-- {index["reason"]}', file=ddl_object)
+        if index['redundant_with'] is not None:
+            print(f'-- Redundant with {index["redundant_with"]["name"]}: {index_ddl(index, dialect)}', file=ddl_object)
+        else:
+            print(index_ddl(index, dialect), file=ddl_object)
+    logger.debug('Leaving generate_ddl()')
+
+
+@logger.catch
+def genindexes(er_yaml, input, output_object, ddl_object=None, dialect='CRDB', generate_keys=True,
+               reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write an index recommendation report
+    and optionally the DDL to create the indexes
+
+    The report and the DDL carry the same stamp: the digest of the model if reproducible is true,
+    or else the time they were generated.
+    '''
+    logger.debug('Entering genindexes()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys)
+
+    existing = build_existing_indexes(er_yaml, table_keys, table_columns, dialect)
+    recommendations = build_recommendations(er_yaml, dependency_ordering, mm_synthesized, table_fks, table_columns)
+    flag_redundant(existing, recommendations)
+    logger.opt(lazy=True).debug('recommendations={}', lambda: json.dumps(recommendations, indent=4, default=str))
+
+    print(f'# Index Recommendations', file=output_object)
+    print(f'Generated by Zepster  ', file=output_object)
+    print(f'Source: {"stdin" if input == "-" else input}  ', file=output_object)
+    print(f'Generated: {stamp}', file=output_object)
+    print(file=output_object)
+    generate_report(recommendations, output_object)
+    if ddl_object is not None:
+        generate_ddl(recommendations, dialect, input, stamp, ddl_object)
+    logger.debug('Leaving genindexes()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output report file, in Markdown (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--ddl',
+    type=str,
+    default=None,
+    help='If specified, also write the DDL to create the recommended indexes to this file',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output files if they already exist',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--dialect',
+    type=click.Choice(['CRDB', 'PG'], case_sensitive=False),
+    default='CRDB',
+    help='Set the database dialect: "CRDB" for CockroachDB or "PG" for PostgreSQL.  Default is CRDB.',
+)
+@click.option(
+    '--generate-keys',
+    type=click.BOOL,
+    default=True,
+    help='Indicates whether the schema was generated with synthetic keys.  Default is true.  '
+         'Set to false to match a schema generated by "genschema --generate-keys false".'
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the outputs with the digest of the model instead of the time they were generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, ddl, overwrite, logging, dialect, generate_keys, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file and write an index recommendation report,
+    and optionally the DDL to create the indexes
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} ddl={ddl} overwrite={overwrite} logging={logging} '
+        f'dialect={dialect} generate_keys={generate_keys} reproducible={reproducible}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+    ddl_object = None
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if ddl is not None:
+        if overwrite == False and os.path.exists(ddl):
+            print(f'Error: Specified DDL file already exists: {ddl}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            ddl_path = staging_path(ddl) if reproducible else ddl
+            ddl_object = open(ddl_path, 'w')
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified DDL file {ddl}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    genindexes(er_yaml, input, output_object, ddl_object, dialect.upper(), generate_keys, reproducible)
+
+    if ddl_object is not None:
+        ddl_object.close()
+        if reproducible:
+            replace_if_changed(ddl_path, ddl)
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -0,0 +1,463 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to find join paths between the entities of an
+Entity-Relationship Markup Language (ERML) file, and write them as SQL joins.
+
+Paths go through the foreign keys of the generated schema, including synthesized
+many-to-many mapping tables and subclass tables.  They are the shortest (fewest joins)
+or the cheapest (fewest rows read, from the row-count hints used by gencapacity).
+Each join uses the foreign key columns, and is flagged if no generated index
+starts with them (see genindexes).
+
+The paths from an entity are found all at once and kept in a path index, so further
+queries from the same entity are dictionary lookups.  The join graph and the path index
+can be saved to a cache file, which is reused as long as the model and options are unchanged,
+so a query answered from the cache does not build the physical model or the join graph.
+
+Usage: genjoins.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write the SQL joins
+  along the join paths between entities
+
+Options:
+  --input TEXT             Input Entity-Relationship Markup Language file
+                           (default is standard input, also represented by a
+                           dash "-")
+
+  --output TEXT            Output SQL file (default is standard output, also
+                           represented by a dash "-")
+
+  --overwrite              If specified, overwrite the output file if it
+                           already exists
+
+  --logging TEXT           Set logging to the specified level: NOTSET, DEBUG,
+                           INFO, WARNING, ERROR, CRITICAL
+
+  --from TEXT              Entity the join path starts from  [required]
+
+  --to TEXT                Entity the join path ends at.  May be repeated.
+                           [required]
+
+  --cost [hops|rows]       Find the path with the fewest joins ("hops") or
+                           the fewest estimated rows read ("rows").  Default
+                           is hops.
+
+  --cache TEXT             If specified, read the join graph and path index
+                           from this file if it matches the model, and write
+                           them back
+
+  --all-pairs              If specified, index the paths between all pairs of
+                           entities (to fill the cache)
+
+  --generate-keys BOOLEAN  Indicates whether the schema was generated with
+                           synthetic keys.  Default is true.
+
+  --reproducible           If specified, stamp the output with the digest of
+                           the model instead of the time it was generated, so
+                           the same model always generates the same bytes, and
+                           leave an output file alone if it is unchanged
+
+  --help                   Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import hashlib
+import heapq
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, build_existing_indexes, build_row_estimates, \
+        model_digest, model_errors, generation_stamp, staging_path, replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, build_existing_indexes, build_row_estimates, \
+        model_digest, model_errors, generation_stamp, staging_path, replace_if_changed
+
+
+@logger.catch
+def build_join_graph(er_yaml, cost='hops', generate_keys=True):
+    '''
+    Build the join graph of the physical model: a dictionary of table name to the list of joins from it,
+    each a dictionary of:
+     table    the table joined to
+     child    the table with the foreign key
+     columns  the foreign key columns of the child
+     parent   the table the foreign key references
+     referenced_columns  the key columns of the parent
+     indexed  whether an index starts with the columns looked up in the table joined to
+     cost     the cost of the join: 1 for "hops", or the estimated rows of the table joined to for "rows"
+    Self references are left out, as they do not lead to another table.
+    '''
+    logger.debug('Entering build_join_graph()')
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys)
+    existing = build_existing_indexes(er_yaml, table_keys, table_columns, 'CRDB')
+    row_estimates = build_row_estimates(er_yaml, dependency_ordering, mm_synthesized, table_fks)
+
+    def indexed(table_name, columns):
+        return any(index['columns'][:len(columns)] == columns for index in existing[table_name])
+
+    def join_cost(table_name):
+        return 1 if cost == 'hops' else max(1, row_estimates[table_name]['rows'])
+
+    join_graph = { table_name: [ ] for table_name in dependency_ordering }
+    for child_name in dependency_ordering:
+        for fk in table_fks[child_name]:
+            if fk['self_reference']:
+                continue
+            join = { 'child': child_name, 'columns': fk['columns'],
+                     'parent': fk['references'], 'referenced_columns': fk['referenced_columns'] }
+            join_graph[child_name].append(dict(join, table=fk['references'], indexed=True,
+                                               cost=join_cost(fk['references'])))
+            join_graph[fk['references']].append(dict(join, table=child_name,
+                                                     indexed=indexed(child_name, fk['columns']),
+                                                     cost=join_cost(child_name)))
+    logger.debug('Leaving build_join_graph()')
+    return join_graph
+
+
+@logger.catch
+def index_join_paths(join_graph, path_index, from_name):
+    '''
+    Find the cheapest join paths from a table to every table it can reach (Dijkstra's algorithm),
+    and add them to the path index as a dictionary of table name to the join that reaches it
+    '''
+    logger.debug(f'Entering index_join_paths() from_name={from_name}')
+    costs = { from_name: 0 }
+    predecessors = { }
+    heap = [ (0, from_name) ]
+    while heap:
+        path_cost, table_name = heapq.heappop(heap)
+        if path_cost > costs[table_name]:
+            continue
+        for join_num, join in enumerate(join_graph[table_name]):
+            next_cost = path_cost + join['cost']
+            if join['table'] not in costs or next_cost < costs[join['table']]:
+                costs.update( { join['table']: next_cost } )
+                predecessors.update( { join['table']: [ table_name, join_num ] } )
+                heapq.heappush(heap, (next_cost, join['table']))
+    path_index.update( { from_name: predecessors } )
+    logger.debug('Leaving index_join_paths()')
+    return predecessors
+
+
+def find_join_path(join_graph, path_index, from_name, to_name):
+    '''
+    Find the cheapest join path between two tables, as the list of joins from from_name to to_name,
+    using the path index (a dictionary the caller keeps between queries), and indexing the paths
+    from from_name if they are not already.  Returns None if there is no path.
+    '''
+    predecessors = path_index[from_name] if from_name in path_index \
+        else index_join_paths(join_graph, path_index, from_name)
+    if to_name != from_name and to_name not in predecessors:
+        return None
+    path = [ ]
+    table_name = to_name
+    while table_name != from_name:
+        previous_name, join_num = predecessors[table_name]
+        path.append(join_graph[previous_name][join_num])
+        table_name = previous_name
+    path.reverse()
+    return path
+
+
+def join_sql(from_name, path):
+    '''
+    Make the SQL that joins the tables along a join path
+    '''
+    lines = [ f'select {path[-1]["table"] if path else from_name}.*', f'from {from_name}' ]
+    for join in path:
+        conditions = ' and '.join(f'{join["child"]}.{column} = {join["parent"]}.{referenced_column}'
+                                  for column, referenced_column in zip(join['columns'], join['referenced_columns']))
+        if not join['indexed']:
+            lines.append(f'-- No index starts with {join["child"]} ({", ".join(join["columns"])}), see genindexes')
+        lines.append(f'join {join["table"]} on {conditions}')
+    return '\n'.join(lines) + ';'
+
+
+def cache_key(er_yaml, cost, generate_keys):
+    '''
+    Digest the model and the options that the join paths depend on, to tell whether a cached join graph
+    and path index are still valid
+    '''
+    return hashlib.sha256(f'{model_digest(er_yaml)} {cost} {generate_keys}'.encode()).hexdigest()
+
+
+def read_cache(cache, digest):
+    '''
+    Read the join graph and path index from a cache file, or return None for both if it does not exist
+    or is for a different model or options
+    '''
+    if cache is None or not os.path.exists(cache):
+        return None, None
+    try:
+        with open(cache, 'r') as cache_object:
+            cached = json.load(cache_object)
+    except (IOError, ValueError) as ex:
+        logger.warning(f'Unable to read the cache {cache}, so ignoring it: {ex}')
+        return None, None
+    if cached.get('digest', None) != digest or 'graph' not in cached:
+        logger.info(f'Cache {cache} is for a different model or options, so ignoring it')
+        return None, None
+    return cached['graph'], cached['paths']
+
+
+def validated_join_graph(er_yaml, cost='hops', generate_keys=True):
+    '''
+    Validate the model, exiting if it is not valid, and build its join graph
+    '''
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    return build_join_graph(er_yaml, cost, generate_keys)
+
+
+@logger.catch
+def genjoins(er_yaml, input, output_object, from_name, to_names, cost='hops', cache=None, all_pairs=False,
+             generate_keys=True, reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write the SQL joins along the join paths between entities
+
+    If reproducible is true, the joins are stamped with the digest of the model instead of the time
+    they were generated.
+    '''
+    logger.debug('Entering genjoins()')
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    digest = cache_key(er_yaml, cost, generate_keys)
+    join_graph, path_index = read_cache(cache, digest)
+    cache_hit = join_graph is not None
+    if cache_hit:
+        # The cache is only written for a model that was valid, so the model is not validated again
+        logger.info(f'Using the join graph and path index in the cache {cache}')
+    else:
+        join_graph, path_index = validated_join_graph(er_yaml, cost, generate_keys), { }
+    for table_name in [ from_name ] + list(to_names):
+        if table_name not in join_graph:
+            print(f'Error: Specified entity does not exist or has no table: {table_name}', file=sys.stderr)
+            sys.exit(1)
+
+    num_indexed = len(path_index)
+    if all_pairs:
+        for table_name in join_graph:
+            if table_name not in path_index:
+                index_join_paths(join_graph, path_index, table_name)
+
+    print(f'-- Join paths generated by Zepster', file=output_object)
+    print(f'-- Source: {"stdin" if input == "-" else input}', file=output_object)
+    print(f'-- Generated: {stamp}', file=output_object)
+    print(file=output_object)
+    for to_name in to_names:
+        path = find_join_path(join_graph, path_index, from_name, to_name)
+        if path is None:
+            print(f'-- No join path from {from_name} to {to_name}', file=output_object)
+        else:
+            print(f'-- Join path from {from_name} to {to_name} ({len(path)} join{"" if len(path) == 1 else "s"})',
+                  file=output_object)
+            print(join_sql(from_name, path), file=output_object)
+        print(file=output_object)
+
+    if cache is not None and (not cache_hit or len(path_index) > num_indexed):
+        try:
+            with open(cache, 'w') as cache_object:
+                json.dump( { 'digest': digest, 'graph': join_graph, 'paths': path_index }, cache_object)
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified cache file {cache}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+    logger.debug('Leaving genjoins()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output SQL file (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output file if it already exists',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--from',
+    'from_name',
+    type=str,
+    required=True,
+    help='Entity the join path starts from',
+)
+@click.option(
+    '--to',
+    'to_names',
+    type=str,
+    multiple=True,
+    required=True,
+    help='Entity the join path ends at.  May be repeated.',
+)
+@click.option(
+    '--cost',
+    type=click.Choice(['hops', 'rows'], case_sensitive=False),
+    default='hops',
+    help='Find the path with the fewest joins ("hops") or the fewest estimated rows read ("rows").  Default is hops.',
+)
+@click.option(
+    '--cache',
+    type=str,
+    default=None,
+    help='If specified, read the join graph and path index from this file if it matches the model, '
+         'and write them back',
+)
+@click.option(
+    '--all-pairs',
+    is_flag=True,
+    default=False,
+    help='If specified, index the paths between all pairs of entities (to fill the cache)',
+)
+@click.option(
+    '--generate-keys',
+    type=click.BOOL,
+    default=True,
+    help='Indicates whether the schema was generated with synthetic keys.  Default is true.'
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, overwrite, logging, from_name, to_names, cost, cache, all_pairs, generate_keys, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file and write the SQL joins along the join paths between entities
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} '
+        f'from_name={from_name} to_names={to_names} cost={cost} cache={cache} all_pairs={all_pairs} '
+        f'generate_keys={generate_keys} reproducible={reproducible}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    genjoins(er_yaml, input, output_object, from_name, to_names, cost.lower(), cache, all_pairs, generate_keys,
+             reproducible)
+
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
@@ -0,0 +1,384 @@
+'''
+Copyright 2020 Cisco Systems, Inc. and its affiliates.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License
+
+
+Program to generate cascade-aware, batched purge and archive jobs
+from an Entity-Relationship Markup Language (ERML) file.
+
+Defining relationships become "on delete cascade" foreign keys, so deleting
+a single root row can fan out into a very large number of child deletes in
+one transaction.  The generated jobs instead work bottom-up (children before
+their parents), touching at most a fixed number of rows per statement.
+
+Usage: genpurge.py [OPTIONS]
+
+  Read an Entity-Relationship Markup Language file and write batched purge
+  (and optionally archive) jobs as a SQL file
+
+Options:
+  --input TEXT           Input Entity-Relationship Markup Language file
+                         (default is standard input, also represented by a
+                         dash "-")
+
+  --output TEXT          Output purge job file (default is standard output,
+                         also represented by a dash "-")
+
+  --overwrite            If specified, overwrite the output file if it already
+                         exists
+
+  --logging TEXT         Set logging to the specified level: NOTSET, DEBUG,
+                         INFO, WARNING, ERROR, CRITICAL
+
+  --entity TEXT          Root entity whose rows are purged.  May be repeated.
+                         Default is every entity that has cascading children.
+
+  --where TEXT           SQL predicate on the root entity that selects the
+                         rows to purge (default is all rows)
+
+  --batch-size INTEGER   Maximum number of rows touched by each statement
+                         (that is, per transaction).  Default is 1000.
+
+  --archive-schema TEXT  If specified, copy each batch of rows into a table of
+                         the same name in this schema before deleting it
+
+  --generate-keys BOOLEAN
+                         Indicates whether the schema was generated with
+                         synthetic keys.  Default is true.  Set to false to
+                         match a schema generated by "genschema --generate-
+                         keys false".
+
+  --reproducible         If specified, stamp the output with the digest of the
+                         model instead of the time it was generated, so the
+                         same model always generates the same bytes, and leave
+                         an output file alone if it is unchanged
+
+  --help                 Show this message and exit.
+'''
+
+import sys
+import os.path
+from loguru import logger
+import click
+import yaml
+import jsonschema
+import json
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_cascade_children, build_cascade_closure, model_errors, \
+        model_digest, generation_stamp, staging_path, replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, build_physical_model, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_cascade_children, build_cascade_closure, model_errors, \
+        model_digest, generation_stamp, staging_path, replace_if_changed
+
+
+def column_list(columns):
+    '''
+    Format one column, or a parenthesized tuple of columns for a composite key
+    '''
+    return columns[0] if len(columns) == 1 else f'({", ".join(columns)})'
+
+
+@logger.catch
+def build_purge_predicates(root_name, where, dependency_ordering, cascaded, table_fks):
+    '''
+    Build, for each cascaded table, a SQL predicate that selects exactly the rows
+    that a delete of the selected root rows would cascade to
+    '''
+    logger.debug('Entering build_purge_predicates()')
+    predicates = { root_name: where if where else 'true' }
+    # Parents come before children in the dependency ordering
+    for table_name in dependency_ordering:
+        if table_name not in cascaded or table_name in predicates:
+            continue
+        terms = [ ]
+        for fk in table_fks[table_name]:
+            parent_name = fk['references']
+            if fk['on_delete'] != 'cascade' or parent_name == table_name or parent_name not in predicates:
+                continue
+            terms.append(f'{column_list(fk["columns"])} in (select {", ".join(fk["referenced_columns"])} '
+                         f'from {parent_name} where {predicates[parent_name]})')
+        assert terms, f'Expected a cascading parent for table {table_name}'
+        predicates.update( { table_name: ' or '.join(terms) if len(terms) == 1 else
+                                         ' or '.join(f'({term})' for term in terms) } )
+        logger.debug(f'{i(1)}table_name={table_name} predicate={predicates[table_name]}')
+    logger.debug('Leaving build_purge_predicates()')
+    return predicates
+
+
+@logger.catch
+def generate_purge_job(root_name, where, batch_size, archive_schema, dependency_ordering,
+                       table_keys, table_fks, children, output_object):
+    '''
+    Generate the bottom-up purge (and optionally archive) job for one root entity
+    '''
+    logger.debug('Entering generate_purge_job()')
+    cascaded, set_null, blocking = build_cascade_closure(root_name, children)
+    predicates = build_purge_predicates(root_name, where, dependency_ordering, cascaded, table_fks)
+    # Children come before their parents in the reversed dependency ordering
+    purge_ordering = [ table_name for table_name in reversed(dependency_ordering) if table_name in cascaded ]
+    num_steps = len(set_null) + len(purge_ordering)
+
+    print(f'-- Purge job for root entity: {root_name}', file=output_object)
+    print(f'-- Rows selected by: {where if where else "(all rows)"}', file=output_object)
+    print(f'-- Batch size: {batch_size} rows per statement', file=output_object)
+    print(f'-- Run each step repeatedly until it affects 0 rows, then continue with the next step.', file=output_object)
+    for child_name, fk in blocking:
+        print(f'-- WARNING: rows of {child_name} referencing {fk["references"]} via {", ".join(fk["columns"])} '
+              f'have no "on delete" action and will block this purge', file=output_object)
+    print(file=output_object)
+
+    if archive_schema is not None:
+        print(f'create schema if not exists {archive_schema};', file=output_object)
+        for table_name in purge_ordering:
+            print(f'create table if not exists {archive_schema}.{table_name} (like {table_name});', file=output_object)
+        print(file=output_object)
+
+    step = 0
+    # Detach rows whose foreign keys would otherwise be set to null by the database one row at a time
+    for child_name, fk in set_null:
+        step += 1
+        parent_name = fk['references']
+        print(f'-- Step {step} of {num_steps}: detach {child_name} from {parent_name}', file=output_object)
+        child_key = [ key_column['name'] for key_column in table_keys[child_name] ]
+        print(f'update {child_name} set {", ".join(f"{column} = null" for column in fk["columns"])} '
+              f'where {column_list(child_key)} in '
+              f'(select {", ".join(child_key)} from {child_name} where {column_list(fk["columns"])} in '
+              f'(select {", ".join(fk["referenced_columns"])} from {parent_name} where {predicates[parent_name]}) '
+              f'limit {batch_size});\n',
+              file=output_object)
+    for table_name in purge_ordering:
+        step += 1
+        key = [ key_column['name'] for key_column in table_keys[table_name] ]
+        batch = f'select {", ".join(key)} from {table_name} where {predicates[table_name]} limit {batch_size}'
+        print(f'-- Step {step} of {num_steps}: {"archive and purge" if archive_schema else "purge"} {table_name}',
+              file=output_object)
+        if archive_schema is None:
+            print(f'delete from {table_name} where {column_list(key)} in ({batch});\n', file=output_object)
+        else:
+            print(f'with batch as (delete from {table_name} where {column_list(key)} in ({batch}) returning *) '
+                  f'insert into {archive_schema}.{table_name} select * from batch;\n', file=output_object)
+    print(file=output_object)
+    logger.debug('Leaving generate_purge_job()')
+
+
+@logger.catch
+def genpurge(er_yaml, input, output_object, entity_names, where, batch_size, archive_schema, generate_keys=True,
+             reproducible=False):
+    '''
+    Generally-callable entry point to
+    read an Entity-Relationship Markup Language file and write batched purge and archive jobs
+
+    If reproducible is true, the jobs are stamped with the digest of the model instead of the time
+    they were generated.
+    '''
+    logger.debug('Entering genpurge()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
+
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    logger.opt(lazy=True).debug('table_fks={}', lambda: json.dumps(table_fks, indent=4))
+    children = build_cascade_children(table_fks)
+
+    if entity_names:
+        for entity_name in entity_names:
+            if entity_name not in graph:
+                print(f'Error: Specified entity does not exist or has no relationships: {entity_name}', file=sys.stderr)
+                sys.exit(1)
+        root_names = list(entity_names)
+    else:
+        root_names = [ table_name for table_name in dependency_ordering
+                       if any(fk['on_delete'] == 'cascade' for child_name, fk in children.get(table_name, [ ])
+                              if child_name != table_name) ]
+    logger.debug(f'root_names={root_names}')
+
+    print(f'-- Purge jobs generated by Zepster', file=output_object)
+    print(f'-- Source: {"stdin" if input == "-" else input}', file=output_object)
+    print(f'-- Generated: {stamp}', file=output_object)
+    print(file=output_object)
+
+    for root_name in root_names:
+        generate_purge_job(root_name, where, batch_size, archive_schema, dependency_ordering,
+                           table_keys, table_fks, children, output_object)
+    logger.debug('Leaving genpurge()')
+
+
+@click.command()
+@click.option(
+    '--input',
+    default='-',
+    help='Input Entity-Relationship Markup Language file (default is standard input, also represented by a dash "-")',
+)
+@click.option(
+    '--output',
+    default='-',
+    help='Output purge job file (default is standard output, also represented by a dash "-")',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='If specified, overwrite the output file if it already exists',
+)
+@click.option(
+    '--logging',
+    type=str,
+    default='WARNING',
+    help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
+)
+@click.option(
+    '--entity',
+    type=str,
+    multiple=True,
+    help='Root entity whose rows are purged.  May be repeated.  '
+         'Default is every entity that has cascading children.',
+)
+@click.option(
+    '--where',
+    type=str,
+    default=None,
+    help='SQL predicate on the root entity that selects the rows to purge (default is all rows)',
+)
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=1000,
+    help='Maximum number of rows touched by each statement (that is, per transaction).  Default is 1000.',
+)
+@click.option(
+    '--archive-schema',
+    type=str,
+    default=None,
+    help='If specified, copy each batch of rows into a table of the same name in this schema before deleting it',
+)
+@click.option(
+    '--generate-keys',
+    type=click.BOOL,
+    default=True,
+    help='Indicates whether the schema was generated with synthetic keys.  Default is true.  '
+         'Set to false to match a schema generated by "genschema --generate-keys false".'
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@logger.catch
+def main(input, output, overwrite, logging, entity, where, batch_size, archive_schema, generate_keys, reproducible):
+    '''
+    Read an Entity-Relationship Markup Language file and write batched purge
+    (and optionally archive) jobs as a SQL file
+    '''
+
+    if logging != 'WARNING':
+        # Remove default logger to reset logging level from the previously-set level of WARNING to
+        # something else per https://github.com/Delgan/loguru/issues/51
+        logger.remove(loguru_handler_id)
+        logger.add(sys.stderr, level=logging)
+
+    logger.debug('Entering main()')
+    logger.info(f'click version is {click.__version__}')
+    logger.debug(
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} entity={entity} '
+        f'where={where} batch_size={batch_size} archive_schema={archive_schema} generate_keys={generate_keys} '
+        f'reproducible={reproducible}'
+    )
+
+    close_input_object = False
+    close_output_object = False
+
+    if output == '-':
+        output_object = sys.stdout
+    else:
+        if overwrite == False and os.path.exists(output):
+            print(f'Error: Specified output file already exists: {output}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
+            close_output_object = True
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified output file {output}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    if input == '-':
+        input_object = sys.stdin
+    else:
+        if os.path.exists(input):
+            try:
+                input_object = open(input, 'r')
+                close_input_object = True
+            except IOError as ex:
+                print(f'ERROR: Unable to read the specified input file {input}.\n'
+                      f'Details: {ex}', file=sys.stderr)
+                sys.exit(1)
+        else:
+            print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
+            sys.exit(1)
+
+    logger.debug('Before reading ERML via load_erml()')
+    try:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
+        print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After load_erml()')
+
+    genpurge(er_yaml, input, output_object, entity, where, batch_size, archive_schema, generate_keys, reproducible)
+
+    if close_input_object:
+        input_object.close()
+    if close_output_object:
+        output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
+    logger.debug('Leaving main()')
+
+
+if __name__ == "__main__":
+    try:
+        # Remove default logger to reset logging level from the default of DEBUG to something else
+        # per https://github.com/Delgan/loguru/issues/51
+        logger.remove(0)
+        global loguru_handler_id
+        loguru_handler_id = logger.add(sys.stderr, level='WARNING')
+
+        main()
+    finally:
+        logger.info(f'exiting {__name__}')
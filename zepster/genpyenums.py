@@ -23,14 +23,24 @@ Usage: genpyenums.py [OPTIONS]
   Language (ERML) file
 
 Options:
-  --input TEXT    Input Entity-Relationship Markup Language file (default is
-                  standard input, also represented by a dash "-")
-  --output TEXT   Output schema definition file (default is standard output,
-                  also represented by a dash "-")
-  --overwrite     If specified, overwrite the output file if it already exists
-  --logging TEXT  Set logging to the specified level: NOTSET, DEBUG, INFO,
-                  WARNING, ERROR, CRITICAL
-  --help          Show this message and exit.
+  --input TEXT         Input Entity-Relationship Markup Language file (default
+                       is standard input, also represented by a dash "-")
+  --output TEXT        Output schema definition file (default is standard
+                       output, also represented by a dash "-")
+  --overwrite          If specified, overwrite the output file if it already
+                       exists
+  --logging TEXT       Set logging to the specified level: NOTSET, DEBUG,
+                       INFO, WARNING, ERROR, CRITICAL
+  --entities TEXT      If specified, generate only these entities (comma-
+                       separated), with their required parents and enums
+  --subject-area TEXT  If specified, generate only the entities of these
+                       subject areas (comma-separated), with their required
+                       parents and enums
+  --reproducible       If specified, stamp the output with the digest of the
+                       model instead of the time it was generated, so the same
+                       model always generates the same bytes, and leave an
+                       output file alone if it is unchanged
+  --help               Show this message and exit.
 '''
 
 '''
@@ -40,59 +50,57 @@ syntax for retired/obsolete enum values
 
 import sys
 import os.path
+import io
 from loguru import logger
 import click
 import yaml
 import jsonschema
-import datetime
-from json_schema_erml import json_schema_erml
 import json
-from util import i
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, select_model_slice, model_digest, generation_stamp, staging_path, \
+        replace_if_changed
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, select_model_slice, model_digest, generation_stamp, staging_path, \
+        replace_if_changed
 
 
-@logger.catch
-def genpyenums(er_yaml, input, output_object):
+def pyenums_sections(er_yaml, input, reproducible=False):
     '''
-    Generally-callable entry point to 
-    generate Python enum declarations from an Entity-Relationship Markup Language (ERML) file
+    Generate the Python enum declarations of a valid model, one section at a time (the module header,
+    then each enum class), yielding each section as a string
     '''
-    logger.debug('Entering genpyenums()')
-    logger.debug('Before validating YAML via jsonschema.validate()')
-    try:
-        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
-    except jsonschema.exceptions.ValidationError as ex:
-        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
-              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
-        sys.exit(1)
-    logger.debug('After jsonschema.validate()')
-
-    print(f"'''", file=output_object)
-    print(f'Enum definitions generated by Zepster', file=output_object)
-    print(f'Source: {"stdin" if input == "-" else input}', file=output_object)
-    print(f'Generated: {datetime.datetime.utcnow().isoformat()}', file=output_object)
-    print(f"'''\n", file=output_object)
-    print('from enum import Enum, unique\n\n', file=output_object)
+    section_object = io.StringIO()
+    print(f"'''", file=section_object)
+    print(f'Enum definitions generated by Zepster', file=section_object)
+    print(f'Source: {"stdin" if input == "-" else input}', file=section_object)
+    print(f'Generated: {generation_stamp(model_digest(er_yaml) if reproducible else None)}', file=section_object)
+    print(f"'''\n", file=section_object)
+    print('from enum import Enum, unique\n\n', file=section_object)
+    yield section_object.getvalue()
 
     for enum_outer in er_yaml['enums']:
+        section_object = io.StringIO()
         enum = enum_outer['enum']
-        logger.debug(f'enum_outer={enum_outer}')
+        logger.debug('enum_outer={}', enum_outer)
         enum_name = enum['name']
         logger.debug(f'enum_name={enum_name}')
-        print('@unique', file=output_object)
-        print(f'class {enum_name.capitalize()}(Enum):', file=output_object)
+        print('@unique', file=section_object)
+        print(f'class {enum_name.capitalize()}(Enum):', file=section_object)
         if 'description' in enum or 'note' in enum:
-            print(f"{i(2)}'''", file=output_object)
+            print(f"{i(2)}'''", file=section_object)
             if 'description' in enum:
-                print(f'{i(2)}Description:', file=output_object)
+                print(f'{i(2)}Description:', file=section_object)
                 enum_description = enum['description']
                 for line in enum_description.splitlines():
-                    print(f'{i(2)}{line}', file=output_object)
+                    print(f'{i(2)}{line}', file=section_object)
             if 'note' in enum:
-                print(f'{i(2)}Note:', file=output_object)
+                print(f'{i(2)}Note:', file=section_object)
                 enum_note = enum['note']
                 for line in enum_note.splitlines():
-                    print(f'{i(2)}{line}', file=output_object)
-            print(f"{i(2)}'''", file=output_object)
+                    print(f'{i(2)}{line}', file=section_object)
+            print(f"{i(2)}'''", file=section_object)
     
         for ordinal, enum_value_or_more in enumerate(enum['values']):
             logger.debug(f'{i(2)}enum_value_or_more={enum_value_or_more} type={type(enum_value_or_more)}')
@@ -103,22 +111,45 @@ def genpyenums(er_yaml, input, output_object):
                 logger.debug(f'{i(2)}Type is dictionary')
                 enum_value = enum_value_or_more['value']
                 if 'description' in enum_value_or_more:
-                    print(f'{i(2)}# Description:', file=output_object)
+                    print(f'{i(2)}# Description:', file=section_object)
                     enum_value_description = enum_value_or_more['description']
                     for line in enum_value_description.splitlines():
-                        print(f'{i(2)}# {line}', file=output_object)
+                        print(f'{i(2)}# {line}', file=section_object)
                 if 'note' in enum_value_or_more:
-                    print(f'{i(2)}# Note:', file=output_object)
+                    print(f'{i(2)}# Note:', file=section_object)
                     enum_value_note = enum_value_or_more['note']
                     for line in enum_value_note.splitlines():
-                        print(f'{i(2)}# {line}', file=output_object)
+                        print(f'{i(2)}# {line}', file=section_object)
             else:
                 raise ValueError(f'Enum value did not match expected type of string or '
                                  f'dicitonary for enum table "{enum_name}". '
                                  f'Value is {enum_value_or_more}')
             # escape to prevent Python injection
-            print(f'{i(2)}{enum_value} = {ordinal+1}', file=output_object)
-        print('\n', file=output_object)
+            print(f'{i(2)}{enum_value} = {ordinal+1}', file=section_object)
+        print('\n', file=section_object)
+        yield section_object.getvalue()
+
+
+@logger.catch
+def genpyenums(er_yaml, input, output_object, reproducible=False):
+    '''
+    Generally-callable entry point to 
+    generate Python enum declarations from an Entity-Relationship Markup Language (ERML) file
+
+    If reproducible is true, the module docstring has the digest of the model instead of the time it was generated.
+    '''
+    logger.debug('Entering genpyenums()')
+    logger.debug('Before validating YAML via jsonschema.validate()')
+    try:
+        jsonschema.validate(instance=er_yaml, schema=json_schema_erml)
+    except jsonschema.exceptions.ValidationError as ex:
+        print(f'\nERROR: Invalid YAML (schema) for Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
+        sys.exit(1)
+    logger.debug('After jsonschema.validate()')
+
+    for section in pyenums_sections(er_yaml, input, reproducible):
+        output_object.write(section)
     logger.debug('Leaving genpyenums()')
 
 
@@ -145,8 +176,28 @@ def genpyenums(er_yaml, input, output_object):
     default='WARNING',
     help='Set logging to the specified level: NOTSET, DEBUG, INFO, WARNING, ERROR, CRITICAL',
 )
+@click.option(
+    '--entities',
+    type=str,
+    default=None,
+    help='If specified, generate only these entities (comma-separated), with their required parents and enums',
+)
+@click.option(
+    '--subject-area',
+    type=str,
+    default=None,
+    help='If specified, generate only the entities of these subject areas (comma-separated), '
+         'with their required parents and enums',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
 @logger.catch
-def main(input, output, overwrite, logging):
+def main(input, output, overwrite, logging, entities, subject_area, reproducible):
     '''
     Generate Python enum declarations from an Entity-Relationship Markup Language (ERML) file
     '''
@@ -160,7 +211,8 @@ def main(input, output, overwrite, logging):
     logger.debug('Entering main()')
     logger.info(f'click version is {click.__version__}')
     logger.debug(
-        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging}'
+        f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} '
+        f'entities={entities} subject_area={subject_area} reproducible={reproducible}'
     )
 
     close_input_object = False
@@ -174,7 +226,8 @@ def main(input, output, overwrite, logging):
             sys.exit(1)
 
         try:
-            output_object = open(output, 'w')
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
             close_output_object = True
         except IOError as ex:
             print(f'ERROR: Unable to write to the specified output file {output}.\n'
@@ -196,21 +249,31 @@ def main(input, output, overwrite, logging):
             print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
             sys.exit(1)
 
-    logger.debug('Before reading YAML via yaml.safe_load()')
+    logger.debug('Before reading ERML via load_erml()')
     try:
-        er_yaml = yaml.safe_load(input_object)
-    except (yaml.scanner.ScannerError, yaml.parser.ParserError) as ex:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
         print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
               f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
         sys.exit(1)
-    logger.debug('After yaml.safe_load()')
+    logger.debug('After load_erml()')
+
+    if entities is not None or subject_area is not None:
+        try:
+            er_yaml = select_model_slice(er_yaml, entities.split(',') if entities is not None else None,
+                                         subject_area.split(',') if subject_area is not None else None)
+        except ValueError as ex:
+            print(f'Error: {ex}', file=sys.stderr)
+            sys.exit(1)
 
-    genpyenums(er_yaml, input, output_object)
+    genpyenums(er_yaml, input, output_object, reproducible)
 
     if close_input_object:
         input_object.close()
     if close_output_object:
         output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
     logger.debug('Leaving main()')
     
 
@@ -37,12 +37,16 @@ Options:
   --logging TEXT                  Set logging to the specified level: NOTSET,
                                   DEBUG, INFO, WARNING, ERROR, CRITICAL
 
-  --dialect [CRDB|RS]             Set the database dialect: "CRDB" for
-                                  CockroachDB [Not implemented: and "RS" for
-                                  Redshift].
+  --dialect [CRDB|PG|SQLITE|RS]   Set the database dialect: "CRDB" for
+                                  CockroachDB, "PG" for PostgreSQL, "SQLITE"
+                                  for SQLite (without triggers or procedures)
+                                  [Not implemented: and "RS" for Redshift].
 
-  --generate-keys                 [Not implemented] Indicates whether to
-                                  generate synthetic keys.  Default is True.
+  --generate-keys BOOLEAN         Indicates whether to generate synthetic
+                                  keys.  Default is true.  When false, the
+                                  identifying attributes of each entity
+                                  become its primary key, and foreign keys
+                                  reference those natural keys.
 
   --generated-key-type [INTEGER|UUID]
                                   Set the data type for generated synthetic
@@ -50,30 +54,131 @@ Options:
                                   dialect: UUID for CockroachDB [Not
                                   implemented: and INTEGER for Redshift].
 
+  --column-order [ERML|ALIGNED]   Set the order of the columns of each table:
+                                  "ERML" (keys, foreign keys, then attributes
+                                  in ERML order) or "ALIGNED" (fixed-width
+                                  columns first, widest alignment first, to
+                                  minimize row padding on PostgreSQL).
+                                  Default is ERML.
+
+  --load-plan TEXT                If specified, also write a bulk-load plan to
+                                  this file.  The plan loads the tables in
+                                  dependency layers, with the tables of each
+                                  layer loaded concurrently.
+
+  --load-format [IMPORT|COPY]     Set the statement used by the load plan:
+                                  "IMPORT" (CockroachDB IMPORT INTO, followed
+                                  by CREATE STATISTICS) or "COPY" (PostgreSQL
+                                  COPY, followed by ANALYZE).  Default is
+                                  IMPORT for the CRDB dialect, and COPY
+                                  otherwise.
+
+  --load-source TEXT              Location of the CSV file (with a header row)
+                                  for each table in the load plan, where
+                                  "{table}" is replaced by the table name.
+                                  Default is "nodelocal://1/{table}.csv".
+
+  --load-concurrency INTEGER RANGE
+                                  Maximum number of tables to load
+                                  concurrently within a layer of the load
+                                  plan.  Default is 8.
+
+  --entities TEXT                 If specified, generate only these entities
+                                  (comma-separated), with their required
+                                  parents and enums
+
+  --subject-area TEXT             If specified, generate only the entities of
+                                  these subject areas (comma-separated), with
+                                  their required parents and enums
+
+  --reproducible                  If specified, stamp the output with the
+                                  digest of the model instead of the time it
+                                  was generated, so the same model always
+                                  generates the same bytes, and leave an
+                                  output file alone if it is unchanged
+
+  --apply TEXT                    If specified, execute the schema on this
+                                  SQLite database file (created if it does not
+                                  exist) as it is generated, and write the
+                                  time each statement took to the output
+                                  instead of the SQL
+
+  --batch-size INTEGER RANGE      Number of statements applied in each
+                                  transaction with --apply.  Default is 100.
+
   --help                          Show this message and exit.
 '''
 
 import sys
 import os.path
+import io
+import time
+import sqlite3
 from loguru import logger
 import click
 import cardinality
 import yaml
 import jsonschema
-import datetime
-from json_schema_erml import json_schema_erml
 import json
-from util import i, topological_sort_entities, build_entity_parents_and_children
+if __package__:
+    from .json_schema_erml import json_schema_erml
+    from .util import load_erml, i, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, dependency_layers, SYNTHETIC_KEY, \
+        build_inheritance, build_physical_model, build_hierarchies, build_temporal_entities, temporal_key_columns, \
+        build_column_families, build_retention_policies, PG_ALIGNMENTS, enum_reference_type, build_column_types, \
+        select_model_slice, model_digest, generation_stamp, staging_path, replace_if_changed, model_errors
+else:
+    from json_schema_erml import json_schema_erml
+    from util import load_erml, i, topological_sort_entities, build_entity_parents_and_children, \
+        build_table_keys, build_table_foreign_keys, build_table_columns, dependency_layers, SYNTHETIC_KEY, \
+        build_inheritance, build_physical_model, build_hierarchies, build_temporal_entities, temporal_key_columns, \
+        build_column_families, build_retention_policies, PG_ALIGNMENTS, enum_reference_type, build_column_types, \
+        select_model_slice, model_digest, generation_stamp, staging_path, replace_if_changed, model_errors
+
+
+def take_statement(statement_object):
+    '''
+    Take what was printed to a statement buffer: a SQL statement, with the comments and blank lines
+    before it, or at the end of the output, the comments and blank lines after the last statement
+    '''
+    statement = statement_object.getvalue()
+    statement_object.seek(0)
+    statement_object.truncate()
+    return statement
+
+
+def statement_lines(lines, statement_object):
+    '''
+    Print the lines of one or more SQL statements and their comments to a statement buffer,
+    yielding each statement as it ends.  A semicolon in a dollar-quoted body ($$ ... $$)
+    does not end a statement.
+    '''
+    in_body = False
+    for line in lines:
+        print(line, file=statement_object)
+        if line.count('$$') % 2 == 1:
+            in_body = not in_body
+        if line.endswith(';') and not in_body and not line.startswith('--'):
+            yield take_statement(statement_object)
+
+
+def is_statement(statement):
+    '''
+    Tell whether a chunk of SQL has a statement, rather than only comments and blank lines
+    '''
+    return any(line.strip() and not line.lstrip().startswith('--') for line in statement.splitlines())
 
 
 @logger.catch
-def generate_enums(er_yaml, output_object):
+def generate_enums(er_yaml, dialect='CRDB'):
     '''
-    Generate the schema definitions and data for enum tables
+    Generate the schema definitions and data for enum tables, yielding each SQL statement
+    (with the comments before it) as it is generated
     '''
     logger.debug('Entering generate_enums()')
+    output_object = io.StringIO()
     for enum_table in er_yaml['enums']:
-        logger.debug(f'enum_table={enum_table}')
+        logger.debug('enum_table={}', enum_table)
         enum_table_name = enum_table['enum']['name']
         logger.debug(f'enum_table_name={enum_table_name}')
         if 'description' in enum_table['enum']:
@@ -88,7 +193,9 @@ def generate_enums(er_yaml, output_object):
             enum_table_note = enum_table['enum']['note']
             for line in enum_table_note.splitlines():
                 print(f'-- {line}', file=output_object)
-        print(f'create table {enum_table_name} (pk integer primary key, name varchar(500));', file=output_object)
+        pk_type = enum_reference_type(cardinality.count(enum_table['enum']['values']), dialect)
+        print(f'create table {enum_table_name} (pk {pk_type} primary key, name varchar(500));', file=output_object)
+        yield take_statement(output_object)
         for ordinal, enum_value_or_more in enumerate(enum_table['enum']['values']):
             logger.debug(f'{i(1)}enum_value_or_more={enum_value_or_more} type={type(enum_value_or_more)}')
             if type(enum_value_or_more) == type(''):
@@ -113,12 +220,16 @@ def generate_enums(er_yaml, output_object):
                                  f'Value is {enum_value_or_more}')
             # escape to prevent SQL injection
             print(f"insert into {enum_table_name} (pk, name) values ({ordinal+1}, '{enum_value}');", file=output_object)
+            yield take_statement(output_object)
         print(file=output_object)
+    if output_object.tell() > 0:
+        yield take_statement(output_object)
     logger.debug('Leaving generate_enums()')
 
 
 @logger.catch
-def generate_mm_synthesized(entity_name, graph, output_object):
+def generate_mm_synthesized(entity_name, table_key, fks, column_types, output_object, dialect='CRDB',
+                            external_tables=None):
     '''
     Generate DDL for synthesized many-to-many mapping table
     
@@ -126,17 +237,12 @@ def generate_mm_synthesized(entity_name, graph, output_object):
     This may change with future enhancement
     '''
     logger.debug('Entering generate_mm_synthesized()')
-    graph_dependees = graph[entity_name]
-    logger.debug(f'{i(1)}graph_dependees={graph_dependees}')
-    print(f'create table {entity_name} (', file=output_object)
-    print(f'{i(1)}pk uuid not null default gen_random_uuid() primary key,', file=output_object)
-    num_parents = cardinality.count(graph_dependees)
-    for dependee_num, dependee in enumerate(graph_dependees):
-        column_line = f'{i(1)}fk_{dependee} uuid not null references {dependee}(pk) on delete cascade'
-        if dependee_num < num_parents-1:
-            column_line += ','
-        print(column_line, file=output_object)
-    print(');\n', file=output_object)
+    logger.debug(f'{i(1)}fks={fks}')
+    column_lines = [ ]
+    constraint_lines = [ ]
+    generate_primary_key(table_key, column_lines, constraint_lines, dialect)
+    generate_foreign_keys(fks, column_lines, constraint_lines, column_types, external_tables)
+    print_table(entity_name, column_lines + constraint_lines, output_object)
     logger.debug('Leaving generate_mm_synthesized()')
 
 
@@ -148,7 +254,7 @@ def generate_entity_comments(entity_name, entities, entity_indices, entities_pc,
     logger.debug('Entering generate_entity_comments()')
     entity_index = entity_indices[entity_name]
     entity = entities[entity_index]['entity']
-    logger.debug(f'entity=\n{yaml.dump(entity)}')
+    logger.opt(lazy=True).debug('entity=\n{}', lambda: yaml.dump(entity))
 
     num_parents = 0
     entity_pc = entities_pc[entity_name]
@@ -182,146 +288,793 @@ def generate_entity_comments(entity_name, entities, entity_indices, entities_pc,
 
 
 @logger.catch
-def generate_foreign_keys(parents, num_parents, num_attributes, output_object):
+def generate_primary_key(table_key, column_lines, constraint_lines, dialect='CRDB'):
     '''
-    Generate DDL for foreign keys
+    Generate DDL for the primary key: either a generated (synthetic) key column,
+    or a primary key constraint over the natural key columns
+    '''
+    logger.debug('Entering generate_primary_key()')
+    if table_key == SYNTHETIC_KEY and dialect == 'SQLITE':
+        # SQLite has no uuid type or function, so the key is 16 random bytes in hex
+        column_lines.append( ([ ], 'pk text not null default (lower(hex(randomblob(16)))) primary key') )
+    elif table_key == SYNTHETIC_KEY:
+        column_lines.append( ([ ], 'pk uuid not null default gen_random_uuid() primary key') )
+    else:
+        constraint_lines.append( ([ ], f'primary key ({", ".join(key_column["name"] for key_column in table_key)})') )
+    logger.debug('Leaving generate_primary_key()')
+
+
+@logger.catch
+def generate_foreign_keys(fks, column_lines, constraint_lines, column_types=None, external_tables=None):
+    '''
+    Generate DDL for foreign keys, with the column types from column_types
+    (see build_column_types) if given, otherwise from the foreign keys
+
+    A foreign key to a single column is declared on the column;
+    a foreign key to a composite natural key is declared as a table constraint.
+    A foreign key to one of external_tables (defined with another subject area) gets its columns
+    but no constraint, only a comment, so the tables can be created in any order.
     '''
     logger.debug('Entering generate_foreign_keys()')
-    if num_parents >= 1:
-        logger.debug('Generating DDL for foreign keys...')
-        logger.debug(f'parents=\n{json.dumps(parents, indent=4)}')
-        for parent_num, parent in enumerate(parents):
-            logger.debug(f'{i(1)}parent_num={parent_num} parent={parent}')
-            assert cardinality.count(parent) == 1
-            for parent_name, parent_vals in parent.items():
-                pass
-            parent_kind = parent_vals['kind']
-            is_defining = False
-            if 'defining' in parent_vals:
-                if parent_vals['defining'] == True:
-                    is_defining = True
-            logger.debug(f'{i(1)}is_defining={is_defining}')
-            column_line = f'{i(1)}{"fk_" + parent_name} uuid '
-            if parent_kind in ['one', 'base_class']:
+    logger.opt(lazy=True).debug('fks=\n{}', lambda: json.dumps(fks, indent=4))
+    defined_columns = set()
+    for fk_num, fk in enumerate(fks):
+        logger.debug('{}fk_num={} fk={}', i(1), fk_num, fk)
+        on_delete = f' on delete {fk["on_delete"]}' if fk['on_delete'] is not None else ''
+        external = fk['references'] in (external_tables or [ ])
+        for column_name, column_type in zip(fk['columns'], fk['types']):
+            if column_name in defined_columns:
+                # Already defined by another foreign key that shares the column
+                continue
+            defined_columns.add(column_name)
+            if column_types is not None:
+                column_type = column_types[column_name]
+            column_line = f'{column_name} {column_type} '
+            if fk['required']:
                 column_line += 'not null '
-            column_line += f'references {parent_name}(pk)'
-            if is_defining:
-                column_line += ' on delete cascade'
-            elif parent_kind == 'zero_or_one':
-                column_line += ' on delete set null'
-            logger.debug(f'{i(1)}column_line={column_line}')
-            if parent_num < num_parents-1 or num_attributes > 0:
-                column_line += ','
+            if len(fk['columns']) == 1 and not external:
+                column_line += f'references {fk["references"]}({fk["referenced_columns"][0]}){on_delete}'
             logger.debug(f'column_line={column_line}')
-            print(f'{column_line}', file=output_object)
+            comment_lines = [ ]
+            if external:
+                comment_lines.append(f'-- References {fk["references"]}({", ".join(fk["referenced_columns"])}) '
+                                     f'in another subject area')
+            column_lines.append( (comment_lines, column_line.rstrip()) )
+        if len(fk['columns']) > 1 and not external:
+            constraint_lines.append( ([ ], f'foreign key ({", ".join(fk["columns"])}) references {fk["references"]} '
+                                          f'({", ".join(fk["referenced_columns"])}){on_delete}') )
     logger.debug('Leaving generate_foreign_keys()')
 
 
+def order_columns_by_alignment(column_lines, column_types):
+    '''
+    Order the column lines of a table so fixed-width columns come first, from the widest alignment
+    to the narrowest, followed by variable-width columns.  This minimizes the alignment padding
+    in each PostgreSQL row.  Columns with the same alignment keep their order.
+    '''
+    def alignment(column_line):
+        comment_lines, definition = column_line
+        return PG_ALIGNMENTS.get(column_types[definition.split(' ', 1)[0]], 0)
+    return sorted(column_lines, key=lambda column_line: -alignment(column_line))
+
+
 @logger.catch
-def generate_attribute_columns(attributes, num_attributes, output_object):
+def generate_attribute_columns(attributes, num_attributes, table_key, column_lines, column_types,
+                               external_tables=None):
     '''
-    Generate DDL for attributes
+    Generate DDL for attributes, with the column types from column_types (see build_column_types).
+    A reference to an enum table in external_tables is left out, as in generate_foreign_keys.
     '''
     logger.debug('Entering generate_attribute_columns()')
     if num_attributes > 0:
         logger.debug(f"type(attributes)={type(attributes)}")
         logger.debug(f"attributes={attributes}") 
         for current_attribute_num, attribute_key_values in enumerate(attributes.items()):
-            logger.debug(f'current_attribute_num={current_attribute_num} attribute_key_values={attribute_key_values}')
+            logger.debug('current_attribute_num={} attribute_key_values={}',
+                         current_attribute_num, attribute_key_values)
             attribute_key = attribute_key_values[0]
             attribute_values = attribute_key_values[1]
-            logger.debug(f'attribute_key={attribute_key} attribute_values={attribute_values}')
+            logger.debug('attribute_key={} attribute_values={}', attribute_key, attribute_values)
+            comment_lines = [ ]
             if 'description' in attribute_values:
-                print(f'{i(1)}-- Description:', file=output_object)
+                comment_lines.append('-- Description:')
                 attribute_description = attribute_values['description']
                 for line in attribute_description.splitlines():
-                    print(f'{i(1)}-- {line}', file=output_object)
+                    comment_lines.append(f'-- {line}')
             if 'note' in attribute_values:
-                print(f'{i(1)}-- Note:', file=output_object)
+                comment_lines.append('-- Note:')
                 attribute_note = attribute_values['note']
                 for line in attribute_note.splitlines():
-                    print(f'{i(1)}-- {line}', file=output_object)
-            logger.debug(f'{i(1)}attribute_key={attribute_key} attribute_values={attribute_values}')
+                    comment_lines.append(f'-- {line}')
+            logger.debug('{}attribute_key={} attribute_values={}', i(1), attribute_key, attribute_values)
             assert 'type' in attribute_values
             attribute_type = attribute_values['type']
-            column_type = f'integer references {"enum_" + attribute_key + "(pk)"}' if attribute_type == 'enum' else attribute_type
-            column_line = f'{i(1)}{attribute_key} {column_type}'
+            column_type = f'{column_types[attribute_key]} references {"enum_" + attribute_key + "(pk)"}' \
+                if attribute_type == 'enum' else column_types[attribute_key]
+            if attribute_type == 'enum' and 'enum_' + attribute_key in (external_tables or [ ]):
+                comment_lines.append(f'-- References enum_{attribute_key}(pk) in another subject area')
+                column_type = column_types[attribute_key]
+            column_line = f'{attribute_key} {column_type}'
             logger.debug(f'column_line={column_line}')
             if 'required' in attribute_values:
                 if attribute_values['required'] == True:
                     column_line += ' not null'
             if 'unique' in attribute_values:
                 if attribute_values['unique'] == True:
-                    column_line += ' unique'     # handle unique-within-parent
-            logger.debug(f'num_attributes={num_attributes} current_attribute_num={current_attribute_num}')
-            if current_attribute_num < num_attributes - 1:
-                column_line += ','
-            print(column_line, file=output_object)
+                    if table_key == [ { 'name': attribute_key, 'type': attribute_type } ]:
+                        logger.debug(f'{i(1)}Skipping unique because the attribute is the primary key')
+                    else:
+                        column_line += ' unique'     # handle unique-within-parent
+            column_lines.append( (comment_lines, column_line) )
     else:
         logger.debug('Skipping attributes because no attributes')
     logger.debug('Leaving generate_attribute_columns()')
 
 
+# Range constructors for the validity periods of temporal entities, by attribute type
+TEMPORAL_RANGES = { 'date': 'daterange', 'timestamp': 'tsrange', 'timestamptz': 'tstzrange' }
+
+
+@logger.catch
+def generate_temporal(entity_name, entity, temporal, fks, dialect, constraint_lines):
+    '''
+    Generate DDL for a temporal (versioned) entity: a check that each validity period is not
+    empty and, where the dialect supports exclusion constraints, a constraint that the versions
+    of an object do not overlap.  Returns the statements creating the indexes for current-version
+    and history lookups, to be issued after the table is created.
+    '''
+    logger.debug('Entering generate_temporal()')
+    valid_from = temporal['valid_from']
+    valid_to = temporal['valid_to']
+    constraint_lines.append( ([ ], f'check ({valid_to} is null or {valid_to} > {valid_from})') )
+    key_columns = temporal_key_columns(entity, temporal, fks)
+    if not key_columns:
+        logger.warning(f'Temporal entity {entity_name} has no required parents or identifying attributes '
+                       f'to identify its versioned objects, so no current-version index is generated')
+        logger.debug('Leaving generate_temporal()')
+        return [ ]
+    range_type = TEMPORAL_RANGES.get(entity['attributes'][valid_from].get('type', 'unknown'), None)
+    if dialect == 'PG' and range_type is not None:
+        constraint_lines.append( ([ f'-- The versions of each {entity_name} do not overlap' ],
+                                  f'exclude using gist ({", ".join(column + " with =" for column in key_columns)}, '
+                                  f'{range_type}({valid_from}, {valid_to}) with &&)') )
+    elif dialect == 'PG':
+        logger.warning(f'Attribute {valid_from} of temporal entity {entity_name} is not a date or timestamp, '
+                       f'so overlapping versions are not prevented')
+    index_lines = [ ]
+    if dialect != 'PG':
+        index_lines.append(f'-- Exclusion constraints are not supported, so overlapping versions of a {entity_name} '
+                           f'are not prevented')
+    index_lines.append(f'-- At most one current version of each {entity_name}, found with a single index lookup')
+    index_lines.append(f'create unique index {entity_name}_current on {entity_name} ({", ".join(key_columns)}) '
+                       f'where {valid_to} is null;')
+    index_lines.append(f'-- The versions of each {entity_name} in order, for history and as-of lookups')
+    index_lines.append(f'create index {entity_name}_history on {entity_name} '
+                       f'({", ".join(key_columns + [ valid_from ])});')
+    logger.debug('Leaving generate_temporal()')
+    return index_lines
+
+
+@logger.catch
+def generate_retention(entity_name, entity, retention, table_key, table_fks, dialect):
+    '''
+    Generate DDL for the retention policy of an entity.  CockroachDB expires rows natively with
+    row-level TTL storage parameters.  Otherwise, a procedure deletes expired rows in batches,
+    each in its own transaction, for a scheduler to call.
+
+    Returns the storage parameters for the table, the statements to issue after the table
+    is created, and the names of the procedures created.
+    '''
+    logger.debug('Entering generate_retention()')
+    expire_after = retention['expire_after']
+    column = retention['column']
+    storage_parameters = [ ]
+    lines = [ ]
+    procedures = [ ]
+    for child_name, fks in table_fks.items():
+        for fk in fks:
+            if fk['references'] == entity_name and child_name != entity_name and fk['on_delete'] is None:
+                lines.append(f'-- WARNING: rows of {child_name} referencing {entity_name} via '
+                             f'{", ".join(fk["columns"])} (no "on delete" action) keep those rows from expiring')
+    if dialect == 'CRDB':
+        if column is None:
+            storage_parameters.append(f"ttl_expire_after = '{expire_after}'")
+        else:
+            storage_parameters.append(f"ttl_expiration_expression = "
+                                      f"'(({column} + INTERVAL ''{expire_after}'')::timestamptz)'")
+        lines.insert(0, f'-- Rows of {entity_name} expire {expire_after} after '
+                        f'{column if column is not None else "they are inserted"}, deleted by the row-level TTL job')
+    elif dialect == 'SQLITE':
+        logger.warning(f'Entity {entity_name} has a ttl, but SQLite has no procedures to expire rows, '
+                       f'so no cleanup procedure is generated')
+    elif column is None:
+        logger.warning(f'Entity {entity_name} has a ttl but no ttl_column, which is needed to expire rows '
+                       f'for the {dialect} dialect, so no cleanup procedure is generated')
+    else:
+        procedure = f'{entity_name}_expire'
+        key_columns = [ key_column['name'] for key_column in table_key ]
+        key_list = ', '.join(key_columns)
+        key_tuple = key_columns[0] if cardinality.count(key_columns) == 1 else f'({key_list})'
+        lines.extend( [
+            f'-- Rows of {entity_name} expire {expire_after} after {column}.',
+            f'-- No native row expiry, so call this procedure on a schedule, e.g. with pg_cron:',
+            f"--   select cron.schedule('{procedure}', '@hourly', 'call {procedure}()');",
+            f'create index {entity_name}_expiry on {entity_name} ({column});',
+            f'create or replace procedure {procedure}(batch_size integer default 1000)',
+            f'language plpgsql as $$',
+            f'declare',
+            f'{i(1)}deleted integer;',
+            f'begin',
+            f'{i(1)}loop',
+            f'{i(2)}delete from {entity_name} where {key_tuple} in',
+            f"{i(3)}(select {key_list} from {entity_name} where {column} < now() - interval '{expire_after}' "
+            f"limit batch_size);",
+            f'{i(2)}get diagnostics deleted = row_count;',
+            f'{i(2)}commit;',
+            f'{i(2)}exit when deleted < batch_size;',
+            f'{i(1)}end loop;',
+            f'end;',
+            f'$$;' ] )
+        procedures.append(procedure)
+    logger.debug('Leaving generate_retention()')
+    return storage_parameters, lines, procedures
+
+
+@logger.catch
+def generate_column_families(families, constraint_lines):
+    '''
+    Generate DDL for the column families of a table (CockroachDB), so an update writes
+    only the families of the columns it changes rather than the whole row
+    '''
+    logger.debug('Entering generate_column_families()')
+    for family_num, (family, column_names) in enumerate(families):
+        comment_lines = [ '-- Column families: an update rewrites only the families of the changed columns' ] \
+                        if family_num == 0 else [ ]
+        constraint_lines.append( (comment_lines, f'family {family} ({", ".join(column_names)})') )
+    logger.debug('Leaving generate_column_families()')
+
+
+@logger.catch
+def print_table(table_name, table_lines, output_object, storage_parameters=None):
+    '''
+    Print the DDL to create a table from its column and constraint lines,
+    where each line is a pair of (comment lines, definition),
+    and optionally its storage parameters ("with" clause)
+    '''
+    logger.debug('Entering print_table()')
+    print(f'create table {table_name} (', file=output_object)
+    num_lines = cardinality.count(table_lines)
+    for line_num, (comment_lines, definition) in enumerate(table_lines):
+        for comment_line in comment_lines:
+            print(f'{i(1)}{comment_line}', file=output_object)
+        print(f'{i(1)}{definition}{"," if line_num < num_lines - 1 else ""}', file=output_object)
+    if storage_parameters:
+        print(f') with ({", ".join(storage_parameters)});\n', file=output_object)
+    else:
+        print(f');\n', file=output_object)
+    logger.debug('Leaving print_table()')
+
+
+@logger.catch
+def generate_inheritance_views(er_yaml, dependency_ordering, table_keys, table_fks, table_columns, output_object):
+    '''
+    Generate a read view for each subclass in a hierarchy that uses the "table_per_level_with_views"
+    inheritance strategy.  The view joins the subclass table with all of its base class tables,
+    so a concrete object can be read with one query.  Prints each view to the statement buffer
+    and yields it; returns the names of the views.
+    '''
+    logger.debug('Entering generate_inheritance_views()')
+    inheritance = build_inheritance(er_yaml)
+    view_names = [ ]
+    for entity_name in dependency_ordering:
+        if entity_name not in inheritance:
+            continue
+        info = inheritance[entity_name]
+        if info['strategy'] != 'table_per_level_with_views' or info['base_class'] is None:
+            continue
+        view_name = f'{entity_name}_view'
+        select_columns = [ ]
+        column_names = set()
+        join_lines = [ ]
+        level_name = entity_name
+        while level_name is not None:
+            base_class_name = inheritance[level_name]['base_class']
+            base_fk = next((fk for fk in table_fks[level_name] if fk['kind'] == 'base_class'), None)
+            skip_columns = set(base_fk['columns']) if base_fk is not None and level_name != entity_name else set()
+            if level_name != entity_name:
+                skip_columns.update(key_column['name'] for key_column in table_keys[level_name])
+            for column in table_columns[level_name]:
+                if column['name'] in skip_columns:
+                    continue
+                if column['name'] in column_names:
+                    select_columns.append(f'{level_name}.{column["name"]} as {level_name}_{column["name"]}')
+                else:
+                    select_columns.append(f'{level_name}.{column["name"]}')
+                    column_names.add(column['name'])
+            if base_class_name is not None:
+                join_condition = ' and '.join(f'{level_name}.{column} = {base_class_name}.{referenced_column}'
+                                              for column, referenced_column
+                                              in zip(base_fk['columns'], base_fk['referenced_columns']))
+                join_lines.append(f'{i(1)}join {base_class_name} on {join_condition}')
+            level_name = base_class_name
+        print(f'-- Read view for {entity_name} including all of its base classes', file=output_object)
+        print(f'create view {view_name} as', file=output_object)
+        print(f'select {", ".join(select_columns)}', file=output_object)
+        view_lines = [ f'from {entity_name}' ] + join_lines
+        view_lines[-1] += ';'
+        for view_line in view_lines:
+            print(view_line, file=output_object)
+        yield take_statement(output_object)
+        print(file=output_object)
+        view_names.append(view_name)
+    logger.debug('Leaving generate_inheritance_views()')
+    return view_names
+
+
+def closure_columns(role, table_key):
+    '''
+    Name the closure table columns for the ancestor or descendant role
+    '''
+    if table_key == SYNTHETIC_KEY:
+        return [ role ]
+    return [ f'{role}_{key_column["name"]}' for key_column in table_key ]
+
+
+def match_columns(left_alias, left_columns, right_alias, right_columns):
+    '''
+    Make a join or filter condition that matches two lists of columns pairwise
+    '''
+    return ' and '.join(f'{left_alias}.{left_column} = {right_alias}.{right_column}'
+                        for left_column, right_column in zip(left_columns, right_columns))
+
+
+def column_tuple(alias, columns):
+    '''
+    Make a (possibly composite) column expression for "in" comparisons
+    '''
+    qualified = [ f'{alias}.{column}' if alias else column for column in columns ]
+    return qualified[0] if cardinality.count(qualified) == 1 else f'({", ".join(qualified)})'
+
+
+@logger.catch
+def build_closure_rebuild(entity_name, closure_table, table_key, parent_fk):
+    '''
+    Build the statements that repopulate a closure table from the self-referencing
+    parent columns, for use after a bulk load that does not fire triggers
+    '''
+    key_columns = [ key_column['name'] for key_column in table_key ]
+    ancestor_columns = closure_columns('ancestor', table_key)
+    descendant_columns = closure_columns('descendant', table_key)
+    closure_column_list = ', '.join(ancestor_columns + descendant_columns + [ 'depth' ])
+    return [
+        f'delete from {closure_table};',
+        f'insert into {closure_table} ({closure_column_list})',
+        f'{i(1)}with recursive paths ({closure_column_list}) as (',
+        f'{i(2)}select {", ".join(key_columns + key_columns)}, 0 from {entity_name}',
+        f'{i(2)}union all',
+        f'{i(2)}select {", ".join("p." + column for column in ancestor_columns)}, '
+        f'{", ".join("t." + column for column in key_columns)}, p.depth + 1',
+        f'{i(2)}from paths p join {entity_name} t on '
+        f'{match_columns("t", parent_fk["columns"], "p", descendant_columns)}',
+        f'{i(1)})',
+        f'{i(1)}select {closure_column_list} from paths;' ]
+
+
+@logger.catch
+def generate_closure_tables(er_yaml, table_keys, table_fks, column_types, output_object, dialect='CRDB',
+                            external_tables=None):
+    '''
+    Generate a closure table for each hierarchy (self-referencing one-to-many relationship)
+    that requests one, with the triggers that maintain it.  The closure table has one row
+    for each ancestor and descendant pair, so subtree and ancestor queries are single
+    indexed lookups instead of recursive queries.  Prints each statement to the statement
+    buffer and yields it; returns the names of the closure tables and of their trigger functions.
+    '''
+    logger.debug('Entering generate_closure_tables()')
+    hierarchies = build_hierarchies(er_yaml)
+    closure_tables = [ ]
+    trigger_functions = [ ]
+    for entity_name in sorted(hierarchies):
+        closure_table = hierarchies[entity_name]['closure_table']
+        if closure_table is None or entity_name not in table_fks or entity_name in (external_tables or [ ]):
+            continue
+        table_key = table_keys[entity_name]
+        parent_fk = next(fk for fk in table_fks[entity_name] if fk['self_reference'])
+        key_columns = [ key_column['name'] for key_column in table_key ]
+        ancestor_columns = closure_columns('ancestor', table_key)
+        descendant_columns = closure_columns('descendant', table_key)
+        closure_column_list = ', '.join(ancestor_columns + descendant_columns + [ 'depth' ])
+
+        print(f'-- Closure table for the {entity_name} hierarchy: one row for each ancestor and descendant pair,',
+              file=output_object)
+        print(f'-- including each {entity_name} as its own ancestor at depth 0.', file=output_object)
+        print(f'-- Subtree:   select {", ".join(descendant_columns)} from {closure_table} where '
+              f'{" and ".join(column + " = ?" for column in ancestor_columns)}', file=output_object)
+        print(f'-- Ancestors: select {", ".join(ancestor_columns)} from {closure_table} where '
+              f'{" and ".join(column + " = ?" for column in descendant_columns)} order by depth', file=output_object)
+        column_lines = [ ]
+        constraint_lines = [ ]
+        key_types = [ column_types[entity_name][column] for column in key_columns ]
+        for role_columns in [ ancestor_columns, descendant_columns ]:
+            generate_foreign_keys( [ { 'columns': role_columns, 'types': key_types,
+                                       'references': entity_name, 'referenced_columns': key_columns,
+                                       'required': True, 'on_delete': 'cascade' } ],
+                                   column_lines, constraint_lines)
+        column_lines.append( ([ ], 'depth integer not null') )
+        constraint_lines.insert(0, ([ ], f'primary key ({", ".join(ancestor_columns + descendant_columns)})'))
+        print_table(closure_table, column_lines + constraint_lines, output_object)
+        yield take_statement(output_object)
+        print(f'create index {closure_table}_descendant on {closure_table} '
+              f'({", ".join(descendant_columns + [ "depth" ])});\n', file=output_object)
+        yield take_statement(output_object)
+        closure_tables.append(closure_table)
+
+        if dialect == 'SQLITE':
+            logger.warning(f'Closure table {closure_table} is not maintained by triggers for the SQLITE dialect, '
+                           f'so rebuild it after changing {entity_name}')
+            print(f'-- To rebuild {closure_table} after changing {entity_name}:', file=output_object)
+            for line in build_closure_rebuild(entity_name, closure_table, table_key, parent_fk):
+                print(f'-- {line}', file=output_object)
+            print(file=output_object)
+            continue
+
+        # Trigger functions are PL/pgSQL, for PostgreSQL and for CockroachDB 24.3 or later
+        insert_function = f'{closure_table}_insert'
+        update_function = f'{closure_table}_update'
+        new_key = ', '.join(f'new.{column}' for column in key_columns)
+        print(f'-- Maintain {closure_table} as {entity_name} rows are inserted and re-parented.', file=output_object)
+        print(f'-- Rows of deleted {entity_name} rows are removed by the cascading foreign keys.', file=output_object)
+        print(f'create or replace function {insert_function}() returns trigger as $$', file=output_object)
+        print(f'begin', file=output_object)
+        print(f'{i(1)}insert into {closure_table} ({closure_column_list})', file=output_object)
+        print(f'{i(2)}select {new_key}, {new_key}, 0', file=output_object)
+        print(f'{i(2)}union all', file=output_object)
+        print(f'{i(2)}select {", ".join("c." + column for column in ancestor_columns)}, {new_key}, c.depth + 1 '
+              f'from {closure_table} c', file=output_object)
+        print(f'{i(2)}where {match_columns("c", descendant_columns, "new", parent_fk["columns"])};', file=output_object)
+        print(f'{i(1)}return null;', file=output_object)
+        print(f'end;', file=output_object)
+        print(f'$$ language plpgsql;\n', file=output_object)
+        yield take_statement(output_object)
+        print(f'create trigger {insert_function} after insert on {entity_name}', file=output_object)
+        print(f'{i(1)}for each row execute function {insert_function}();\n', file=output_object)
+        yield take_statement(output_object)
+
+        subtree = f'(select {", ".join(descendant_columns)} from {closure_table} where ' \
+                  f'{" and ".join(f"{column} = new.{key_column}" for column, key_column in zip(ancestor_columns, key_columns))})'
+        print(f'create or replace function {update_function}() returns trigger as $$', file=output_object)
+        print(f'begin', file=output_object)
+        print(f'{i(1)}-- Detach the subtree of the row from its former ancestors', file=output_object)
+        print(f'{i(1)}delete from {closure_table}', file=output_object)
+        print(f'{i(2)}where {column_tuple("", descendant_columns)} in {subtree}', file=output_object)
+        print(f'{i(2)}and {column_tuple("", ancestor_columns)} not in {subtree};', file=output_object)
+        print(f'{i(1)}-- Attach the subtree to the ancestors of its new parent', file=output_object)
+        print(f'{i(1)}insert into {closure_table} ({closure_column_list})', file=output_object)
+        print(f'{i(2)}select {", ".join("a." + column for column in ancestor_columns)}, '
+              f'{", ".join("d." + column for column in descendant_columns)}, a.depth + d.depth + 1', file=output_object)
+        print(f'{i(2)}from {closure_table} a, {closure_table} d', file=output_object)
+        print(f'{i(2)}where {match_columns("a", descendant_columns, "new", parent_fk["columns"])} '
+              f'and {match_columns("d", ancestor_columns, "new", key_columns)};', file=output_object)
+        print(f'{i(1)}return null;', file=output_object)
+        print(f'end;', file=output_object)
+        print(f'$$ language plpgsql;\n', file=output_object)
+        yield take_statement(output_object)
+        parent_changed = ' or '.join(f'new.{column} is distinct from old.{column}' for column in parent_fk['columns'])
+        print(f'create trigger {update_function} after update on {entity_name}', file=output_object)
+        print(f'{i(1)}for each row when ({parent_changed})', file=output_object)
+        print(f'{i(1)}execute function {update_function}();\n', file=output_object)
+        yield take_statement(output_object)
+
+        print(f'-- To rebuild {closure_table} after a bulk load that does not fire triggers:', file=output_object)
+        for line in build_closure_rebuild(entity_name, closure_table, table_key, parent_fk):
+            print(f'-- {line}', file=output_object)
+        print(file=output_object)
+        trigger_functions.extend( [ insert_function, update_function ] )
+    logger.debug('Leaving generate_closure_tables()')
+    return closure_tables, trigger_functions
+
+
 @logger.catch
-def generate_entities(er_yaml, output_object):
+def generate_entities(er_yaml, generate_keys=True, dialect='CRDB', column_order='ERML', external_tables=None):
     '''
-    Generate the schema definitions for entity tables and many-to-many mapping tables
+    Generate the schema definitions for entity tables and many-to-many mapping tables, yielding
+    each SQL statement (with the comments before it) as it is generated
+
+    The external_tables (defined with another subject area) are left out, those that the generated
+    tables reference are listed as external references, and foreign keys to them are not declared
+    (see generate_foreign_keys).
     '''
     logger.debug('Entering generate_entities()')
+    output_object = io.StringIO()
     # Topologically sort the entities (so we can do foreign key constraints correctly)
     graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
     logger.debug(f'graph={graph}')
     logger.debug(f'dependency_ordering={dependency_ordering}')
     logger.debug(f'mm_synthesized={mm_synthesized}')
- 
+    external_tables = set(external_tables or [ ])
     entities_pc = build_entity_parents_and_children(er_yaml)
-    logger.debug(f'after build_entity_parents_and_children(): entities_pc={json.dumps(entities_pc, indent=4)}')
+    logger.opt(lazy=True).debug('after build_entity_parents_and_children(): entities_pc={}',
+                                lambda: json.dumps(entities_pc, indent=4))
+
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys)
+    column_types = build_column_types(er_yaml, table_columns, dialect)
+    # A many-to-many mapping table goes with the subject area of the first of its entities by name
+    external_tables.update(entity_name for entity_name in mm_synthesized
+                           if table_fks[entity_name][0]['references'] in external_tables)
+    table_ordering = [ entity_name for entity_name in dependency_ordering if entity_name not in external_tables ]
 
     entities = er_yaml['entities']
-    logger.debug(f'entities={yaml.dump(entities)}')
+    logger.opt(lazy=True).debug('entities={}', lambda: yaml.dump(entities))
 
     # Index the entities
     entity_indices = { }
     for entity_index, entity_obj in enumerate(entities):
-        logger.debug(f'entity_index={entity_index} for entity:\n{yaml.dump(entity_obj)}')
+        logger.opt(lazy=True).debug(f'entity_index={entity_index} for entity:\n{{}}', lambda: yaml.dump(entity_obj))
         entity_indices.update( { entity_obj['entity']['name']: entity_index } )
     logger.debug(f'entity_indices={entity_indices}')
 
+    temporal_entities = build_temporal_entities(er_yaml)
+    table_families = build_column_families(er_yaml, table_columns)
+    retention_policies = build_retention_policies(er_yaml)
+    retention_functions = [ ]
+    external_references = sorted(set(fk['references'] for entity_name in table_ordering
+                                      for fk in table_fks[entity_name] if fk['references'] in external_tables) |
+                                 set('enum_' + attribute_name for entity_outer in entities
+                                     if entity_outer['entity']['name'] in table_ordering
+                                     for attribute_name, attribute_values
+                                     in (entity_outer['entity'].get('attributes', None) or { }).items()
+                                     if attribute_values.get('type', None) == 'enum' and
+                                     'enum_' + attribute_name in external_tables))
+    if external_references:
+        print(f'-- External references (tables of other subject areas, without foreign key constraints): '
+              f'{", ".join(external_references)}\n', file=output_object)
+        yield take_statement(output_object)
+    if dialect == 'PG' and temporal_entities:
+        # Exclusion constraints on temporal entities compare keys with "=" in a GiST index
+        print('create extension if not exists btree_gist;\n', file=output_object)
+        yield take_statement(output_object)
+
     # Generate table definitions for entities
-    for entity_name in dependency_ordering:
+    for entity_name in table_ordering:
         logger.debug(f'Generating table for {entity_name}')
         if entity_name in mm_synthesized:
-            generate_mm_synthesized(entity_name, graph, output_object)
+            generate_mm_synthesized(entity_name, table_keys[entity_name], table_fks[entity_name],
+                                    column_types[entity_name], output_object, dialect, external_tables)
+            yield take_statement(output_object)
         else:
             entity, parents, num_parents, attributes, num_attributes = \
                 generate_entity_comments(entity_name, entities, entity_indices, entities_pc, output_object)
 
-            # Start the DDL to create the table
-            print(f'create table {entity_name} (', file=output_object)
-            column_line = f'{i(1)}pk uuid not null default gen_random_uuid() primary key'
-            if num_parents > 0 or num_attributes > 0:
-                column_line += ','
-            print(column_line, file=output_object)
-           
-            generate_foreign_keys(parents, num_parents, num_attributes, output_object) 
-            generate_attribute_columns(attributes, num_attributes, output_object)
-            print(f');\n', file=output_object)
+            column_lines = [ ]
+            constraint_lines = [ ]
+            generate_primary_key(table_keys[entity_name], column_lines, constraint_lines, dialect)
+            generate_foreign_keys(table_fks[entity_name], column_lines, constraint_lines, column_types[entity_name],
+                                  external_tables)
+            generate_attribute_columns(attributes, num_attributes, table_keys[entity_name], column_lines,
+                                       column_types[entity_name], external_tables)
+            if column_order == 'ALIGNED':
+                column_lines = order_columns_by_alignment(column_lines, column_types[entity_name])
+            index_lines = [ ]
+            if entity_name in temporal_entities:
+                index_lines = generate_temporal(entity_name, entity, temporal_entities[entity_name],
+                                                table_fks[entity_name], dialect, constraint_lines)
+            if dialect == 'CRDB' and entity_name in table_families:
+                generate_column_families(table_families[entity_name], constraint_lines)
+            storage_parameters = None
+            if entity_name in retention_policies:
+                storage_parameters, retention_lines, functions = \
+                    generate_retention(entity_name, entity, retention_policies[entity_name], table_keys[entity_name],
+                                       table_fks, dialect)
+                index_lines.extend(retention_lines)
+                retention_functions.extend(functions)
+            print_table(entity_name, column_lines + constraint_lines, output_object, storage_parameters)
+            yield take_statement(output_object)
+            if index_lines:
+                yield from statement_lines(index_lines, output_object)
+                print(file=output_object)
+
+    view_names = yield from generate_inheritance_views(er_yaml, table_ordering, table_keys, table_fks,
+                                                       table_columns, output_object)
+    closure_tables, trigger_functions = yield from generate_closure_tables(er_yaml, table_keys, table_fks,
+                                                                           column_types, output_object, dialect,
+                                                                           external_tables)
 
     # Generate drop table statements in proper order
     print('\n\n', file=output_object)
-    for table_name in reversed(dependency_ordering):
+    for view_name in view_names:
+        print(f'-- drop view if exists {view_name};', file=output_object)
+    for closure_table in reversed(closure_tables):
+        print(f'-- drop table if exists {closure_table};', file=output_object)
+    for table_name in reversed(table_ordering):
         print(f'-- drop table if exists {table_name};', file=output_object)
+    for trigger_function in trigger_functions:
+        print(f'-- drop function if exists {trigger_function};', file=output_object)
+    for retention_function in retention_functions:
+        print(f'-- drop procedure if exists {retention_function};', file=output_object)
     for enum in er_yaml['enums']:
         enum_table_name = enum['enum']['name']
         print(f'-- drop table if exists {enum_table_name};', file=output_object)
+    yield take_statement(output_object)
     logger.debug('Leaving generate_entities()')
 
 
+# Statements that a load plan can load tables with
+LOAD_FORMATS = [ 'IMPORT', 'COPY' ]
+
+
+def check_load_options(load_format, load_source):
+    '''
+    Check the statement and the source location template of a load plan, raising ValueError if either is invalid
+    '''
+    if load_format not in LOAD_FORMATS:
+        raise ValueError(f'Unknown load format {load_format} (expected {" or ".join(LOAD_FORMATS)})')
+    try:
+        sources = [ load_source.format(table=table_name) for table_name in [ 'a', 'b' ] ]
+    except (KeyError, IndexError, ValueError) as ex:
+        raise ValueError(f'Invalid load source {load_source}: only "{{table}}" may be in braces '
+                         f'({type(ex).__name__}: {ex})')
+    if sources[0] == sources[1]:
+        raise ValueError(f'Load source {load_source} has no "{{table}}", so every table would be loaded from it')
+
+
 @logger.catch
-def genschema(er_yaml, input, output_object):
+def generate_load_plan(er_yaml, input, load_plan_object, load_format, load_source, load_concurrency,
+                       generate_keys=True, reproducible=False):
+    '''
+    Generate a bulk-load plan that loads the tables layer by layer.  Tables in the same
+    layer do not depend on each other, so their load statements can run concurrently.
+    Raises ValueError if the load format or the load source is invalid (see check_load_options()).
+    '''
+    logger.debug('Entering generate_load_plan()')
+    check_load_options(load_format, load_source)
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys)
+    layers = dependency_layers(graph)
+
+    print(f'-- Load plan generated by Zepster', file=load_plan_object)
+    print(f'-- Source: {"stdin" if input == "-" else input}', file=load_plan_object)
+    print(f'-- Generated: {stamp}', file=load_plan_object)
+    print(f'--', file=load_plan_object)
+    print(f'-- Tables are loaded in {len(layers)} layers.  The tables in a layer do not depend on each other,', file=load_plan_object)
+    print(f'-- so the load statements of a layer can run concurrently, up to the stated maximum concurrency.', file=load_plan_object)
+    print(f'-- Each layer, including its statistics, must finish before the next layer starts.', file=load_plan_object)
+    print(f'-- Enum tables are populated by the schema definitions and are not loaded here.', file=load_plan_object)
+    print(file=load_plan_object)
+
+    for layer_num, layer in enumerate(layers):
+        concurrency = min(len(layer), load_concurrency)
+        print(f'-- Layer {layer_num+1} of {len(layers)}: {len(layer)} table{"s" if len(layer) != 1 else ""}, '
+              f'maximum concurrency {concurrency}', file=load_plan_object)
+        for table_name in layer:
+            column_list = ', '.join(column['name'] for column in table_columns[table_name])
+            source = load_source.format(table=table_name)
+            if load_format == 'IMPORT':
+                print(f"import into {table_name} ({column_list}) csv data ('{source}') with skip = '1', nullif = '';",
+                      file=load_plan_object)
+            else:
+                print(f"copy {table_name} ({column_list}) from '{source}' with (format csv, header true);",
+                      file=load_plan_object)
+        print(f'-- Statistics for layer {layer_num+1}', file=load_plan_object)
+        for table_name in layer:
+            if load_format == 'IMPORT':
+                print(f'create statistics {table_name}_stats from {table_name};', file=load_plan_object)
+            else:
+                print(f'analyze {table_name};', file=load_plan_object)
+        print(file=load_plan_object)
+
+    # Bulk loads do not maintain closure tables, so rebuild them once every layer is loaded
+    hierarchies = build_hierarchies(er_yaml)
+    for entity_name in sorted(hierarchies):
+        closure_table = hierarchies[entity_name]['closure_table']
+        if closure_table is None or entity_name not in table_fks:
+            continue
+        parent_fk = next(fk for fk in table_fks[entity_name] if fk['self_reference'])
+        print(f'-- Rebuild closure table {closure_table} after all layers are loaded', file=load_plan_object)
+        for line in build_closure_rebuild(entity_name, closure_table, table_keys[entity_name], parent_fk):
+            print(line, file=load_plan_object)
+        if load_format == 'IMPORT':
+            print(f'create statistics {closure_table}_stats from {closure_table};', file=load_plan_object)
+        else:
+            print(f'analyze {closure_table};', file=load_plan_object)
+        print(file=load_plan_object)
+    logger.debug('Leaving generate_load_plan()')
+
+
+def schema_statements(er_yaml, input, generate_keys=True, dialect='CRDB', column_order='ERML', reproducible=False,
+                      external_tables=None):
+    '''
+    Generate a database schema SQL file from a valid model, one statement at a time, yielding its header
+    and then each SQL statement (with the comments before it) as a string
+
+    The external_tables, entity and enum tables that a subject area needs but another subject area
+    defines, are left out (see generate_entities).
+    '''
+    stamp = generation_stamp(model_digest(er_yaml) if reproducible else None)
+
+    # Map the logical model to the physical model that the tables are built from
+    er_yaml = build_physical_model(er_yaml)
+    if external_tables:
+        er_yaml = dict(er_yaml, enums=[ enum_outer for enum_outer in er_yaml['enums']
+                                        if enum_outer['enum']['name'] not in external_tables ])
+
+    section_object = io.StringIO()
+    print(f'-- Database schema generated by Zepster', file=section_object)
+    print(f'-- Source: {"stdin" if input == "-" else input}', file=section_object)
+    print(f'-- Generated: {stamp}', file=section_object)
+    print(file=section_object)
+    yield section_object.getvalue()
+
+    yield from generate_enums(er_yaml, dialect)
+    yield from generate_entities(er_yaml, generate_keys, dialect, column_order, external_tables)
+
+
+def apply_statements(statements, connection, batch_size=100):
+    '''
+    Execute SQL statements on a DB-API connection, committing a transaction every batch_size statements,
+    and yield each statement with the seconds it took.  Chunks with only comments are skipped.
+    If a statement fails, its transaction is rolled back and the error is raised.
+
+    A connection in autocommit mode (e.g. sqlite3 connected with isolation_level=None) is given
+    an explicit begin for each batch, so the statements of a batch, DDL included, commit together.
+    '''
+    logger.debug('Entering apply_statements()')
+    explicit_begin = getattr(connection, 'isolation_level', '') is None
+    cursor = connection.cursor()
+    batch_count = 0
+    statement = None
+    try:
+        for statement in statements:
+            if not is_statement(statement):
+                continue
+            if batch_count == 0 and explicit_begin:
+                cursor.execute('begin')
+            start = time.perf_counter()
+            cursor.execute(statement)
+            seconds = time.perf_counter() - start
+            batch_count += 1
+            if batch_count == batch_size:
+                connection.commit()
+                batch_count = 0
+            yield statement, seconds
+        if batch_count > 0:
+            connection.commit()
+    except Exception:
+        logger.debug(f'Rolling back after failing statement:\n{statement}')
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    logger.debug('Leaving apply_statements()')
+
+
+def statement_summary(statement):
+    '''
+    Summarize a SQL statement by its first line that is not a comment
+    '''
+    return next(line.strip() for line in statement.splitlines() if line.strip() and not line.lstrip().startswith('--'))
+
+
+@logger.catch
+def genschema(er_yaml, input, output_object, generate_keys=True, dialect='CRDB', column_order='ERML',
+              reproducible=False, connection=None, batch_size=100, external_tables=None):
     '''
     Generally-callable entry point to 
     read an Entity-Relationship Markup Language file and write a database schema SQL file
+
+    If reproducible is true, the SQL file is stamped with the digest of the model instead of the time
+    it was generated, so the same model always generates the same bytes.
+
+    If a DB-API connection is given, the statements are instead executed on it as they are generated,
+    in transactions of batch_size statements, and the time each one took is written to the output.
+
+    The external_tables are left out (see schema_statements).
     '''
     logger.debug('Entering genschema()')
     logger.debug('Before validating YAML via jsonschema.validate()')
@@ -332,14 +1085,36 @@ def genschema(er_yaml, input, output_object):
               f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
         sys.exit(1)
     logger.debug('After jsonschema.validate()')
+    errors = model_errors(er_yaml)
+    if errors:
+        details = '\n'.join(message for location, message in errors)
+        print(f'\nERROR: Invalid model in Entity-Relationship Markup Language input file.\n'
+              f'ERROR DETAILS:\n{details}\n', file=sys.stderr)
+        sys.exit(1)
 
-    print(f'-- Database schema generated by Zepster', file=output_object)
-    print(f'-- Source: {"stdin" if input == "-" else input}', file=output_object)
-    print(f'-- Generated: {datetime.datetime.utcnow().isoformat()}', file=output_object)
-    print(file=output_object)
+    statements = schema_statements(er_yaml, input, generate_keys, dialect, column_order, reproducible,
+                                   external_tables)
+    if connection is None:
+        for statement in statements:
+            output_object.write(statement)
+        logger.debug('Leaving genschema()')
+        return
 
-    generate_enums(er_yaml, output_object)
-    generate_entities(er_yaml, output_object)
+    num_statements = 0
+    total_seconds = 0.0
+    try:
+        for statement, seconds in apply_statements(statements, connection, batch_size):
+            print(f'{seconds * 1000:10.3f} ms  {statement_summary(statement)}', file=output_object)
+            num_statements += 1
+            total_seconds += seconds
+    except getattr(connection, 'Error', Exception) as ex:
+        print(f'Error: Unable to apply the schema after {num_statements} statements, '
+              f'rolled back to the last commit.\nDetails: {ex}', file=sys.stderr)
+        sys.exit(1)
+    num_transactions = (num_statements + batch_size - 1) // batch_size
+    print(f'-- Applied {num_statements} statements in {num_transactions} '
+          f'transaction{"s" if num_transactions != 1 else ""}, {total_seconds:.3f} seconds executing',
+          file=output_object)
     logger.debug('Leaving genschema()')
 
 
@@ -368,15 +1143,17 @@ def genschema(er_yaml, input, output_object):
 )
 @click.option(
     '--dialect',
-    type=click.Choice(['CRDB', 'RS'], case_sensitive=False),
+    type=click.Choice(['CRDB', 'PG', 'SQLITE', 'RS'], case_sensitive=False),
     default='CRDB',
-    help='Set the database dialect: "CRDB" for CockroachDB [Not implemented: and "RS" for Redshift].',
+    help='Set the database dialect: "CRDB" for CockroachDB, "PG" for PostgreSQL, "SQLITE" for SQLite '
+         '(without triggers or procedures) [Not implemented: and "RS" for Redshift].',
 )
 @click.option(
     '--generate-keys',
-    is_flag=True,
+    type=click.BOOL,
     default=True,
-    help='[Not implemented] Indicates whether to generate synthetic keys.  Default is True.'
+    help='Indicates whether to generate synthetic keys.  Default is true.  When false, the identifying '
+         'attributes of each entity become its primary key, and foreign keys reference those natural keys.'
 )
 @click.option(
     '--generated-key-type',
@@ -384,8 +1161,79 @@ def genschema(er_yaml, input, output_object):
     help='Set the data type for generated synthetic keys.  The default depends on '
          'the database dialect: UUID for CockroachDB [Not implemented: and INTEGER for Redshift].',
 )
+@click.option(
+    '--column-order',
+    type=click.Choice(['ERML', 'ALIGNED'], case_sensitive=False),
+    default='ERML',
+    help='Set the order of the columns of each table: "ERML" (keys, foreign keys, then attributes in ERML order) '
+         'or "ALIGNED" (fixed-width columns first, widest alignment first, to minimize row padding on '
+         'PostgreSQL).  Default is ERML.',
+)
+@click.option(
+    '--load-plan',
+    type=str,
+    default=None,
+    help='If specified, also write a bulk-load plan to this file.  The plan loads the tables in '
+         'dependency layers, with the tables of each layer loaded concurrently.',
+)
+@click.option(
+    '--load-format',
+    type=click.Choice(LOAD_FORMATS, case_sensitive=False),
+    default=None,
+    help='Set the statement used by the load plan: "IMPORT" (CockroachDB IMPORT INTO, followed by '
+         'CREATE STATISTICS) or "COPY" (PostgreSQL COPY, followed by ANALYZE).  Default is IMPORT '
+         'for the CRDB dialect, and COPY otherwise.',
+)
+@click.option(
+    '--load-source',
+    type=str,
+    default='nodelocal://1/{table}.csv',
+    help='Location of the CSV file (with a header row) for each table in the load plan, '
+         'where "{table}" is replaced by the table name.  Default is "nodelocal://1/{table}.csv".',
+)
+@click.option(
+    '--load-concurrency',
+    type=click.IntRange(min=1),
+    default=8,
+    help='Maximum number of tables to load concurrently within a layer of the load plan.  Default is 8.',
+)
+@click.option(
+    '--entities',
+    type=str,
+    default=None,
+    help='If specified, generate only these entities (comma-separated), with their required parents and enums',
+)
+@click.option(
+    '--subject-area',
+    type=str,
+    default=None,
+    help='If specified, generate only the entities of these subject areas (comma-separated), '
+         'with their required parents and enums',
+)
+@click.option(
+    '--reproducible',
+    is_flag=True,
+    default=False,
+    help='If specified, stamp the output with the digest of the model instead of the time it was generated, '
+         'so the same model always generates the same bytes, and leave an output file alone if it is unchanged',
+)
+@click.option(
+    '--apply',
+    type=str,
+    default=None,
+    help='If specified, execute the schema on this SQLite database file (created if it does not exist) '
+         'as it is generated, and write the time each statement took to the output instead of the SQL',
+)
+@click.option(
+    '--batch-size',
+    type=click.IntRange(min=1),
+    default=100,
+    help='Number of statements applied in each transaction with --apply.  Default is 100.',
+)
 @logger.catch
-def main(input, output, overwrite, logging, dialect, generate_keys, generated_key_type):
+def main(input, output, overwrite, logging, dialect, generate_keys, generated_key_type, column_order,
+         load_plan, load_format, load_source, load_concurrency, entities, subject_area, reproducible,
+         apply, batch_size):
     '''
     Read an Entity-Relationship Markup Language file and write a database schema SQL file
     '''
@@ -400,7 +1248,11 @@ def main(input, output, overwrite, logging, dialect, generate_keys, generated_ke
     logger.info(f'click version is {click.__version__}')
     logger.debug(
         f'parameters: input={input} output={output} overwrite={overwrite} logging={logging} dialect={dialect} '
-        f'generate_keys={generate_keys} generated_key_type={generated_key_type}'
+        f'generate_keys={generate_keys} generated_key_type={generated_key_type} column_order={column_order} '
+        f'load_plan={load_plan} '
+        f'load_format={load_format} load_source={load_source} load_concurrency={load_concurrency} '
+        f'entities={entities} subject_area={subject_area} reproducible={reproducible} '
+        f'apply={apply} batch_size={batch_size}'
     )
 
     # TODO: Additional options implementimplement
@@ -412,10 +1264,15 @@ def main(input, output, overwrite, logging, dialect, generate_keys, generated_ke
     if dialect.upper() == 'RS':
         print(f'Error: The value of "RS" for the --dialect option is not implemented yet.', file=sys.stderr)
         sys.exit(1)
-    if generate_keys == False:
-        print(f'Error: The --generate-keys option is not implemented yet.  '
-               'Remove the option to specify the default of generating synthetic keys.', file=sys.stderr)
-        sys.exit(1)
+    if load_format is None:
+        load_format = 'IMPORT' if dialect.upper() == 'CRDB' else 'COPY'
+    load_format = load_format.upper()
+    if load_plan is not None:
+        try:
+            check_load_options(load_format, load_source)
+        except ValueError as ex:
+            print(f'Error: {ex}', file=sys.stderr)
+            sys.exit(1)
 
     close_input_object = False
     close_output_object = False
@@ -428,13 +1285,27 @@ def main(input, output, overwrite, logging, dialect, generate_keys, generated_ke
             sys.exit(1)
 
         try:
-            output_object = open(output, 'w')
+            output_path = staging_path(output) if reproducible else output
+            output_object = open(output_path, 'w')
             close_output_object = True
         except IOError as ex:
             print(f'ERROR: Unable to write to the specified output file {output}.\n'
                   f'Details: {ex}', file=sys.stderr)
             sys.exit(1)
 
+    if load_plan is not None:
+        if overwrite == False and os.path.exists(load_plan):
+            print(f'Error: Specified load plan file already exists: {load_plan}', file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            load_plan_path = staging_path(load_plan) if reproducible else load_plan
+            load_plan_object = open(load_plan_path, 'w')
+        except IOError as ex:
+            print(f'ERROR: Unable to write to the specified load plan file {load_plan}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
+
     if input == '-':
         input_object = sys.stdin
     else:
@@ -450,21 +1321,53 @@ def main(input, output, overwrite, logging, dialect, generate_keys, generated_ke
             print(f'Error: Specified input file does not exist: {input}', file=sys.stderr)
             sys.exit(1)
 
-    logger.debug('Before reading YAML via yaml.safe_load()')
+    logger.debug('Before reading ERML via load_erml()')
     try:
-        er_yaml = yaml.safe_load(input_object)
-    except (yaml.scanner.ScannerError, yaml.parser.ParserError) as ex:
+        er_yaml = load_erml(input_object)
+    except (yaml.scanner.ScannerError, yaml.parser.ParserError, ValueError) as ex:
         print(f'\nERROR: Invalid YAML (syntax) for Entity-Relationship Markup Language input file.\n'
               f'ERROR DETAILS:\n{ex}\n', file=sys.stderr)
         sys.exit(1)
-    logger.debug('After yaml.safe_load()')
+    logger.debug('After load_erml()')
+
+    if entities is not None or subject_area is not None:
+        try:
+            er_yaml = select_model_slice(er_yaml, entities.split(',') if entities is not None else None,
+                                         subject_area.split(',') if subject_area is not None else None)
+        except ValueError as ex:
+            print(f'Error: {ex}', file=sys.stderr)
+            sys.exit(1)
+
+    connection = None
+    if apply is not None:
+        if dialect.upper() != 'SQLITE':
+            logger.warning(f'Applying the {dialect.upper()} dialect to SQLite, which may not accept it; '
+                           f'consider --dialect SQLITE')
+        try:
+            # Autocommit mode, so the statements of each batch are grouped by an explicit begin and commit
+            connection = sqlite3.connect(apply, isolation_level=None)
+        except sqlite3.Error as ex:
+            print(f'ERROR: Unable to open the specified database {apply}.\n'
+                  f'Details: {ex}', file=sys.stderr)
+            sys.exit(1)
 
-    genschema(er_yaml, input, output_object)
+    genschema(er_yaml, input, output_object, generate_keys, dialect.upper(), column_order.upper(), reproducible,
+              connection, batch_size)
+    if connection is not None:
+        connection.close()
+    if load_plan is not None:
+        generate_load_plan(er_yaml, input, load_plan_object, load_format, load_source, load_concurrency,
+                           generate_keys, reproducible)
+        load_plan_object.close()
+        if reproducible:
+            replace_if_changed(load_plan_path, load_plan)
 
     if close_input_object:
         input_object.close()
     if close_output_object:
         output_object.close()
+        if reproducible:
+            replace_if_changed(output_path, output)
     logger.debug('Leaving main()')
     
 
@@ -49,6 +49,126 @@ json_schema_erml = {
                             'unique': {
                                 'type': 'string',
                                 'enum': [ 'false', 'true', 'within_parent' ]
+                            },
+                            'attributes': {
+                                'type': [ 'object', 'null' ],
+                                'propertyNames': {
+                                    'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                                    'maxLength': 500
+                                },
+                                'additionalProperties': {
+                                    'description': 'An attribute of the entity, by its name',
+                                    'type': [ 'object', 'null' ],
+                                    'properties': {
+                                        'max_length': {
+                                            'description': 'On a string attribute, its maximum length, making it a varchar(n) column',
+                                            'type': 'integer',
+                                            'minimum': 1
+                                        },
+                                        'max_value': {
+                                            'description': 'On an integer attribute, the largest absolute value it holds, choosing the smallest of int2, int4, and int8 that fits',
+                                            'type': 'number',
+                                            'minimum': 0
+                                        },
+                                        'family': {
+                                            'description': 'On an attribute, the column family that stores it (CockroachDB)',
+                                            'type': 'string',
+                                            'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                                            'maxLength': 500
+                                        },
+                                        'avg_size': {
+                                            'description': 'On an attribute, the average size in bytes of its values, for capacity estimates.  Default depends on the type.',
+                                            'type': 'number',
+                                            'minimum': 0
+                                        },
+                                        'update_frequency': {
+                                            'description': 'On an attribute, how often it is updated: attributes updated often (high) or rarely (low) are stored in their own column families.  Default normal.',
+                                            'type': 'string',
+                                            'enum': [ 'high', 'normal', 'low' ]
+                                        },
+                                        'identifying': {
+                                            'oneOf': [
+                                                {
+                                                    'description': 'Indicate an identifying attribute set with just one attribute.  Default false.',
+                                                    'type': 'boolean'
+                                                },
+                                                {
+                                                    'description': 'Indicate an attribute in an identifying attribute set (ordered set), and where it appears in that set (1-based)',
+                                                    'type': 'integer',
+                                                    'minimum': 1
+                                                }
+                                            ]
+                                        }
+                                    }
+                                }
+                            },
+                            'temporal': {
+                                'oneOf': [
+                                    {
+                                        'description': 'Indicate a temporal (versioned) entity, adding valid_from and valid_to columns.  Default false.',
+                                        'type': 'boolean'
+                                    },
+                                    {
+                                        'description': 'Indicate a temporal (versioned) entity, naming the attributes of its validity period and the attributes identifying the versioned object',
+                                        'type': 'object',
+                                        'properties': {
+                                            'valid_from': { 'type': 'string' },
+                                            'valid_to': { 'type': 'string' },
+                                            'key': { 'type': 'array', 'items': { 'type': 'string' } }
+                                        },
+                                        'dependentRequired': { 'valid_from': [ 'valid_to' ], 'valid_to': [ 'valid_from' ] },
+                                        'additionalProperties': False
+                                    }
+                                ]
+                            },
+                            'ttl': {
+                                'description': 'Retention period of the rows of the entity: a number followed by s, m, h, d, or w (e.g. 30d)',
+                                'type': 'string',
+                                'pattern': '^[0-9]+ *[smhdw]$'
+                            },
+                            'ttl_column': {
+                                'description': 'The timestamp attribute that the retention period (ttl) starts from.  Default is the time the row is inserted (CockroachDB only).',
+                                'type': 'string'
+                            },
+                            'closure_table': {
+                                'description': 'On an entity with a self-referencing one-to-many relationship (a hierarchy), generate a closure table of its ancestor and descendant pairs.  Default false.',
+                                'type': 'boolean'
+                            },
+                            'inheritance': {
+                                'description': 'On a root base class, how its class hierarchy is mapped to tables',
+                                'type': 'string',
+                                'enum': [ 'table_per_level', 'table_per_level_with_views', 'single_table',
+                                          'table_per_concrete_class' ]
+                            },
+                            'discriminator': {
+                                'description': 'On a root base class using single_table inheritance, the name of the discriminator column',
+                                'type': 'string',
+                                'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                                'maxLength': 500
+                            },
+                            'subject_area': {
+                                'description': 'The subject area the entity belongs to, for generating the entities of a subject area together',
+                                'type': 'string',
+                                'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                                'maxLength': 500
+                            },
+                            'expected_rows': {
+                                'description': 'The number of rows the entity is expected to have, for capacity estimates',
+                                'type': 'number',
+                                'minimum': 0
+                            },
+                            'growth_per_day': {
+                                'description': 'The number of rows expected to be added to the entity each day, for capacity estimates',
+                                'type': 'number',
+                                'minimum': 0
+                            },
+                            'data_hints': {
+                                'description': 'Hints for generating test data for the entity',
+                                'type': 'object',
+                                'properties': {
+                                    'rows': { 'type': 'number', 'minimum': 0 },
+                                    'fan_out': { 'type': 'number', 'minimum': 0 }
+                                }
                             }
                         }
                     }
@@ -67,37 +187,38 @@ json_schema_erml = {
                                 'type': 'string',
                                 'enum': [ 'false', 'true' ]
                             },
-                            'relationships' : {
-                                'type': 'object',
-                                'properties': {
-                                    'participants': {
-                                        'type': 'array',
-                                        'items': {
-                                            'type': 'object',
-                                            'properties': {
-                                                'kind': {
-                                                    'type': 'string',
-                                                    'enum': [ 
-                                                        'one', 
-                                                        'subclass', 
-                                                        'base_class', 
-                                                        'zero_or_more',
-                                                        'zero_or_one' 
-                                                    ]
-                                                },
-                                                'name': {
-                                                    'type': 'string',
-                                                    'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
-                                                    'maxLength': 500
-                                                }
-                                            }
+                            'participants': {
+                                'description': 'The two entities that take part in the relationship',
+                                'type': 'array',
+                                'minItems': 2,
+                                'maxItems': 2,
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'kind': {
+                                            'type': 'string',
+                                            'enum': [ 
+                                                'one', 
+                                                'subclass', 
+                                                'base_class', 
+                                                'zero_or_more',
+                                                'zero_or_one' 
+                                            ]
+                                        },
+                                        'name': {
+                                            'type': 'string',
+                                            'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                                            'maxLength': 500
                                         }
-                                    } 
+                                    },
+                                    'required': [ 'kind', 'name' ]
                                 }
                             }
-                        } 
+                        },
+                        'required': [ 'participants' ]
                     }
-                }
+                },
+                'required': [ 'relationship' ]
             }
         },
         'enums': {
@@ -151,6 +272,45 @@ json_schema_erml = {
                     }
                 }
             }
+        },
+        'access_patterns': {
+            'description': 'The ways the application reads the entities, used to recommend indexes',
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'entity': {
+                        'description': 'The entity that is read',
+                        'type': 'string',
+                        'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                        'maxLength': 500
+                    },
+                    'lookup': {
+                        'description': 'The columns the entity is looked up by',
+                        'type': 'array',
+                        'items': { 'type': 'string', 'pattern': '^[A-Za-z_][A-Za-z0-9_]*$', 'maxLength': 500 },
+                        'minItems': 1
+                    },
+                    'join': {
+                        'description': 'The related entity the entity is reached from',
+                        'type': 'string',
+                        'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                        'maxLength': 500
+                    },
+                    'sort': {
+                        'description': 'The columns the rows are read in order of, each optionally followed by "desc"',
+                        'type': 'array',
+                        'items': { 'type': 'string', 'pattern': '^[A-Za-z_][A-Za-z0-9_]*( (asc|desc))?$', 'maxLength': 500 }
+                    },
+                    'include': {
+                        'description': 'Other columns that are read, which the index can hold so the table is not read',
+                        'type': 'array',
+                        'items': { 'type': 'string', 'pattern': '^[A-Za-z_][A-Za-z0-9_]*$', 'maxLength': 500 }
+                    }
+                },
+                'required': [ 'entity' ],
+                'additionalProperties': False
+            }
         }
     }
 }
@@ -45,20 +45,51 @@ json_schema_graphml_entity_attributes = {
                     'unique': {
                         'type': 'string',
                         'enum': [ 'false', 'true', 'within_parent' ]
-                    },
-                    'identifying': {
-                        'oneOf': [
-                            {
-                                'description': 'Indicate an identifying attribute set with just one attribute.  Default false.',
-                                'type': 'boolean'
-                            },
-                            {
-                                'description': 'Indicate an attribute in an identifying attribute set (ordered set), and where it appears in that set (1-based)',
-                                'type': 'number',
-                                'minimum': 1
-                            }
-                        ]
-
+                    }
+                },
+                'additionalProperties': {
+                    'description': 'An attribute of the entity, by its name',
+                    'type': [ 'object', 'null' ],
+                    'properties': {
+                        'max_length': {
+                            'description': 'On a string attribute, its maximum length, making it a varchar(n) column',
+                            'type': 'integer',
+                            'minimum': 1
+                        },
+                        'max_value': {
+                            'description': 'On an integer attribute, the largest absolute value it holds, choosing the smallest of int2, int4, and int8 that fits',
+                            'type': 'number',
+                            'minimum': 0
+                        },
+                        'family': {
+                            'description': 'On an attribute, the column family that stores it (CockroachDB)',
+                            'type': 'string',
+                            'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+                            'maxLength': 500
+                        },
+                        'avg_size': {
+                            'description': 'On an attribute, the average size in bytes of its values, for capacity estimates.  Default depends on the type.',
+                            'type': 'number',
+                            'minimum': 0
+                        },
+                        'update_frequency': {
+                            'description': 'On an attribute, how often it is updated: attributes updated often (high) or rarely (low) are stored in their own column families.  Default normal.',
+                            'type': 'string',
+                            'enum': [ 'high', 'normal', 'low' ]
+                        },
+                        'identifying': {
+                            'oneOf': [
+                                {
+                                    'description': 'Indicate an identifying attribute set with just one attribute.  Default false.',
+                                    'type': 'boolean'
+                                },
+                                {
+                                    'description': 'Indicate an attribute in an identifying attribute set (ordered set), and where it appears in that set (1-based)',
+                                    'type': 'integer',
+                                    'minimum': 1
+                                }
+                            ]
+                        }
                     }
                 },
                 #'additionalProperties': 'false'
@@ -72,6 +103,73 @@ json_schema_graphml_entity_attributes = {
             'description': 'Additional notes on the entity',
             'type': 'string',
             'maxLength': 20000
+        },
+        'temporal': {
+            'oneOf': [
+                {
+                    'description': 'Indicate a temporal (versioned) entity, adding valid_from and valid_to columns.  Default false.',
+                    'type': 'boolean'
+                },
+                {
+                    'description': 'Indicate a temporal (versioned) entity, naming the attributes of its validity period and the attributes identifying the versioned object',
+                    'type': 'object',
+                    'properties': {
+                        'valid_from': { 'type': 'string' },
+                        'valid_to': { 'type': 'string' },
+                        'key': { 'type': 'array', 'items': { 'type': 'string' } }
+                    },
+                    'dependentRequired': { 'valid_from': [ 'valid_to' ], 'valid_to': [ 'valid_from' ] },
+                    'additionalProperties': False
+                }
+            ]
+        },
+        'ttl': {
+            'description': 'Retention period of the rows of the entity: a number followed by s, m, h, d, or w (e.g. 30d)',
+            'type': 'string',
+            'pattern': '^[0-9]+ *[smhdw]$'
+        },
+        'ttl_column': {
+            'description': 'The timestamp attribute that the retention period (ttl) starts from.  Default is the time the row is inserted (CockroachDB only).',
+            'type': 'string'
+        },
+        'closure_table': {
+            'description': 'On an entity with a self-referencing one-to-many relationship (a hierarchy), generate a closure table of its ancestor and descendant pairs.  Default false.',
+            'type': 'boolean'
+        },
+        'inheritance': {
+            'description': 'On a root base class, how its class hierarchy is mapped to tables.  Default table_per_level.',
+            'type': 'string',
+            'enum': [ 'table_per_level', 'table_per_level_with_views', 'single_table', 'table_per_concrete_class' ]
+        },
+        'discriminator': {
+            'description': 'On a root base class using single_table inheritance, the name of the discriminator column',
+            'type': 'string',
+            'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+            'maxLength': 500
+        },
+        'subject_area': {
+            'description': 'The subject area the entity belongs to, for generating the entities of a subject area together',
+            'type': 'string',
+            'pattern': '^[A-Za-z_][A-Za-z0-9_]*$',
+            'maxLength': 500
+        },
+        'expected_rows': {
+            'description': 'The number of rows the entity is expected to have, for capacity estimates',
+            'type': 'number',
+            'minimum': 0
+        },
+        'growth_per_day': {
+            'description': 'The number of rows expected to be added to the entity each day, for capacity estimates',
+            'type': 'number',
+            'minimum': 0
+        },
+        'data_hints': {
+            'description': 'Hints for generating test data: a row count, or a fan-out per row of the first required parent',
+            'type': 'object',
+            'properties': {
+                'rows': { 'type': 'number', 'minimum': 0 },
+                'fan_out': { 'type': 'number', 'minimum': 0 }
+            }
         }
     },
     #'additionalProperties': 'false'
@@ -19,9 +19,16 @@ Utilities for Zepster
 
 from loguru import logger
 import cardinality
+import copy
+import datetime
+import filecmp
+import hashlib
 import json
+import os
+import re
 import yaml
-from toposort import toposort_flatten
+import zlib
+from toposort import toposort, toposort_flatten
 
 
 def i(level):
@@ -46,7 +53,7 @@ def topological_sort_entities(er_yaml):
     for relationship in er_yaml['relationships']:
         for participant in relationship['relationship']['participants']:
             graph.update( { participant['name']: set() } )
-    logger.debug(f'Initial empty dependency graph:\n{yaml.dump(graph)}')
+    logger.opt(lazy=True).debug('Initial empty dependency graph:\n{}', lambda: yaml.dump(graph))
     # Identify and store the dependents
     for relationship in er_yaml['relationships']:
         participants = relationship['relationship']['participants']
@@ -65,6 +72,10 @@ def topological_sort_entities(er_yaml):
                 logger.debug(f'{i(1)}Making latter lexically depend on former lexically')
                 graph[lex_last].add(lex_first)
             elif p1['kind'] == 'zero_or_more':
+                # if self loop (a hierarchy) then skip
+                if p0['name'] == p1['name']:
+                    logger.debug(f'{i(1)}Self loop so skipping')
+                    continue
                 # make p1 depend on p0
                 logger.debug(f'{i(1)}Making p1 depend on p0')
                 graph[p1['name']].add(p0['name'])
@@ -72,6 +83,10 @@ def topological_sort_entities(er_yaml):
                 assert False
         elif p0['kind'] == 'zero_or_more':
             if p1['kind'] in [ 'one', 'zero_or_one' ]:
+                # if self loop (a hierarchy) then skip
+                if p0['name'] == p1['name']:
+                    logger.debug(f'{i(1)}Self loop so skipping')
+                    continue
                 # make p0 depend on p1
                 logger.debug(f'{i(1)}Making p0 depend on p1')
                 graph[p0['name']].add(p1['name'])
@@ -85,22 +100,22 @@ def topological_sort_entities(er_yaml):
                 assert False
         elif p0['kind'] == 'base_class':
             if p1['kind'] == 'subclass':
-                # make p1 depend on p0  (assumes table-per-level inheritance)
+                # make p1 depend on p0  (table-per-level inheritance; see apply_inheritance_strategies)
                 logger.debug(f'{i(1)}Making p1 depend on p0')
                 graph[p1['name']].add(p0['name'])
             else:
                 assert False
         elif p0['kind'] == 'subclass':
             if p1['kind'] == 'base_class':
-                # make p0 depend on p1  (assumes table-per-level inheritance)
+                # make p0 depend on p1  (table-per-level inheritance; see apply_inheritance_strategies)
                 logger.debug(f'{i(1)}Making p0 depend on p1')
                 graph[p0['name']].add(p1['name'])
             else:
                 assert False
     dependency_ordering = toposort_flatten(graph)
     logger.debug('')
-    logger.debug(f'Final dependency graph:\n{yaml.dump(graph)}')
-    logger.debug(f'dependency_ordering:\n{json.dumps(dependency_ordering, indent=4)}')
+    logger.opt(lazy=True).debug('Final dependency graph:\n{}', lambda: yaml.dump(graph))
+    logger.opt(lazy=True).debug('dependency_ordering:\n{}', lambda: json.dumps(dependency_ordering, indent=4))
     logger.debug(f'mm_synthesized:\n{mm_synthesized}')
     logger.debug('Leaving topological_sort_entities()')
     return graph, dependency_ordering, mm_synthesized
@@ -121,25 +136,26 @@ def build_entity_parents_and_children(er_yaml):
     logger.debug('Entering build_entity_parents_and_children()')
     entities_pc = {}
     for relationship_outer in er_yaml['relationships']:
-        logger.debug(f'relationship_outer={relationship_outer}')
+        logger.debug('relationship_outer={}', relationship_outer)
         relationship = relationship_outer['relationship']
-        logger.debug(f'relationship={relationship}')
+        logger.debug('relationship={}', relationship)
         is_defining = False
         if 'defining' in relationship:
             if relationship['defining'] == 'true':
                 is_defining = True
         logger.debug(f'is_defining={is_defining}')
         participants = relationship['participants']
-        logger.debug(f'participants={participants}')
+        logger.debug('participants={}', participants)
         assert cardinality.count(participants) == 2
         for participant_index, participant in enumerate(participants):
-            logger.debug(f'{i(1)}participant_index={participant_index} participant={participant}')
+            logger.debug('{}participant_index={} participant={}', i(1), participant_index, participant)
             other_participant_index = 1 if participant_index == 0 else 0
             participant_name = participant['name']
             participant_kind = participant['kind']
             logger.debug(f'{i(2)}participant_name={participant_name} participant_kind={participant_kind}')
             other_participant = participants[other_participant_index]
-            logger.debug(f'{i(2)}other_participant_index={other_participant_index} other_participant={other_participant}')
+            logger.debug('{}other_participant_index={} other_participant={}',
+                         i(2), other_participant_index, other_participant)
             other_participant_name = other_participant['name']
             other_participant_kind = other_participant['kind']
             logger.debug(f'{i(2)}other_participant_name={other_participant_name} other_participant_kind={other_participant_kind}')
@@ -150,7 +166,7 @@ def build_entity_parents_and_children(er_yaml):
                 logger.debug(f'{i(2)}Making new participating_entity_pc')
                 participating_entity_pc = {}
                 entities_pc.update( { participant_name: participating_entity_pc } )
-            logger.debug(f'{i(2)}participating_entity_pc={participating_entity_pc}')
+            logger.debug('{}participating_entity_pc={}', i(2), participating_entity_pc)
             if participant_kind in ['zero_or_more', 'subclass']:
                 logger.debug(f"{i(2)}TRUE: participant_kind in ['zero_or_more', 'subclass']")
                 if participant_kind == 'zero_or_more' and other_participant_kind == 'zero_or_more':
@@ -164,7 +180,7 @@ def build_entity_parents_and_children(er_yaml):
                     participating_entity_pc_parents = []
                     participating_entity_pc.update( { 'parents': participating_entity_pc_parents } )
                 participating_entity_pc_parents.append( { other_participant_name: { 'kind': other_participant_kind, 'defining': is_defining } } )
-                logger.debug(f'{i(2)}participating_entity_pc_parents={participating_entity_pc_parents}')
+                logger.debug('{}participating_entity_pc_parents={}', i(2), participating_entity_pc_parents)
             elif participant_kind in ['one', 'zero_or_one', 'base_class']:
                 logger.debug(f"{i(2)}TRUE: participant_kind in ['one', 'zero_or_one', 'base_class']")
                 if 'children' in participating_entity_pc:
@@ -175,8 +191,1418 @@ def build_entity_parents_and_children(er_yaml):
                     participating_entity_pc_children = []
                     participating_entity_pc.update( { 'children': participating_entity_pc_children } )
                 participating_entity_pc_children.append( { other_participant_name: { 'kind': other_participant_kind, 'defining': is_defining } } )
-                logger.debug(f'{i(2)}participating_entity_pc_children={participating_entity_pc_children}')
+                logger.debug('{}participating_entity_pc_children={}', i(2), participating_entity_pc_children)
             else:
                 assert False
     logger.debug('Leaving build_entity_parents_and_children()')
     return entities_pc
+
+
+@logger.catch
+def foreign_key_on_delete(parent_kind, is_defining):
+    '''
+    Determine the "on delete" action for a foreign key to a parent entity.
+    Returns None when the database default (no action) applies.
+    '''
+    if is_defining:
+        return 'cascade'
+    if parent_kind == 'zero_or_one':
+        return 'set null'
+    return None
+
+
+# The primary key of a table that has a generated (synthetic) key
+SYNTHETIC_KEY = [ { 'name': 'pk', 'type': 'uuid' } ]
+
+
+def identifying_attributes(entity):
+    '''
+    Return the names of the identifying attributes of an entity, ordered by their
+    position in the identifying attribute set ("identifying: true" is position 1)
+    '''
+    positions = [ ]
+    if 'attributes' in entity:
+        for attribute_num, (attribute_name, attribute_values) in enumerate(entity['attributes'].items()):
+            identifying = attribute_values.get('identifying', False) if attribute_values else False
+            if identifying is True:
+                positions.append( (1, attribute_num, attribute_name) )
+            elif identifying is not False and identifying is not None:
+                positions.append( (identifying, attribute_num, attribute_name) )
+    return [ attribute_name for position, attribute_num, attribute_name in sorted(positions) ]
+
+
+def foreign_key_columns(parent_name, parent_key, self_reference=False):
+    '''
+    Name the columns that reference the primary key of a parent table.
+    A generated key is referenced by a single "fk_<parent>" column; a natural key
+    is referenced by one "<parent>_<key column>" column per key column.
+    A self reference (a table referencing its own parent row) uses "parent_<table>"
+    in place of the parent name, e.g. "fk_parent_<table>".
+    '''
+    if self_reference:
+        parent_name = 'parent_' + parent_name
+    if parent_key == SYNTHETIC_KEY:
+        return [ 'fk_' + parent_name ]
+    return [ f'{parent_name}_{key_column["name"]}' for key_column in parent_key ]
+
+
+def mapping_table_parents(graph, table_name):
+    '''
+    Return the parents of a synthesized many-to-many mapping table as a list of
+    (parent name, self reference) pairs.  A mapping table for a many-to-many relationship
+    of an entity with itself references that entity twice, once as the parent row.
+    '''
+    parent_names = sorted(graph[table_name])
+    if cardinality.count(parent_names) == 1:
+        return [ (parent_names[0], True), (parent_names[0], False) ]
+    return [ (parent_name, False) for parent_name in parent_names ]
+
+
+@logger.catch
+def build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys=True):
+    '''
+    Build the primary key of each table, as a list of columns with a name and a type
+
+    With generated keys, every table has the synthetic "pk" column.  Otherwise (natural-key mode):
+     - an entity's identifying attributes become its primary key, preceded by the columns
+       referencing any defining parent (so a weak entity's key is qualified by its parent's key)
+     - a subclass shares the primary key of its base class
+     - a many-to-many mapping table is keyed by the columns referencing both parents
+     - an entity with no identifying attributes keeps a generated key
+    '''
+    logger.debug('Entering build_table_keys()')
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    table_keys = { }
+    for table_name in dependency_ordering:
+        if generate_keys:
+            table_keys.update( { table_name: SYNTHETIC_KEY } )
+            continue
+        parents = [ ]
+        if table_name in mm_synthesized:
+            parents = [ ( { parent_name: { 'kind': 'one', 'defining': True } }, self_reference )
+                        for parent_name, self_reference in mapping_table_parents(graph, table_name) ]
+        elif table_name in entities_pc and 'parents' in entities_pc[table_name]:
+            parents = [ (parent, False) for parent in entities_pc[table_name]['parents'] ]
+        key = [ ]
+        base_class_key = None
+        for parent, self_reference in parents:
+            for parent_name, parent_vals in parent.items():
+                if parent_name == table_name:
+                    continue
+                parent_key = table_keys[parent_name]
+                parent_columns = [ { 'name': column_name, 'type': key_column['type'] } for column_name, key_column
+                                   in zip(foreign_key_columns(parent_name, parent_key, self_reference), parent_key) ]
+                if parent_vals['kind'] == 'base_class':
+                    base_class_key = parent_columns
+                elif parent_vals['kind'] == 'one' and parent_vals.get('defining', False) == True:
+                    key.extend(parent_columns)
+        if base_class_key is not None:
+            key = base_class_key
+        elif table_name not in mm_synthesized:
+            entity = entities.get(table_name, { })
+            identifying = identifying_attributes(entity)
+            if identifying:
+                key.extend( [ { 'name': attribute_name,
+                                'type': entity['attributes'][attribute_name].get('type', 'unknown') }
+                              for attribute_name in identifying ] )
+            else:
+                logger.warning(f'Entity {table_name} has no identifying attributes, so it keeps a generated key')
+                key = SYNTHETIC_KEY
+        logger.debug('{}table_name={} key={}', i(1), table_name, key)
+        table_keys.update( { table_name: key } )
+    logger.debug('Leaving build_table_keys()')
+    return table_keys
+
+
+@logger.catch
+def build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys=None):
+    '''
+    Build the foreign keys for each table, matching the DDL written by genschema
+
+    Returns a dictionary of table name to a list of foreign keys, where each foreign key has:
+     columns             the referencing columns in the table
+     types               the types of the referencing columns
+     references          the referenced (parent) table
+     referenced_columns  the primary key columns of the parent table
+     kind                the relationship kind of the parent end
+     required            whether the columns are "not null"
+     on_delete           "cascade", "set null", or None
+     self_reference      whether the table references itself (its parent row in a hierarchy)
+
+    A self reference is never required, since the root rows of a hierarchy have no parent.
+    Without table_keys (see build_table_keys), every table is assumed to have a generated key.
+    '''
+    logger.debug('Entering build_table_foreign_keys()')
+
+    def make_fk(parent_name, parent_kind, required, on_delete, self_reference=False):
+        parent_key = table_keys[parent_name] if table_keys is not None else SYNTHETIC_KEY
+        return { 'columns': foreign_key_columns(parent_name, parent_key, self_reference),
+                 'types': [ key_column['type'] for key_column in parent_key ],
+                 'references': parent_name,
+                 'referenced_columns': [ key_column['name'] for key_column in parent_key ],
+                 'kind': parent_kind, 'required': required, 'on_delete': on_delete,
+                 'self_reference': self_reference }
+
+    table_fks = { }
+    for table_name in graph:
+        fks = [ ]
+        if table_name in mm_synthesized:
+            for parent_name, self_reference in mapping_table_parents(graph, table_name):
+                fks.append(make_fk(parent_name, 'one', True, 'cascade', self_reference))
+        elif table_name in entities_pc and 'parents' in entities_pc[table_name]:
+            for parent in entities_pc[table_name]['parents']:
+                assert cardinality.count(parent) == 1
+                for parent_name, parent_vals in parent.items():
+                    pass
+                parent_kind = parent_vals['kind']
+                is_defining = parent_vals['defining'] if 'defining' in parent_vals else False
+                if parent_name == table_name:
+                    fks.append(make_fk(parent_name, parent_kind, False,
+                                       foreign_key_on_delete(parent_kind, is_defining), True))
+                else:
+                    fks.append(make_fk(parent_name, parent_kind, parent_kind in ['one', 'base_class'],
+                                       foreign_key_on_delete(parent_kind, is_defining)))
+        logger.debug('{}table_name={} fks={}', i(1), table_name, fks)
+        table_fks.update( { table_name: fks } )
+    logger.debug('Leaving build_table_foreign_keys()')
+    return table_fks
+
+
+@logger.catch
+def build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys=None):
+    '''
+    Build the columns for each table, in the order they appear in the DDL written by genschema
+
+    Returns a dictionary of table name to a list of columns, where each column has:
+     name        the column name
+     source      "pk", "fk", or "attribute"
+     type        the ERML type ("uuid" for generated keys)
+     required    whether the column is "not null"
+     unique      the ERML "unique" value (True, False, or "within_parent")
+     fk          the foreign key (see build_table_foreign_keys) for "fk" columns
+
+    A column shared by more than one foreign key (for example, part of both a
+    subclass's key and a defining parent's key) appears only once.
+    '''
+    logger.debug('Entering build_table_columns()')
+    entity_attributes = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        entity_attributes.update( { entity['name']: entity['attributes'] if 'attributes' in entity else { } } )
+    table_columns = { }
+    for table_name in graph:
+        columns = [ ]
+        if table_keys is None or table_keys[table_name] == SYNTHETIC_KEY:
+            columns.append( { 'name': 'pk', 'source': 'pk', 'type': 'uuid', 'required': True, 'unique': True, 'fk': None } )
+        column_names = set()
+        for fk in table_fks[table_name]:
+            for column_name, column_type in zip(fk['columns'], fk['types']):
+                if column_name in column_names:
+                    continue
+                column_names.add(column_name)
+                columns.append( { 'name': column_name, 'source': 'fk', 'type': column_type, 'required': fk['required'],
+                                  'unique': False, 'fk': fk } )
+        if table_name not in mm_synthesized:
+            for attribute_name, attribute_values in entity_attributes.get(table_name, { }).items():
+                columns.append( { 'name': attribute_name, 'source': 'attribute',
+                                  'type': attribute_values['type'] if 'type' in attribute_values else 'unknown',
+                                  'required': attribute_values.get('required', False) == True,
+                                  'unique': attribute_values.get('unique', False),
+                                  'fk': None } )
+        table_columns.update( { table_name: columns } )
+    logger.debug('Leaving build_table_columns()')
+    return table_columns
+
+
+# ERML attribute types that are not PostgreSQL types (CockroachDB accepts them as written)
+PG_TYPES = { 'string': 'text', 'unknown': 'text', 'float': 'double precision' }
+
+# ERML attribute types as SQLite column types, whose names set the type affinity of the columns
+SQLITE_TYPES = { 'string': 'text', 'unknown': 'text', 'float': 'real', 'uuid': 'text' }
+
+# Sized integer types, by the largest absolute value each holds
+INTEGER_SIZES = [ (32767, 'int2'), (2147483647, 'int4'), (9223372036854775807, 'int8') ]
+
+# Alignment in bytes of fixed-width PostgreSQL column types; other types are variable width.
+# A uuid (16 bytes, unaligned) goes with the 8-byte types, as it keeps their alignment.
+PG_ALIGNMENTS = { 'int8': 8, 'bigint': 8, 'double precision': 8, 'timestamp': 8, 'timestamptz': 8, 'uuid': 8,
+                  'int4': 4, 'integer': 4, 'date': 4, 'real': 4,
+                  'int2': 2, 'smallint': 2,
+                  'boolean': 1 }
+
+
+def dialect_type(attribute_type, dialect, attribute_values=None):
+    '''
+    Map an ERML attribute type to a column type of the database dialect, sized by
+    the "max_length" (string) or "max_value" (integer) hint of the attribute, if any
+    '''
+    attribute_values = attribute_values or { }
+    if attribute_type == 'string' and 'max_length' in attribute_values:
+        return f'{"string" if dialect == "CRDB" else "varchar"}({attribute_values["max_length"]})'
+    if attribute_type == 'integer' and 'max_value' in attribute_values:
+        return next((size_type for max_value, size_type in INTEGER_SIZES
+                     if abs(attribute_values['max_value']) <= max_value), 'numeric')
+    if dialect == 'PG':
+        return PG_TYPES.get(attribute_type, attribute_type)
+    if dialect == 'SQLITE':
+        return SQLITE_TYPES.get(attribute_type, attribute_type)
+    return attribute_type
+
+
+def enum_reference_type(num_values, dialect):
+    '''
+    Choose the type of the key of an enum table and of the columns referencing it.
+    On PostgreSQL, a smallint saves two bytes (and often alignment padding) per row.
+    CockroachDB encodes integers by value, so the type is left as is.
+    '''
+    if dialect == 'PG' and num_values <= INTEGER_SIZES[0][0]:
+        return 'smallint'
+    return 'integer'
+
+
+@logger.catch
+def build_column_types(er_yaml, table_columns, dialect):
+    '''
+    Build the column type of each column of each table (see build_table_columns) for the dialect.
+    A foreign key column has the type of the column it references.
+    Returns a dictionary of table name to a dictionary of column name to column type.
+    '''
+    logger.debug('Entering build_column_types()')
+    entity_attributes = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        entity_attributes.update( { entity['name']: entity['attributes'] if 'attributes' in entity else { } } )
+    enum_sizes = { }
+    for enum_outer in er_yaml['enums']:
+        enum_sizes.update( { enum_outer['enum']['name']: cardinality.count(enum_outer['enum']['values']) } )
+    columns_by_name = { table_name: { column['name']: column for column in columns }
+                        for table_name, columns in table_columns.items() }
+
+    def column_type(table_name, column_name):
+        column = columns_by_name[table_name][column_name]
+        if column['source'] == 'pk':
+            return dialect_type('uuid', dialect)
+        if column['source'] == 'fk':
+            fk = column['fk']
+            referenced_column = fk['referenced_columns'][fk['columns'].index(column_name)]
+            return column_type(fk['references'], referenced_column)
+        if column['type'] == 'enum':
+            return enum_reference_type(enum_sizes.get('enum_' + column_name, 0), dialect)
+        return dialect_type(column['type'], dialect, entity_attributes[table_name][column_name])
+
+    column_types = { }
+    for table_name, columns in table_columns.items():
+        column_types.update( { table_name: { column['name']: column_type(table_name, column['name'])
+                                             for column in columns } } )
+    logger.debug('Leaving build_column_types()')
+    return column_types
+
+
+# Column family for each value of the "update_frequency" hint of an attribute.  Columns without
+# a hint share the default family with the key and foreign key columns.
+DEFAULT_FAMILY = 'main'
+UPDATE_FREQUENCY_FAMILIES = { 'high': 'hot', 'normal': DEFAULT_FAMILY, 'low': 'cold' }
+
+
+def attribute_family(attribute_values):
+    '''
+    Return the column family of an attribute from its "family" hint, or else its "update_frequency"
+    hint, or None if it has neither (or an update_frequency that is not valid; see attribute_errors)
+    '''
+    if not attribute_values:
+        return None
+    if 'family' in attribute_values:
+        return attribute_values['family']
+    return UPDATE_FREQUENCY_FAMILIES.get(attribute_values.get('update_frequency', None), None)
+
+
+def attribute_errors(er_yaml):
+    '''
+    Check the hints on the attributes of each entity that choose their columns: an update_frequency
+    must be one of those with a column family.  Returns a list of (location, message) for each error
+    (see model_errors).
+    '''
+    errors = [ ]
+    for entity_index, entity_outer in enumerate(er_yaml['entities']):
+        entity = entity_outer['entity']
+        for attribute_name, attribute_values in (entity.get('attributes', None) or { }).items():
+            update_frequency = (attribute_values or { }).get('update_frequency', None)
+            if update_frequency is not None and update_frequency not in UPDATE_FREQUENCY_FAMILIES:
+                errors.append( (f'/entities/{entity_index}/entity/attributes/{attribute_name}/update_frequency',
+                                f'Attribute "{attribute_name}" of entity "{entity["name"]}" has update_frequency '
+                                f'"{update_frequency}", which is not one of: {", ".join(UPDATE_FREQUENCY_FAMILIES)}') )
+    return errors
+
+
+@logger.catch
+def build_column_families(er_yaml, table_columns):
+    '''
+    Group the columns of each table (see build_table_columns) into column families, so a
+    frequently updated column does not rewrite rarely updated (often large) columns with it.
+
+    Returns a dictionary of table name to a list of (family name, column names), with the
+    default family first, for each table with at least one attribute that has a "family"
+    or "update_frequency" hint.
+    '''
+    logger.debug('Entering build_column_families()')
+    entity_attributes = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        entity_attributes.update( { entity['name']: entity['attributes'] if 'attributes' in entity else { } } )
+    table_families = { }
+    for table_name, columns in table_columns.items():
+        attributes = entity_attributes.get(table_name, { }) or { }
+        families = { DEFAULT_FAMILY: [ ] }
+        hinted = False
+        for column in columns:
+            family = None
+            if column['source'] == 'attribute':
+                family = attribute_family(attributes.get(column['name'], { }))
+            if family is not None:
+                hinted = True
+            families.setdefault(family or DEFAULT_FAMILY, [ ]).append(column['name'])
+        if hinted:
+            table_families.update( { table_name: [ (family, column_names) for family, column_names in families.items()
+                                                   if column_names ] } )
+    logger.opt(lazy=True).debug('table_families:\n{}', lambda: json.dumps(table_families, indent=4))
+    logger.debug('Leaving build_column_families()')
+    return table_families
+
+
+@logger.catch
+def dependency_layers(graph):
+    '''
+    Group the tables of a dependency graph (see topological_sort_entities) into layers.
+    No table in a layer depends on another table in the same layer, and every table
+    depends only on tables in earlier layers, so the tables of a layer can be
+    loaded concurrently.  Returns a list of sorted lists of table names.
+    '''
+    logger.debug('Entering dependency_layers()')
+    layers = [ sorted(layer) for layer in toposort(graph) ]
+    logger.opt(lazy=True).debug('layers:\n{}', lambda: json.dumps(layers, indent=4))
+    logger.debug('Leaving dependency_layers()')
+    return layers
+
+
+@logger.catch
+def build_hierarchies(er_yaml):
+    '''
+    Describe each entity with a self-referencing one-to-many relationship, where each row
+    references its parent row (for example, an org tree or a location hierarchy)
+
+    Returns a dictionary of entity name to:
+     kind           the relationship kind of the parent end ("one" or "zero_or_one")
+     defining       whether deleting a row also deletes its subtree
+     closure_table  the closure table (ancestor, descendant, depth) of the hierarchy,
+                    or None if the entity does not request one with "closure_table: true"
+    '''
+    logger.debug('Entering build_hierarchies()')
+    hierarchies = { }
+    for relationship_outer in er_yaml['relationships']:
+        relationship = relationship_outer['relationship']
+        participants = relationship['participants']
+        if participants[0]['name'] != participants[1]['name']:
+            continue
+        kinds = [ participant['kind'] for participant in participants ]
+        if 'zero_or_more' not in kinds or kinds == [ 'zero_or_more', 'zero_or_more' ]:
+            continue
+        entity_name = participants[0]['name']
+        if entity_name in hierarchies:
+            logger.warning(f'Entity {entity_name} has more than one self-referencing relationship, '
+                           f'so only the first is treated as its hierarchy')
+            continue
+        parent_kind = kinds[0] if kinds[1] == 'zero_or_more' else kinds[1]
+        hierarchies.update( { entity_name: { 'kind': parent_kind,
+                                             'defining': relationship.get('defining', 'false') == 'true',
+                                             'closure_table': None } } )
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        if entity.get('closure_table', False) != True:
+            continue
+        if entity['name'] in hierarchies:
+            hierarchies[entity['name']].update( { 'closure_table': entity['name'] + '_closure' } )
+        else:
+            logger.warning(f'Entity {entity["name"]} requests a closure table, but has no self-referencing '
+                           f'one-to-many relationship, so no closure table is generated')
+    logger.opt(lazy=True).debug('hierarchies:\n{}', lambda: json.dumps(hierarchies, indent=4))
+    logger.debug('Leaving build_hierarchies()')
+    return hierarchies
+
+
+# Strategies for mapping a class hierarchy (base_class/subclass relationships) to tables
+INHERITANCE_STRATEGIES = [ 'table_per_level', 'table_per_level_with_views', 'single_table', 'table_per_concrete_class' ]
+
+
+@logger.catch
+def build_inheritance(er_yaml):
+    '''
+    Describe how each entity in a class hierarchy is mapped to tables
+
+    The strategy is selected by an "inheritance" key on the root base class of the hierarchy
+    (default "table_per_level").  Returns a dictionary of entity name to:
+     root           the root base class of the hierarchy
+     base_class     the immediate base class (None for the root)
+     subclasses     the immediate subclasses
+     strategy       the inheritance strategy of the hierarchy
+     table          the table that stores the entity's own attributes (None for an abstract base class)
+     discriminator  for "single_table", the discriminator column
+    '''
+    logger.debug('Entering build_inheritance()')
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    base_class_of = { }
+    subclasses_of = { }
+    for relationship in er_yaml['relationships']:
+        participants = relationship['relationship']['participants']
+        kinds = [ participant['kind'] for participant in participants ]
+        if 'subclass' in kinds and 'base_class' in kinds:
+            subclass_name = participants[kinds.index('subclass')]['name']
+            base_class_name = participants[kinds.index('base_class')]['name']
+            base_class_of.update( { subclass_name: base_class_name } )
+            subclasses_of.setdefault(base_class_name, [ ]).append(subclass_name)
+    inheritance = { }
+    for entity_name in set(base_class_of.keys()) | set(subclasses_of.keys()):
+        root_name = entity_name
+        while root_name in base_class_of:
+            root_name = base_class_of[root_name]
+        root = entities.get(root_name, { })
+        strategy = root.get('inheritance', 'table_per_level')
+        has_subclasses = entity_name in subclasses_of
+        if strategy == 'single_table':
+            table_name = root_name
+        elif strategy == 'table_per_concrete_class':
+            table_name = None if has_subclasses else entity_name
+        else:
+            table_name = entity_name
+        inheritance.update( { entity_name: {
+            'root': root_name,
+            'base_class': base_class_of.get(entity_name),
+            'subclasses': sorted(subclasses_of.get(entity_name, [ ])),
+            'strategy': strategy,
+            'table': table_name,
+            'discriminator': root.get('discriminator', f'{root_name}_subtype') if strategy == 'single_table' else None
+        } } )
+    logger.opt(lazy=True).debug('inheritance=\n{}', lambda: json.dumps(inheritance, indent=4))
+    logger.debug('Leaving build_inheritance()')
+    return inheritance
+
+
+@logger.catch
+def apply_inheritance_strategies(er_yaml):
+    '''
+    Map the logical model to the physical model for the selected inheritance strategies,
+    returning a new ERML dictionary (the input is not changed)
+
+    table_per_level (and table_per_level_with_views):
+        unchanged; each class has a table, and a subclass table references its base class table
+    single_table:
+        the whole hierarchy is stored in the root base class table, which gains the (optional)
+        attributes of every subclass and a discriminator column referencing a generated enum
+        whose values are the class names.  Relationships to and from subclasses move to the root.
+    table_per_concrete_class:
+        only concrete (leaf) classes have tables, each with all inherited attributes.  A relationship
+        with an abstract base class is repeated for each concrete class under it; a reference to an
+        abstract base class therefore becomes one optional foreign key per concrete class.
+    '''
+    logger.debug('Entering apply_inheritance_strategies()')
+    inheritance = build_inheritance(er_yaml)
+    if all(info['strategy'] in [ 'table_per_level', 'table_per_level_with_views' ] for info in inheritance.values()):
+        logger.debug('Leaving apply_inheritance_strategies() with no changes')
+        return er_yaml
+    physical = copy.deepcopy(er_yaml)
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in physical['entities'] }
+
+    def descendants(entity_name):
+        result = [ ]
+        for subclass_name in inheritance[entity_name]['subclasses']:
+            result.append(subclass_name)
+            result.extend(descendants(subclass_name))
+        return result
+
+    def ancestors(entity_name):
+        result = [ ]
+        while inheritance[entity_name]['base_class'] is not None:
+            entity_name = inheritance[entity_name]['base_class']
+            result.insert(0, entity_name)
+        return result
+
+    # Map each removed entity to the entities that take over its relationships
+    replacements = { }
+    removed = set()
+    merged = set()      # Subclasses whose rows are stored in the root base class table
+    for entity_name, info in inheritance.items():
+        if entity_name != info['root']:
+            continue
+        if info['strategy'] == 'single_table':
+            root = entities[entity_name]
+            root_attributes = { }
+            discriminator = info['discriminator']
+            enum_name = 'enum_' + discriminator
+            root_attributes.update( { discriminator: { 'type': 'enum', 'required': True,
+                                                       'description': f'The class of the {entity_name} row' } } )
+            root_attributes.update(root.get('attributes', { }))
+            subclass_attributes = { }
+            attribute_classes = { }
+            for subclass_name in descendants(entity_name):
+                for attribute_name, attribute_values in entities[subclass_name].get('attributes', { }).items():
+                    if attribute_name in root_attributes:
+                        logger.debug(f'{i(1)}Attribute {attribute_name} of {subclass_name} already in {entity_name}')
+                        continue
+                    if attribute_name not in subclass_attributes:
+                        subclass_attributes.update( { attribute_name: attribute_values } )
+                    attribute_classes.setdefault(attribute_name, [ ]).append(subclass_name)
+                replacements.update( { subclass_name: [ entity_name ] } )
+                removed.add(subclass_name)
+                merged.add(subclass_name)
+            for attribute_name, attribute_values in subclass_attributes.items():
+                # Rows of the other classes have no value for a subclass attribute
+                attribute_values = dict(attribute_values)
+                attribute_values.update( { 'required': False } )
+                attribute_values.update( { 'note': f'Only for {", ".join(attribute_classes[attribute_name])}' +
+                                           (f'\n{attribute_values["note"]}' if 'note' in attribute_values else '') } )
+                root_attributes.update( { attribute_name: attribute_values } )
+            root.update( { 'attributes': root_attributes } )
+            physical['enums'].append( { 'enum': {
+                'name': enum_name,
+                'description': f'Classes stored in the {entity_name} table (single-table inheritance)',
+                'values': [ entity_name ] + descendants(entity_name)
+            } } )
+        elif info['strategy'] == 'table_per_concrete_class':
+            concrete = [ name for name in descendants(entity_name) if not inheritance[name]['subclasses'] ]
+            for abstract_name in [ entity_name ] + [ name for name in descendants(entity_name) if name not in concrete ]:
+                replacements.update( { abstract_name: [ name for name in descendants(abstract_name) if name in concrete ] } )
+                removed.add(abstract_name)
+            for concrete_name in concrete:
+                concrete_attributes = { }
+                for ancestor_name in ancestors(concrete_name):
+                    concrete_attributes.update(entities[ancestor_name].get('attributes', { }))
+                concrete_attributes.update(entities[concrete_name].get('attributes', { }))
+                if concrete_attributes:
+                    entities[concrete_name].update( { 'attributes': concrete_attributes } )
+    logger.debug(f'replacements={replacements}')
+
+    relationships = [ ]
+    for relationship in physical['relationships']:
+        participants = relationship['relationship']['participants']
+        kinds = [ participant['kind'] for participant in participants ]
+        names = [ participant['name'] for participant in participants ]
+        if 'subclass' in kinds and (names[0] in removed or names[1] in removed):
+            # Inheritance relationships within a hierarchy that is no longer stored table-per-level
+            continue
+        ends = [ replacements.get(name, [ name ]) for name in names ]
+        for name0 in ends[0]:
+            for name1 in ends[1]:
+                new_participants = [ dict(participants[0]), dict(participants[1]) ]
+                new_participants[0].update( { 'name': name0 } )
+                new_participants[1].update( { 'name': name1 } )
+                for end, other in [ (0, 1), (1, 0) ]:
+                    # A reference that may now point to one of several tables, or that is now held by
+                    # rows of other classes, must be optional
+                    if new_participants[end]['kind'] == 'one' and \
+                            (len(ends[end]) > 1 or names[other] in merged):
+                        new_participants[end].update( { 'kind': 'zero_or_one' } )
+                new_relationship = copy.deepcopy(relationship)
+                new_relationship['relationship'].update( { 'participants': new_participants } )
+                relationships.append(new_relationship)
+    physical.update( { 'relationships': relationships } )
+    physical.update( { 'entities': [ entity_outer for entity_outer in physical['entities']
+                                     if entity_outer['entity']['name'] not in removed ] } )
+    logger.debug('Leaving apply_inheritance_strategies()')
+    return physical
+
+
+# Columns added to a temporal entity that does not name its own validity period attributes
+TEMPORAL_VALID_FROM = 'valid_from'
+TEMPORAL_VALID_TO = 'valid_to'
+
+
+@logger.catch
+def build_temporal_entities(er_yaml):
+    '''
+    Describe each temporal (versioned) entity, marked by "temporal" in the ERML.
+    Each row of a temporal entity is one version, valid from its "valid from" value
+    until its "valid to" value; the current version has no "valid to" value.
+
+    "temporal: true" adds valid_from and valid_to columns.  Alternatively, "temporal" names
+    existing attributes with "valid_from" and "valid_to", and the attributes identifying
+    the versioned object with "key" (by default, its required parents and identifying attributes).
+
+    Returns a dictionary of entity name to:
+     valid_from  the attribute starting the validity period
+     valid_to    the attribute ending the validity period (null for the current version)
+     key         the attributes identifying the versioned object, or None for the default
+     generated   whether the validity period attributes are added to the entity
+
+    The attributes named by "temporal" must exist (see temporal_errors).
+    '''
+    logger.debug('Entering build_temporal_entities()')
+    temporal_entities = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        temporal = entity.get('temporal', False)
+        if temporal is False:
+            continue
+        if temporal is True:
+            temporal = { }
+        info = { 'valid_from': temporal.get('valid_from', TEMPORAL_VALID_FROM),
+                 'valid_to': temporal.get('valid_to', TEMPORAL_VALID_TO),
+                 'key': temporal.get('key', None),
+                 'generated': 'valid_from' not in temporal and 'valid_to' not in temporal }
+        temporal_entities.update( { entity['name']: info } )
+    logger.opt(lazy=True).debug('temporal_entities:\n{}', lambda: json.dumps(temporal_entities, indent=4))
+    logger.debug('Leaving build_temporal_entities()')
+    return temporal_entities
+
+
+def temporal_errors(er_yaml):
+    '''
+    Check that the attributes named by the "temporal" declaration of each entity are attributes of the entity.
+    Returns a list of (location, message) for each error (see model_errors).
+    '''
+    errors = [ ]
+    for entity_index, entity_outer in enumerate(er_yaml['entities']):
+        entity = entity_outer['entity']
+        temporal = entity.get('temporal', False)
+        if not isinstance(temporal, dict):
+            continue
+        attributes = entity.get('attributes', None) or { }
+        for part in [ 'valid_from', 'valid_to', 'key' ]:
+            named = temporal.get(part, [ ])
+            for attribute_name in named if isinstance(named, list) else [ named ]:
+                if attribute_name not in attributes:
+                    errors.append( (f'/entities/{entity_index}/entity/temporal/{part}',
+                                    f'Temporal entity "{entity["name"]}" names attribute "{attribute_name}", '
+                                    f'which is not an attribute of the entity') )
+    return errors
+
+
+@logger.catch
+def apply_temporal_entities(er_yaml):
+    '''
+    Add the validity period attributes to temporal entities (see build_temporal_entities),
+    returning a new ERML dictionary (the input is not changed)
+    '''
+    logger.debug('Entering apply_temporal_entities()')
+    temporal_entities = build_temporal_entities(er_yaml)
+    if not temporal_entities:
+        logger.debug('Leaving apply_temporal_entities() with no changes')
+        return er_yaml
+    physical = copy.deepcopy(er_yaml)
+    for entity_outer in physical['entities']:
+        entity = entity_outer['entity']
+        if entity['name'] not in temporal_entities:
+            continue
+        info = temporal_entities[entity['name']]
+        if 'attributes' not in entity or entity['attributes'] is None:
+            entity.update( { 'attributes': { } } )
+        attributes = entity['attributes']
+        if info['generated']:
+            attributes.update( { TEMPORAL_VALID_FROM: { 'type': 'timestamptz', 'required': True,
+                                                        'description': 'Start of the validity period of this version' } } )
+            attributes.update( { TEMPORAL_VALID_TO: { 'type': 'timestamptz',
+                                                      'description': 'End of the validity period of this version, '
+                                                                     'or null for the current version' } } )
+        elif attributes[info['valid_to']].get('required', False) == True:
+            logger.warning(f'Attribute {info["valid_to"]} of temporal entity {entity["name"]} is made optional, '
+                           f'since it is null for the current version')
+            attributes[info['valid_to']].update( { 'required': False } )
+    logger.debug('Leaving apply_temporal_entities()')
+    return physical
+
+
+@logger.catch
+def temporal_key_columns(entity, info, fks):
+    '''
+    Return the columns identifying the versioned object of a temporal entity: the named key
+    attributes, or by default the columns referencing its required parents followed by its
+    identifying attributes (other than the validity period)
+    '''
+    if info['key'] is not None:
+        return list(info['key'])
+    columns = [ ]
+    for fk in fks:
+        if fk['required']:
+            columns.extend(column for column in fk['columns'] if column not in columns)
+    columns.extend(attribute_name for attribute_name in identifying_attributes(entity)
+                   if attribute_name not in [ info['valid_from'], info['valid_to'] ])
+    return columns
+
+
+@logger.catch
+def build_physical_model(er_yaml):
+    '''
+    Map the logical model in an ERML dictionary to the physical model that tables are built from:
+    class hierarchies are mapped according to their inheritance strategies, and temporal entities
+    get their validity period attributes.  Returns a new ERML dictionary (the input is not changed).
+    '''
+    return apply_temporal_entities(apply_inheritance_strategies(er_yaml))
+
+
+def reference_errors(er_yaml):
+    '''
+    Check that the participants of each relationship, and the entities of each access pattern, are entities.
+    Returns a list of (location, message) for each error (see model_errors).
+    '''
+    entity_names = set(entity_outer['entity']['name'] for entity_outer in er_yaml['entities'])
+    errors = [ ]
+    for relationship_index, relationship_outer in enumerate(er_yaml['relationships']):
+        for participant_index, participant in enumerate(relationship_outer['relationship']['participants']):
+            if participant['name'] not in entity_names:
+                errors.append( (f'/relationships/{relationship_index}/relationship/participants/{participant_index}/name',
+                                f'Relationship {relationship_index+1} names entity "{participant["name"]}", '
+                                f'which does not exist') )
+    for pattern_index, pattern in enumerate(er_yaml.get('access_patterns', None) or [ ]):
+        for part in [ 'entity', 'join' ]:
+            if part in pattern and pattern[part] not in entity_names:
+                errors.append( (f'/access_patterns/{pattern_index}/{part}',
+                                f'Access pattern {pattern_index+1} names entity "{pattern[part]}", '
+                                f'which does not exist') )
+    return errors
+
+
+def model_errors(er_yaml):
+    '''
+    Check a model that is valid against the ERML schema for the errors that the schema cannot find,
+    such as names that refer to nothing, so a tool can report them all before it generates anything.
+    Returns a list of (location, message) for each error, where the location is a JSON pointer into the model.
+    '''
+    return reference_errors(er_yaml) + temporal_errors(er_yaml) + retention_errors(er_yaml) + \
+        attribute_errors(er_yaml)
+
+
+# Units of the durations in retention policies, as interval units
+DURATION_UNITS = { 's': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks' }
+
+
+def duration_interval(duration):
+    '''
+    Convert a duration such as "30d" to an interval such as "30 days", or None if it is not a valid duration
+    '''
+    match = re.fullmatch(r'(\d+)\s*([smhdw])', str(duration).strip())
+    if match is None:
+        return None
+    return f'{match.group(1)} {DURATION_UNITS[match.group(2)]}'
+
+
+@logger.catch
+def build_retention_policies(er_yaml):
+    '''
+    Describe the retention policy of each entity with a "ttl" (for example "ttl: 30d"): its rows
+    expire that long after the value of its "ttl_column" attribute, or, without a "ttl_column",
+    that long after they are inserted (where the dialect tracks that natively)
+
+    Returns a dictionary of entity name to:
+     expire_after  the retention period as an interval, e.g. "30 days"
+     column        the timestamp attribute the period starts from, or None
+
+    The ttl and ttl_column must be valid (see retention_errors).
+    '''
+    logger.debug('Entering build_retention_policies()')
+    policies = { }
+    for entity_outer in er_yaml['entities']:
+        entity = entity_outer['entity']
+        if 'ttl' not in entity:
+            continue
+        column = entity.get('ttl_column', None)
+        policies.update( { entity['name']: { 'expire_after': duration_interval(entity['ttl']), 'column': column } } )
+    logger.opt(lazy=True).debug('policies:\n{}', lambda: json.dumps(policies, indent=4))
+    logger.debug('Leaving build_retention_policies()')
+    return policies
+
+
+def retention_errors(er_yaml):
+    '''
+    Check the retention policy of each entity: its ttl must be a duration, and its ttl_column an attribute
+    of the entity.  Returns a list of (location, message) for each error (see model_errors).
+    '''
+    errors = [ ]
+    for entity_index, entity_outer in enumerate(er_yaml['entities']):
+        entity = entity_outer['entity']
+        if 'ttl' in entity and duration_interval(entity['ttl']) is None:
+            errors.append( (f'/entities/{entity_index}/entity/ttl',
+                            f'Entity "{entity["name"]}" has ttl "{entity["ttl"]}", which is not a number '
+                            f'followed by s, m, h, d, or w') )
+        column = entity.get('ttl_column', None)
+        if column is not None and column not in (entity.get('attributes', None) or { }):
+            errors.append( (f'/entities/{entity_index}/entity/ttl_column',
+                            f'Entity "{entity["name"]}" has ttl_column "{column}", '
+                            f'which is not an attribute of the entity') )
+    return errors
+
+
+@logger.catch
+def build_cascade_children(table_fks):
+    '''
+    Invert the per-table foreign keys into a dictionary of parent table name
+    to the list of (child table name, foreign key) pairs that reference it
+    '''
+    logger.debug('Entering build_cascade_children()')
+    children = { }
+    for table_name, fks in table_fks.items():
+        for fk in fks:
+            if fk['references'] not in children:
+                children.update( { fk['references']: [ ] } )
+            children[fk['references']].append( (table_name, fk) )
+    logger.debug('Leaving build_cascade_children()')
+    return children
+
+
+@logger.catch
+def build_cascade_closure(root_name, children):
+    '''
+    Find the tables whose rows are deleted (via "on delete cascade") or updated
+    (via "on delete set null") when rows of the root table are deleted,
+    and the tables whose references block the delete (no "on delete" action)
+    '''
+    logger.debug('Entering build_cascade_closure()')
+    cascaded = set([root_name])
+    set_null = [ ]
+    blocking = [ ]
+    pending = [root_name]
+    while pending:
+        parent_name = pending.pop()
+        for child_name, fk in children.get(parent_name, [ ]):
+            if child_name == parent_name:
+                logger.debug(f'{i(1)}Self reference on {child_name} so skipping')
+                continue
+            if fk['on_delete'] == 'cascade':
+                if child_name not in cascaded:
+                    cascaded.add(child_name)
+                    pending.append(child_name)
+            elif fk['on_delete'] == 'set null':
+                set_null.append( (child_name, fk) )
+            else:
+                blocking.append( (child_name, fk) )
+    logger.debug(f'{i(1)}cascaded={cascaded} set_null={set_null} blocking={blocking}')
+    logger.debug('Leaving build_cascade_closure()')
+    return cascaded, set_null, blocking
+
+
+@logger.catch
+def build_delete_impact(er_yaml, generate_keys=True):
+    '''
+    Analyze the operational impact of deleting (or re-keying) a row of each table of the physical model
+
+    Returns a dictionary of table name to:
+     depth           the length of the longest chain of parents above the table in the dependency graph
+     fan_in          the number of foreign keys of the table (its references to parents)
+     fan_out         the number of foreign keys that reference the table (from its children)
+     cascade_reach   the sorted names of the other tables whose rows are deleted by "on delete cascade"
+     cascade_chain   the longest chain of cascading deletes, starting with the table
+     set_null        the sorted names of the tables whose rows are updated by "on delete set null"
+     blocking        the sorted names of the tables whose references block the delete
+     locked_tables   the number of tables a delete writes or checks: the table itself and the above
+     update_checked  the sorted names of the tables whose references are checked when the table's
+                     natural key is updated (empty for tables with a generated key, which never changes)
+    Self references are left out: they are never cascaded, and the root rows of a hierarchy have no parent.
+    '''
+    logger.debug('Entering build_delete_impact()')
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    children = build_cascade_children(table_fks)
+
+    # Parents come before their children in the dependency ordering
+    depths = { }
+    for table_name in dependency_ordering:
+        parent_depths = [ depths[fk['references']] for fk in table_fks[table_name]
+                          if not fk['self_reference'] and fk['references'] in depths ]
+        depths.update( { table_name: 1 + max(parent_depths) if parent_depths else 0 } )
+
+    # Longest cascade chain from each table, children first
+    cascade_chains = { }
+    for table_name in reversed(dependency_ordering):
+        chains = [ cascade_chains[child_name] for child_name, fk in children.get(table_name, [ ])
+                   if fk['on_delete'] == 'cascade' and child_name != table_name ]
+        cascade_chains.update( { table_name: [ table_name ] + max(chains, key=len, default=[ ]) } )
+
+    impact = { }
+    for table_name in dependency_ordering:
+        cascaded, set_null, blocking = build_cascade_closure(table_name, children)
+        cascaded.discard(table_name)
+        set_null_names = sorted(set(child_name for child_name, fk in set_null))
+        blocking_names = sorted(set(child_name for child_name, fk in blocking))
+        update_checked = [ ]
+        if table_keys[table_name] != SYNTHETIC_KEY:
+            update_checked = sorted(set(child_name for child_name, fk in children.get(table_name, [ ])
+                                        if child_name != table_name))
+        impact.update( { table_name: {
+            'depth': depths[table_name],
+            'fan_in': len([ fk for fk in table_fks[table_name] if not fk['self_reference'] ]),
+            'fan_out': len([ child_name for child_name, fk in children.get(table_name, [ ]) if child_name != table_name ]),
+            'cascade_reach': sorted(cascaded),
+            'cascade_chain': cascade_chains[table_name],
+            'set_null': set_null_names,
+            'blocking': blocking_names,
+            'locked_tables': len(set([ table_name ] + list(cascaded) + set_null_names + blocking_names)),
+            'update_checked': update_checked } } )
+    logger.opt(lazy=True).debug('impact:\n{}', lambda: json.dumps(impact, indent=4))
+    logger.debug('Leaving build_delete_impact()')
+    return impact
+
+
+# Longest identifier allowed by PostgreSQL (CockroachDB allows longer)
+MAX_NAME_LENGTH = 63
+
+
+def index_name(table_name, columns, unique):
+    '''
+    Name an index after its table and columns, shortened with a hash if needed
+    '''
+    name = f'{table_name}_{"_".join(column.split(" ")[0] for column in columns)}_{"key" if unique else "idx"}'
+    if len(name) > MAX_NAME_LENGTH:
+        digest = hashlib.md5(name.encode()).hexdigest()[:8]
+        name = f'{name[:MAX_NAME_LENGTH - 9]}_{digest}'
+    return name
+
+
+def make_index(table_name, columns, include, unique, reason, name=None):
+    '''
+    Make an index description
+    '''
+    return { 'table': table_name, 'name': name if name is not None else index_name(table_name, columns, unique),
+             'columns': list(columns), 'include': [ column for column in include if column not in columns ],
+             'unique': unique, 'reason': reason, 'redundant_with': None }
+
+
+@logger.catch
+def build_existing_indexes(er_yaml, table_keys, table_columns, dialect):
+    '''
+    Build the indexes created by genschema for each table: primary keys, unique attributes,
+    the history indexes of temporal entities, and (PostgreSQL) the expiry indexes of retention policies
+    '''
+    logger.debug('Entering build_existing_indexes()')
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    existing = { table_name: [ ] for table_name in table_columns }
+    for table_name, columns in table_columns.items():
+        existing[table_name].append(make_index(table_name, [ key_column['name'] for key_column in table_keys[table_name] ],
+                                               [ ], True, 'Primary key', f'{table_name}_pkey'))
+        for column in columns:
+            if column['source'] == 'attribute' and column['unique'] == True:
+                existing[table_name].append(make_index(table_name, [ column['name'] ], [ ], True, 'Unique attribute'))
+    # Temporal history indexes are on the key columns and "valid from" (see genschema.generate_temporal)
+    table_fks = { table_name: [ column['fk'] for column in columns if column['source'] == 'fk' ]
+                  for table_name, columns in table_columns.items() }
+    for entity_name, temporal in build_temporal_entities(er_yaml).items():
+        if entity_name not in table_columns:
+            continue
+        key_columns = temporal_key_columns(entities[entity_name], temporal, table_fks[entity_name])
+        if key_columns:
+            existing[entity_name].append(make_index(entity_name, key_columns + [ temporal['valid_from'] ], [ ], False,
+                                                    'Temporal history', f'{entity_name}_history'))
+    if dialect == 'PG':
+        for entity_name, retention in build_retention_policies(er_yaml).items():
+            if entity_name in table_columns and retention['column'] is not None:
+                existing[entity_name].append(make_index(entity_name, [ retention['column'] ], [ ], False,
+                                                        'Retention expiry', f'{entity_name}_expiry'))
+    logger.debug('Leaving build_existing_indexes()')
+    return existing
+
+
+# Capacity estimates.  Sizes are in bytes, before compression, and are rough: they are meant to size
+# a cluster from the model, not to predict the size of a table to the page.
+DEFAULT_ROWS = 1000
+DEFAULT_HORIZON_DAYS = 365
+DEFAULT_REPLICAS = 3
+CAPACITY_DIALECTS = [ 'CRDB', 'PG' ]
+
+# Average size of variable-width values (strings, decimals, etc.) without an "avg_size" hint
+DEFAULT_VARIABLE_SIZE = 16
+
+# Stored size of fixed-width values.  CockroachDB encodes integers as varints, sized here for typical values.
+PG_WIDTHS = { 'int2': 2, 'smallint': 2, 'int4': 4, 'integer': 4, 'date': 4, 'real': 4,
+              'int8': 8, 'bigint': 8, 'double precision': 8, 'timestamp': 8, 'timestamptz': 8,
+              'uuid': 16, 'boolean': 1 }
+CRDB_WIDTHS = { 'int2': 3, 'int4': 5, 'int8': 5, 'integer': 5, 'date': 5, 'float': 9,
+                'timestamp': 12, 'timestamptz': 12, 'uuid': 17, 'boolean': 1 }
+
+# PostgreSQL heap and B-tree page layout
+PG_PAGE_SIZE = 8192
+PG_PAGE_HEADER = 24
+PG_TUPLE_HEADER = 24
+PG_INDEX_TUPLE_HEADER = 8
+PG_LINE_POINTER = 4
+PG_INDEX_FILL = 0.9
+
+# CockroachDB key-value layout: the table and index IDs that prefix each key, and the MVCC timestamp
+# and storage engine overhead of each key-value pair
+CRDB_KEY_PREFIX = 4
+CRDB_VALUE_HEADER = 5
+CRDB_KV_OVERHEAD = 24
+
+
+def column_size(column_type, dialect, attribute_values=None):
+    '''
+    Estimate the average stored size of a value of a column type (see dialect_type), using the
+    "avg_size" hint of the attribute if any.  Variable-width values include their length header.
+    '''
+    attribute_values = attribute_values or { }
+    if 'avg_size' in attribute_values:
+        return attribute_values['avg_size']
+    base_type, _, length = column_type.partition('(')
+    widths = PG_WIDTHS if dialect == 'PG' else CRDB_WIDTHS
+    if base_type in widths:
+        return widths[base_type]
+    if length:
+        return min(int(length.rstrip(')')), DEFAULT_VARIABLE_SIZE) + 1
+    return DEFAULT_VARIABLE_SIZE + 1
+
+
+def align8(size):
+    '''
+    Round a size up to the 8-byte alignment of PostgreSQL tuples
+    '''
+    return (int(size) + 7) // 8 * 8
+
+
+@logger.catch
+def build_row_estimates(er_yaml, dependency_ordering, mm_synthesized, table_fks, default_rows=DEFAULT_ROWS,
+                        horizon_days=DEFAULT_HORIZON_DAYS):
+    '''
+    Estimate the number of rows of each table now and after horizon_days, in dependency order so
+    parent estimates are known, from the "expected_rows" and "growth_per_day" hints of each entity.
+    Without them, the "data_hints" used by gendata are used: a row count, or a fan-out per row of
+    the first required parent.  A subclass table shares the rows of its base class with the other
+    subclasses, and a synthesized many-to-many table has a row for each row of its larger parent.
+
+    Returns a dictionary of table name to:
+     rows            the expected number of rows
+     growth_per_day  the expected number of rows added each day
+     horizon_rows    the expected number of rows after horizon_days
+     source          where the estimate comes from: hint, fan_out, subclass, mapping, or default
+    '''
+    logger.debug('Entering build_row_estimates()')
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    subclasses = { }
+    for table_name in dependency_ordering:
+        for fk in table_fks[table_name]:
+            if fk['kind'] == 'base_class':
+                subclasses.setdefault(fk['references'], [ ]).append(table_name)
+
+    estimates = { }
+    for table_name in dependency_ordering:
+        entity = entities.get(table_name, { })
+        data_hints = entity.get('data_hints', { })
+        fks = table_fks[table_name]
+        first_required = next((fk for fk in fks if fk['required'] and fk['references'] != table_name), None)
+        base_fk = next((fk for fk in fks if fk['kind'] == 'base_class'), None)
+        if 'expected_rows' in entity or 'growth_per_day' in entity or 'rows' in data_hints:
+            rows = entity.get('expected_rows', data_hints.get('rows', 0))
+            growth_per_day = entity.get('growth_per_day', 0)
+            source = 'hint'
+        elif 'fan_out' in data_hints and first_required is not None:
+            parent = estimates[first_required['references']]
+            rows = parent['rows'] * data_hints['fan_out']
+            growth_per_day = parent['growth_per_day'] * data_hints['fan_out']
+            source = 'fan_out'
+        elif base_fk is not None:
+            parent = estimates[base_fk['references']]
+            rows = parent['rows'] / len(subclasses[base_fk['references']])
+            growth_per_day = parent['growth_per_day'] / len(subclasses[base_fk['references']])
+            source = 'subclass'
+        elif table_name in mm_synthesized:
+            parents = [ estimates[fk['references']] for fk in fks ]
+            rows = max(parent['rows'] for parent in parents)
+            growth_per_day = max(parent['growth_per_day'] for parent in parents)
+            source = 'mapping'
+        else:
+            rows = default_rows
+            growth_per_day = 0
+            source = 'default'
+        estimates.update( { table_name: { 'rows': int(rows), 'growth_per_day': growth_per_day,
+                                          'horizon_rows': int(rows + growth_per_day * horizon_days),
+                                          'source': source } } )
+        logger.debug('{}table_name={} estimate={}', i(1), table_name, estimates[table_name])
+    logger.debug('Leaving build_row_estimates()')
+    return estimates
+
+
+def pg_pages(rows, entry_size, usable):
+    '''
+    Estimate the size of the pages holding rows entries of entry_size bytes, with usable bytes per page
+    '''
+    entries_per_page = max(1, int(usable // entry_size))
+    return -(-rows // entries_per_page) * PG_PAGE_SIZE
+
+
+@logger.catch
+def build_capacity_estimates(er_yaml, default_rows=DEFAULT_ROWS, horizon_days=DEFAULT_HORIZON_DAYS,
+                             replicas=DEFAULT_REPLICAS, generate_keys=True):
+    '''
+    Estimate the storage of each table of the physical model after horizon_days (see build_row_estimates),
+    for each dialect in CAPACITY_DIALECTS, from the column types and indexes genschema generates
+
+    Returns a dictionary of table name to its row estimate (see build_row_estimates), plus a "dialects"
+    dictionary of dialect to:
+     row_bytes    the average stored size of a row
+     table_bytes  the size of the table (in CockroachDB, its primary index)
+     index_bytes  the size of the other indexes
+     total_bytes  the size of the table and indexes, times the number of replicas for CockroachDB
+    '''
+    logger.debug('Entering build_capacity_estimates()')
+    er_yaml = build_physical_model(er_yaml)
+    graph, dependency_ordering, mm_synthesized = topological_sort_entities(er_yaml)
+    entities_pc = build_entity_parents_and_children(er_yaml)
+    table_keys = build_table_keys(er_yaml, graph, dependency_ordering, mm_synthesized, entities_pc, generate_keys)
+    table_fks = build_table_foreign_keys(graph, mm_synthesized, entities_pc, table_keys)
+    table_columns = build_table_columns(er_yaml, graph, mm_synthesized, table_fks, table_keys)
+    table_families = build_column_families(er_yaml, table_columns)
+    estimates = build_row_estimates(er_yaml, dependency_ordering, mm_synthesized, table_fks, default_rows, horizon_days)
+    entity_attributes = { entity_outer['entity']['name']: entity_outer['entity'].get('attributes', None) or { }
+                          for entity_outer in er_yaml['entities'] }
+
+    dialect_column_types = { dialect: build_column_types(er_yaml, table_columns, dialect)
+                             for dialect in CAPACITY_DIALECTS }
+    dialect_indexes = { dialect: build_existing_indexes(er_yaml, table_keys, table_columns, dialect)
+                        for dialect in CAPACITY_DIALECTS }
+
+    capacity = { }
+    for table_name in dependency_ordering:
+        rows = estimates[table_name]['horizon_rows']
+        key_columns = [ key_column['name'] for key_column in table_keys[table_name] ]
+        dialects = { }
+        for dialect in CAPACITY_DIALECTS:
+            sizes = { column_name: column_size(column_type, dialect,
+                                               entity_attributes.get(table_name, { }).get(column_name, None))
+                      for column_name, column_type in dialect_column_types[dialect][table_name].items() }
+            indexes = dialect_indexes[dialect][table_name]
+            if dialect == 'PG':
+                row_bytes = PG_TUPLE_HEADER + align8(sum(sizes.values())) + PG_LINE_POINTER
+                table_bytes = pg_pages(rows, row_bytes, PG_PAGE_SIZE - PG_PAGE_HEADER)
+                index_bytes = sum(pg_pages(rows, PG_INDEX_TUPLE_HEADER + align8(sum(sizes[column.split(' ')[0]]
+                                           for column in index['columns'] + index['include'])) + PG_LINE_POINTER,
+                                           (PG_PAGE_SIZE - PG_PAGE_HEADER) * PG_INDEX_FILL)
+                                  for index in indexes)
+                total_bytes = table_bytes + index_bytes
+            else:
+                # One key-value pair for each column family, keyed by the primary key
+                families = table_families.get(table_name, [ (DEFAULT_FAMILY, [ column['name']
+                                                             for column in table_columns[table_name] ]) ])
+                key_bytes = CRDB_KEY_PREFIX + sum(sizes[column] for column in key_columns) + 1
+                row_bytes = sum(key_bytes + CRDB_VALUE_HEADER + CRDB_KV_OVERHEAD +
+                                sum(sizes[column] for column in family_columns if column not in key_columns)
+                                for family_name, family_columns in families)
+                table_bytes = rows * row_bytes
+                # The primary key is the table itself; other indexes hold their columns and the primary key
+                index_bytes = sum(rows * (CRDB_KEY_PREFIX + CRDB_KV_OVERHEAD +
+                                          sum(sizes[column.split(' ')[0]] for column in index['columns'] + index['include']) +
+                                          sum(sizes[column] for column in key_columns if column not in index['columns']))
+                                  for index in indexes if index['columns'] != key_columns)
+                total_bytes = (table_bytes + index_bytes) * replicas
+            dialects.update( { dialect: { 'row_bytes': int(row_bytes), 'table_bytes': int(table_bytes),
+                                          'index_bytes': int(index_bytes), 'total_bytes': int(total_bytes) } } )
+        capacity.update( { table_name: dict(estimates[table_name], dialects=dialects) } )
+    logger.opt(lazy=True).debug('capacity:\n{}', lambda: json.dumps(capacity, indent=4))
+    logger.debug('Leaving build_capacity_estimates()')
+    return capacity
+
+
+def format_bytes(size):
+    '''
+    Format a size in bytes with a binary unit, e.g. "1.5 GiB"
+    '''
+    for unit in [ 'bytes', 'KiB', 'MiB', 'GiB', 'TiB' ]:
+        if size < 1024 or unit == 'TiB':
+            return f'{size:.0f} {unit}' if unit == 'bytes' else f'{size:.1f} {unit}'
+        size /= 1024
+
+
+def select_model_slice(er_yaml, entity_names=None, subject_areas=None):
+    '''
+    Select the slice of an ERML dictionary needed to generate the named entities and the entities
+    of the named subject areas (the "subject_area" of each entity): those entities, the transitive
+    closure of their required parents (including base classes), the other classes that share their
+    table in single_table inheritance, the enums of their enum attributes, and the relationships
+    among them (so many-to-many mapping tables between selected entities are synthesized as usual).
+    Relationships to optional parents outside the slice are left out, along with their foreign keys.
+
+    Returns a new ERML dictionary (the input is not changed).  Raises ValueError for an unknown
+    entity or subject area.
+    '''
+    logger.debug('Entering select_model_slice()')
+    entities = { entity_outer['entity']['name']: entity_outer['entity'] for entity_outer in er_yaml['entities'] }
+    selected = set()
+    for entity_name in entity_names or [ ]:
+        if entity_name not in entities:
+            raise ValueError(f'Specified entity does not exist: {entity_name}')
+        selected.add(entity_name)
+    for subject_area in subject_areas or [ ]:
+        area_entities = [ entity_name for entity_name, entity in entities.items()
+                          if entity.get('subject_area', None) == subject_area ]
+        if not area_entities:
+            raise ValueError(f'Specified subject area has no entities: {subject_area}')
+        selected.update(area_entities)
+
+    # Required parents (see build_entity_parents_and_children and build_table_foreign_keys)
+    required_parents = { }
+    for relationship in er_yaml['relationships']:
+        participants = relationship['relationship']['participants']
+        for end in [ 0, 1 ]:
+            child, parent = participants[end], participants[1 - end]
+            if child['name'] != parent['name'] and child['kind'] in [ 'zero_or_more', 'subclass' ] \
+                    and parent['kind'] in [ 'one', 'base_class' ]:
+                required_parents.setdefault(child['name'], set()).add(parent['name'])
+    inheritance = build_inheritance(er_yaml)
+    pending = list(selected)
+    while pending:
+        entity_name = pending.pop()
+        related = set(required_parents.get(entity_name, set()))
+        if entity_name in inheritance and inheritance[entity_name]['strategy'] == 'single_table':
+            root_name = inheritance[entity_name]['root']
+            related.update(other_name for other_name, other in inheritance.items() if other['root'] == root_name)
+        for related_name in related - selected:
+            selected.add(related_name)
+            pending.append(related_name)
+    logger.debug(f'selected={sorted(selected)}')
+
+    enum_names = set()
+    for entity_name in selected:
+        for attribute_name, attribute_values in (entities[entity_name].get('attributes', None) or { }).items():
+            if attribute_values.get('type', None) == 'enum':
+                enum_names.add('enum_' + attribute_name)
+
+    model_slice = dict(er_yaml)
+    model_slice.update( { 'entities': [ entity_outer for entity_outer in er_yaml['entities']
+                                        if entity_outer['entity']['name'] in selected ] } )
+    relationships = [ ]
+    for relationship in er_yaml['relationships']:
+        names = set(participant['name'] for participant in relationship['relationship']['participants'])
+        if names <= selected:
+            relationships.append(relationship)
+        elif names & selected:
+            logger.info(f'Leaving out the relationship between {" and ".join(sorted(names))}, '
+                        f'which is outside the selected entities')
+    model_slice.update( { 'relationships': relationships } )
+    model_slice.update( { 'enums': [ enum_outer for enum_outer in er_yaml['enums']
+                                     if enum_outer['enum']['name'] in enum_names ] } )
+    if 'access_patterns' in er_yaml:
+        model_slice.update( { 'access_patterns': [ pattern for pattern in er_yaml['access_patterns']
+                                                   if pattern['entity'] in selected and
+                                                   pattern.get('join', pattern['entity']) in selected ] } )
+    logger.debug('Leaving select_model_slice()')
+    return model_slice
+
+
+# The encodings of an ERML file.  JSON and binary are much faster to read than YAML, for passing a model
+# from tool to tool; YAML is for people.
+ERML_FORMATS = [ 'yaml', 'json', 'binary' ]
+
+# The binary encoding is this header, a version byte, then the zlib-compressed canonical JSON of the model
+# (sorted keys, without whitespace), which reads the same with any version of Python.  Version 1 was the
+# marshal format of the model, which is neither stable across Python versions nor safe to read.
+ERML_BINARY_HEADER = b'\x00ERML'
+ERML_BINARY_VERSION = 2
+
+# The LibYAML-based loader and dumper if PyYAML was built with LibYAML, which are several times faster
+ERML_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+ERML_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def load_erml(input_object):
+    '''
+    Read an ERML file in any of its encodings, telling them apart by how the file starts:
+    with the binary header, with a JSON object, or else with YAML.
+    Raises ValueError if a binary or JSON file is not valid (YAML errors are raised by PyYAML).
+    '''
+    data = getattr(input_object, 'buffer', input_object).read()
+    if isinstance(data, bytes):
+        if data.startswith(ERML_BINARY_HEADER):
+            if len(data) <= len(ERML_BINARY_HEADER) or data[len(ERML_BINARY_HEADER)] != ERML_BINARY_VERSION:
+                raise ValueError(f'Unsupported version of binary ERML (expected version {ERML_BINARY_VERSION}); '
+                                 f'write it again with generml or genconvert')
+            try:
+                return json.loads(zlib.decompress(data[len(ERML_BINARY_HEADER) + 1:]).decode('utf-8'))
+            except (zlib.error, ValueError) as ex:
+                raise ValueError(f'Invalid binary ERML: {ex}')
+        data = data.decode('utf-8')
+    if data.lstrip().startswith('{'):
+        try:
+            return json.loads(data)
+        except ValueError:
+            pass    # Also YAML can start with a brace
+    return yaml.load(data, Loader=ERML_YAML_LOADER)
+
+
+def dump_erml(er, output_object, format='yaml'):
+    '''
+    Write a model as an ERML file in the specified encoding: yaml, json (canonical: sorted keys,
+    without whitespace), or binary (compressed canonical JSON)
+    '''
+    if format == 'binary':
+        # Sort the keys, as in YAML and JSON, so tools read the same model (such as the order of the attributes)
+        # from any encoding.  Dates and times (from unquoted YAML) are written as strings, as in JSON.
+        content = json.dumps(er, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                             default=str).encode('utf-8')
+        output_object.flush()
+        binary_object = getattr(output_object, 'buffer', output_object)
+        binary_object.write(ERML_BINARY_HEADER + bytes([ ERML_BINARY_VERSION ]) + zlib.compress(content))
+        binary_object.flush()
+    elif format == 'json':
+        print(json.dumps(er, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str),
+              file=output_object)
+    else:
+        print(yaml.dump(er, Dumper=ERML_YAML_DUMPER), file=output_object)
+
+
+def model_digest(er):
+    '''
+    The SHA-256 digest of a model, over its canonical JSON (sorted keys, without whitespace),
+    leaving out its generated_datetime so that regenerating the same model gives the same digest
+    '''
+    content = { key: value for key, value in er.items() if key != 'generated_datetime' }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                                     default=str).encode('utf-8')).hexdigest()
+
+
+def file_digest(inputs):
+    '''
+    The SHA-256 digest of the content of the input files, in order.  Each input is a file name or
+    a seekable binary file object, which is rewound after it is read.
+    '''
+    digest = hashlib.sha256()
+    for input_file_or_object in inputs:
+        if isinstance(input_file_or_object, str):
+            with open(input_file_or_object, 'rb') as input_object:
+                digest.update(input_object.read())
+        else:
+            digest.update(input_file_or_object.read())
+            input_file_or_object.seek(0)
+    return digest.hexdigest()
+
+
+def generation_stamp(source_digest=None):
+    '''
+    What a generated file is stamped with: the digest of its source if given (for reproducible output,
+    which is the same bytes whenever it is generated from the same source), or else the current time
+    '''
+    if source_digest is not None:
+        return f'sha256:{source_digest}'
+    return datetime.datetime.utcnow().isoformat()
+
+
+def staging_path(path):
+    '''
+    The temporary file to write an output file to, beside it, so that replace_if_changed() only replaces
+    the output file if its content changes.  Anything other than a regular file (such as /dev/null)
+    is written directly.
+    '''
+    if os.path.exists(path) and not os.path.isfile(path):
+        return path
+    return f'{path}.tmp{os.getpid()}'
+
+
+def replace_if_changed(staging, path):
+    '''
+    Replace the output file by the temporary file it was written to, unless the output file already has
+    the same content, in which case it is left alone (keeping its modification time, so build tools
+    see it as up to date) and the temporary file is removed.  Returns True if the output file is replaced.
+    '''
+    if staging == path:
+        return True
+    if os.path.isfile(path) and filecmp.cmp(staging, path, shallow=False):
+        logger.info(f'Output file is unchanged: {path}')
+        os.remove(staging)
+        return False
+    os.replace(staging, path)
+    return True